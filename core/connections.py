@@ -0,0 +1,236 @@
+"""
+Long-lived SQLite connections.
+
+`ConnectionManager.connect` hands each thread one read-write connection per
+database, opened (and its pragmas applied) on first use and reused after that.
+`ConnectionManager.reader` lends connections from a small per-database pool of
+read-only ones (`mode=ro`, `query_only`) for query paths. `close_all` is
+registered with atexit for the module-level MANAGER. A forked child (e.g. a
+process-pool worker) opens its own connections: the ones inherited from the
+parent are moved out of the pool into a list that is never closed, so neither
+the child nor its garbage collector finalizes connections whose file handles
+and locks belong to the parent.
+
+Every connection carries the pragmas of the active performance profile (see
+PROFILES; chosen with TRUSTINT_DB_PROFILE or `trustint --profile`).
+
+Callers keep the usual `with con:` transactions; a pooled connection must not
+be closed by its borrower.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+from utils.logger import get_logger
+
+LOG = get_logger("connections")
+
+# Per-connection pragmas. synchronous: 2 FULL, 1 NORMAL (durable at each
+# checkpoint under WAL, never corrupt); temp_store: 0 DEFAULT, 2 MEMORY;
+# cache_size < 0 is KiB. page_size only takes effect when a database is created.
+# "default" and "bulk" were picked with `python -m scripts.bench pragmas`.
+PROFILES: Dict[str, Dict[str, int]] = {
+    "safe": {
+        "synchronous": 2,
+        "temp_store": 0,
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "wal_autocheckpoint": 1000,
+        "page_size": 4096,
+    },
+    "default": {
+        "synchronous": 1,
+        "temp_store": 2,
+        "cache_size": -65536,
+        "mmap_size": 256 * 1024 * 1024,
+        "wal_autocheckpoint": 1000,
+        "page_size": 4096,
+    },
+    "bulk": {
+        "synchronous": 1,
+        "temp_store": 2,
+        "cache_size": -262144,
+        "mmap_size": 1024 * 1024 * 1024,
+        "wal_autocheckpoint": 10000,
+        "page_size": 4096,
+    },
+}
+DEFAULT_PROFILE = "default"
+# Compiled statements kept per connection (sqlite3's default is 128).
+STATEMENT_CACHE = 512
+
+# (thread ident, database path) -> (database inode, profile, connection)
+_Entry = Tuple[int, str, sqlite3.Connection]
+
+
+def _inode(path: str) -> int:
+    try:
+        return os.stat(path).st_ino
+    except OSError:
+        return -1
+
+
+def apply_profile(con: sqlite3.Connection, profile: str) -> None:
+    for name, value in PROFILES[profile].items():
+        if name != "page_size":
+            con.execute(f"PRAGMA {name}={int(value)};")
+
+
+def profile_mismatches(
+    con: sqlite3.Connection, profile: str
+) -> Dict[str, Tuple[int, int]]:
+    """{pragma: (wanted, actual)} for every pragma of `profile` not in effect."""
+    out = {}
+    for name, wanted in PROFILES[profile].items():
+        actual = con.execute(f"PRAGMA {name};").fetchone()[0]
+        if actual != wanted:
+            out[name] = (wanted, actual)
+    return out
+
+
+def _alive(con: sqlite3.Connection) -> bool:
+    try:
+        return con.total_changes >= 0
+    except sqlite3.ProgrammingError:  # closed by a caller
+        return False
+
+
+class ConnectionManager:
+    def __init__(self, pool_size: int = 4, timeout: float = 30.0):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.profile = os.getenv("TRUSTINT_DB_PROFILE", DEFAULT_PROFILE)
+        if self.profile not in PROFILES:
+            LOG.warning(
+                "Unknown TRUSTINT_DB_PROFILE %r, using %r",
+                self.profile,
+                DEFAULT_PROFILE,
+            )
+            self.profile = DEFAULT_PROFILE
+        self._lock = threading.Lock()
+        self._writers: Dict[Tuple[int, str], _Entry] = {}
+        self._readers: Dict[str, List[_Entry]] = {}
+        # Connections inherited across fork; kept referenced and never closed.
+        self._inherited: List[sqlite3.Connection] = []
+
+    def set_profile(self, profile: str) -> None:
+        """Switch profiles; pooled connections pick it up on their next checkout."""
+        if profile not in PROFILES:
+            raise ValueError(
+                f"Unknown DB profile {profile!r} (choose from {', '.join(PROFILES)})"
+            )
+        self.profile = profile
+
+    def connect(self, db_path: Path) -> sqlite3.Connection:
+        """This thread's read-write connection to `db_path`."""
+        path = str(db_path)
+        key = (threading.get_ident(), path)
+        entry = self._writers.get(key)
+        # A database deleted and recreated under the same path gets a new inode.
+        if entry is not None and entry[0] == _inode(path) and _alive(entry[2]):
+            if entry[1] != self.profile:
+                apply_profile(entry[2], self.profile)
+                self._writers[key] = (entry[0], self.profile, entry[2])
+            return entry[2]
+
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        created = _inode(path) == -1 or os.path.getsize(path) == 0
+        # check_same_thread=False only so close_all can run on another thread;
+        # each connection is used by the thread that opened it.
+        con = sqlite3.connect(
+            path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=STATEMENT_CACHE,
+        )
+        con.row_factory = sqlite3.Row
+        if created:
+            con.execute(f"PRAGMA page_size={PROFILES[self.profile]['page_size']};")
+        con.execute("PRAGMA journal_mode=WAL;")
+        con.execute("PRAGMA foreign_keys=ON;")
+        apply_profile(con, self.profile)
+        with self._lock:
+            stale = [entry[2]] if entry is not None else []
+            live = {t.ident for t in threading.enumerate()}
+            for other in [k for k in self._writers if k[0] not in live]:
+                stale.append(self._writers.pop(other)[2])
+            self._writers[key] = (_inode(path), self.profile, con)
+        for old in stale:
+            old.close()
+        return con
+
+    @contextmanager
+    def reader(self, db_path: Path) -> Iterator[sqlite3.Connection]:
+        """Borrow a read-only connection to `db_path` for the block."""
+        path = str(db_path)
+        inode = _inode(path)
+        with self._lock:
+            idle = self._readers.setdefault(path, [])
+            entry = idle.pop() if idle else None
+        if entry is not None and entry[0] != inode:
+            entry[2].close()
+            entry = None
+        if entry is None:
+            uri = f"{Path(path).resolve().as_uri()}?mode=ro"
+            con = sqlite3.connect(
+                uri,
+                uri=True,
+                timeout=self.timeout,
+                check_same_thread=False,
+                cached_statements=STATEMENT_CACHE,
+            )
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA query_only=ON;")
+            entry = (inode, "", con)
+        con = entry[2]
+        if entry[1] != self.profile:
+            apply_profile(con, self.profile)
+            entry = (inode, self.profile, con)
+        try:
+            yield con
+        finally:
+            if con.in_transaction:
+                con.rollback()
+            with self._lock:
+                idle = self._readers.setdefault(path, [])
+                keep = len(idle) < self.pool_size
+                if keep:
+                    idle.append(entry)
+            if not keep:
+                con.close()
+
+    def forget_all(self) -> None:
+        """
+        Empty the pool without closing anything; for a forked child, which must
+        neither use nor close its parent's connections. They stay referenced
+        from `_inherited` so they are never finalized in the child either.
+        """
+        self._lock = threading.Lock()
+        self._inherited += [con for _, _, con in self._writers.values()]
+        self._inherited += [
+            con for idle in self._readers.values() for _, _, con in idle
+        ]
+        self._writers = {}
+        self._readers = {}
+
+    def close_all(self) -> None:
+        """Close every pooled connection (pending transactions are rolled back)."""
+        with self._lock:
+            cons = [con for _, _, con in self._writers.values()]
+            cons += [con for idle in self._readers.values() for _, _, con in idle]
+            self._writers.clear()
+            self._readers.clear()
+        for con in cons:
+            con.close()
+
+
+MANAGER = ConnectionManager()
+atexit.register(MANAGER.close_all)
+os.register_at_fork(after_in_child=MANAGER.forget_all)
@@ -1,11 +1,11 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict
+from typing import Any, Dict
 
 import jsonschema
-import yaml
 
+from utils import config_loader
 from utils.logger import get_logger
 
 LOG = get_logger("lattice")
@@ -46,39 +46,72 @@ ASSET_SCHEMA = {
         "metadata": {"type": "object"},
     },
 }
+JURISDICTION_SCHEMA = {
+    "type": "object",
+    "required": ["code", "name"],
+    "properties": {"code": {"type": "string"}, "name": {"type": "string"}},
+}
+OBLIGATION_SCHEMA = {
+    "type": "object",
+    "required": ["trust", "name", "kind"],
+    "properties": {
+        "trust": {"type": "string"},
+        "name": {"type": "string"},
+        "kind": {"type": "string", "enum": ["compliance", "covenant"]},
+        "schedule": {"type": "string"},
+        "authority": {"type": "string"},
+        "details": {"type": "object"},
+    },
+}
 LAWS_SCHEMA = {
     "type": "object",
     "properties": {
-        "jurisdictions": {
-            "type": "array",
-            "items": {
-                "type": "object",
-                "required": ["code", "name"],
-                "properties": {"code": {"type": "string"}, "name": {"type": "string"}},
-            },
-        },
-        "obligations": {
-            "type": "array",
-            "items": {
-                "type": "object",
-                "required": ["trust", "name", "kind"],
-                "properties": {
-                    "trust": {"type": "string"},
-                    "name": {"type": "string"},
-                    "kind": {"type": "string", "enum": ["compliance", "covenant"]},
-                    "schedule": {"type": "string"},
-                    "authority": {"type": "string"},
-                    "details": {"type": "object"},
-                },
-            },
-        },
+        "jurisdictions": {"type": "array", "items": JURISDICTION_SCHEMA},
+        "obligations": {"type": "array", "items": OBLIGATION_SCHEMA},
     },
 }
 
 
+# Schemas for single records, as read one at a time by the streaming ingest.
+RECORD_SCHEMAS = {
+    "jurisdictions": JURISDICTION_SCHEMA,
+    "trusts": TRUST_SCHEMA,
+    "roles": ROLE_SCHEMA,
+    "assets": ASSET_SCHEMA,
+    "obligations": OBLIGATION_SCHEMA,
+}
+_VALIDATORS: Dict[str, Any] = {}
+
+
+def check_record(entity: str, record: Any) -> None:
+    """
+    Validate one record of `entity` against its schema and the per-record
+    rules; raises jsonschema.ValidationError or ValueError.
+    """
+    validator = _VALIDATORS.get(entity)
+    if validator is None:
+        schema = RECORD_SCHEMAS[entity]
+        validator = jsonschema.validators.validator_for(schema)(schema)
+        _VALIDATORS[entity] = validator
+    validator.validate(record)
+    if entity == "assets":
+        _check_air_asset(record)
+
+
+def _check_air_asset(a: Dict[str, Any]) -> None:
+    # If asset class = air, ensure there is a jurisdiction and descriptor mentions AGL/ceiling or corridor
+    if a["class"] == "air":
+        if "jurisdiction" not in a:
+            raise ValueError(f"Air asset must specify jurisdiction: {a}")
+        desc = a["descriptor"].lower()
+        if not any(k in desc for k in ["agl", "ceiling", "corridor", "altitude"]):
+            raise ValueError(
+                f"Air asset descriptor should indicate bounds/altitude: {a['descriptor']}"
+            )
+
+
 def _load(name: str, config_path: Path):
-    p = config_path / name
-    return yaml.safe_load(p.read_text(encoding="utf-8")) if p.exists() else None
+    return config_loader.load_yaml(config_path / name)
 
 
 def validate_all(config_path: Path = CONFIG) -> Dict[str, int]:
@@ -103,16 +136,9 @@ def validate_all(config_path: Path = CONFIG) -> Dict[str, int]:
     if missing:
         raise ValueError(f"Rule violation: trusts without a trustee: {missing}")
 
-    # 2) If asset class = air, ensure there is a jurisdiction and descriptor mentions AGL/ceiling or corridor
+    # 2) Air assets must carry a jurisdiction and altitude bounds.
     for a in assets:
-        if a["class"] == "air":
-            if "jurisdiction" not in a:
-                raise ValueError(f"Air asset must specify jurisdiction: {a}")
-            desc = a["descriptor"].lower()
-            if not any(k in desc for k in ["agl", "ceiling", "corridor", "altitude"]):
-                raise ValueError(
-                    f"Air asset descriptor should indicate bounds/altitude: {a['descriptor']}"
-                )
+        _check_air_asset(a)
 
     LOG.info(
         "Validation passed: %d trusts, %d roles, %d assets, %d obligations",
@@ -1,11 +1,33 @@
 from __future__ import annotations
 
 import csv
+import gzip
+import hashlib
+import io
 import json
+import os
 import sqlite3
+import tarfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
 
-from core.substrate import connect
+from core import queries
+from core.substrate import connect, reader
+from utils import fast_json
 from utils.logger import get_logger
 from utils.provenance import append_event, sha256_file
 
@@ -14,82 +36,525 @@ DB_PATH = Path("vault/trustint.db")
 DIST = Path("dist")
 DIST.mkdir(exist_ok=True, parents=True)
 
+# Per-trust sections of the board report, each read by a `report.<section>` query.
+REPORT_SECTIONS = ("roles", "assets", "obligations", "filings")
 
-def _con() -> sqlite3.Connection:
-    con = connect(DB_PATH)
-    con.row_factory = sqlite3.Row
-    return con
+# The JSONL feed: a full snapshot plus deltas written since it, with the
+# change_journal watermark both reflect kept in FEED_STATE. Each delta is named
+# by the journal seq it runs up to, so names only ever increase.
+SNAPSHOT = "trustint_export.jsonl"
+FEED_STATE = "trustint_export.feed.json"
 
+# `trustint export --bundle` archive name (without .tar.gz).
+BUNDLE_NAME = "trustint-bronze-v0.1"
 
-def export_jsonl() -> Path:
-    out = DIST / "trustint_export.jsonl"
-    with _con() as con, open(out, "w", encoding="utf-8") as f:
-        for row in con.execute(
-            """
-          SELECT t.slug,t.name,t.purpose,j.code AS jurisdiction
-          FROM trusts t LEFT JOIN jurisdictions j ON t.jurisdiction_id=j.id
-        """
-        ):
-            f.write(json.dumps(dict(row), ensure_ascii=False) + "\n")
-    append_event({"type": "export", "format": "jsonl", "path": str(out)})
+# Rows fetched per batch by the streaming export writers.
+EXPORT_BATCH = 5000
+
+# Columnar export: one file per entity, read by `columnar.<entity>` queries and
+# written COLUMNAR_BATCH rows at a time. Text columns holding JSON are tagged.
+COLUMNAR_ENTITIES = (
+    "jurisdictions",
+    "trusts",
+    "roles",
+    "assets",
+    "obligations",
+    "filings",
+)
+COLUMNAR_FORMATS = {"parquet": "parquet", "ipc": "arrow"}
+COLUMNAR_BATCH = 65536
+_JSON_COLUMNS = {"powers", "metadata", "details"}
+
+# sha256 of each export as it was written: resolved path -> (size, mtime_ns, hex).
+# write_checksums uses an entry while the file's size and mtime still match it.
+_digests: Dict[str, Tuple[int, int, str]] = {}
+_digests_lock = threading.Lock()
+
+
+def _con(db_path: Path) -> ContextManager[sqlite3.Connection]:
+    """A pooled read-only connection to `db_path` for the duration of a block."""
+    return reader(db_path)
+
+
+class _HashingFile(io.RawIOBase):
+    """Unbuffered binary file that feeds every byte it writes to a sha256."""
+
+    def __init__(self, path: Path):
+        self._f = open(path, "wb", buffering=0)
+        self.sha256 = hashlib.sha256()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        n = self._f.write(b) or 0
+        self.sha256.update(memoryview(b)[:n])
+        return n
+
+    def close(self) -> None:
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+
+@contextmanager
+def _hashed_binary(path: Path) -> Iterator[BinaryIO]:
+    """
+    Open `path` for buffered binary writing; on a clean exit its sha256 is
+    recorded for write_checksums, so the file never has to be read back.
+    """
+    raw = _HashingFile(path)
+    f = io.BufferedWriter(raw, 1 << 20)
+    try:
+        yield f
+    except BaseException:
+        f.close()
+        raise
+    f.close()
+    st = path.stat()
+    with _digests_lock:
+        _digests[str(path.resolve())] = (
+            st.st_size,
+            st.st_mtime_ns,
+            raw.sha256.hexdigest(),
+        )
+
+
+@contextmanager
+def _hashed_open(
+    path: Path, newline: Optional[str] = None
+) -> Iterator[io.TextIOWrapper]:
+    """_hashed_binary for UTF-8 text."""
+    with _hashed_binary(path) as b:
+        f = io.TextIOWrapper(b, encoding="utf-8", newline=newline)
+        yield f
+        f.flush()
+        f.detach()
+
+
+def _digest(path: Path) -> str:
+    """sha256 of `path`, from the value recorded while writing it if still current."""
+    with _digests_lock:
+        entry = _digests.get(str(path.resolve()))
+    st = path.stat()
+    if entry is not None and entry[:2] == (st.st_size, st.st_mtime_ns):
+        return entry[2]
+    return sha256_file(path)
+
+
+def _delta_path(dist: Path, until: int) -> Path:
+    return dist / f"trustint_export.delta-{until:012d}.jsonl"
+
+
+def _delta_paths(dist: Path) -> List[Path]:
+    """This feed's delta files, oldest first."""
+    paths = dist.glob("trustint_export.delta-*.jsonl")
+    return sorted(paths, key=lambda p: int(p.stem.rsplit("-", 1)[1]))
+
+
+def _read_feed_state(dist: Path) -> Optional[Dict[str, int]]:
+    try:
+        return json.loads((dist / FEED_STATE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_feed_state(dist: Path, seq: int) -> None:
+    path = dist / FEED_STATE
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"seq": seq}), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _prune_journal(db_path: Path, seq: int) -> None:
+    """Drop the journal rows at or below the feed's watermark; none is read again."""
+    with connect(db_path) as con:
+        queries.execute(con, "export.prune_journal", (seq,))
+
+
+def _watermark(con: sqlite3.Connection) -> int:
+    row = queries.fetch_one(con, "export.watermark")
+    return row[0] if row else 0
+
+
+def _write_jsonl(db_path: Path, dist: Path) -> Path:
+    """Full snapshot; restarts the delta feed at the journal position it reflects."""
+    out = dist / SNAPSHOT
+    with _con(db_path) as con, _hashed_binary(out) as f:
+        con.execute("BEGIN")  # the rows and the watermark from one read snapshot
+        seq = _watermark(con)
+        encode = fast_json.jsonl_encoder(queries.columns(con, "export.trusts"))
+        for batch in queries.batches(con, "export.trusts", size=EXPORT_BATCH):
+            f.write(encode(batch))
+        con.commit()
+    for stale in _delta_paths(dist):
+        stale.unlink()
+    _write_feed_state(dist, seq)
+    _prune_journal(db_path, seq)
     return out
 
 
-def export_csv() -> Path:
-    out = DIST / "trustint_export.csv"
-    with _con() as con, open(out, "w", newline="", encoding="utf-8") as f:
+def _write_csv(db_path: Path, dist: Path) -> Path:
+    out = dist / "trustint_export.csv"
+    with _con(db_path) as con, _hashed_open(out, newline="") as f:
         w = csv.writer(f)
         w.writerow(["trust", "entity", "field1", "field2", "field3"])
-        for r in con.execute("SELECT slug,name,purpose FROM trusts"):
-            w.writerow([r["slug"], "trust", r["name"], r["purpose"], ""])
-        for r in con.execute(
-            """SELECT t.slug, role_type, party FROM roles r
-                                JOIN trusts t ON r.trust_id=t.id"""
+        for name, entity in (
+            ("export.trust_rows", "trust"),
+            ("export.role_rows", "role"),
+            ("export.asset_rows", "asset"),
         ):
-            w.writerow([r["slug"], "role", r["role_type"], r["party"], ""])
-        for r in con.execute(
-            """SELECT t.slug, class, descriptor FROM assets a
-                                JOIN trusts t ON a.trust_id=t.id"""
-        ):
-            w.writerow([r["slug"], "asset", r["class"], r["descriptor"], ""])
-    append_event({"type": "export", "format": "csv", "path": str(out)})
+            for batch in queries.batches(con, name, size=EXPORT_BATCH):
+                w.writerows([(slug, entity, a, b, "") for slug, a, b in batch])
     return out
 
 
-def export_markdown() -> Path:
-    out = DIST / "board_report.md"
-    with _con() as con, open(out, "w", encoding="utf-8") as f:
+def trust_sections(
+    con: sqlite3.Connection,
+) -> Iterator[Tuple[sqlite3.Row, Dict[str, List[sqlite3.Row]]]]:
+    """
+    Yield (trust, {section: rows}) for every trust in slug order.
+
+    Runs one query per REPORT_SECTIONS entry, all ordered by trust slug, and
+    merges them with the trust cursor in a single pass, so the number of
+    queries does not grow with the portfolio and only one trust's rows are held
+    at a time.
+    """
+    cursors = {s: queries.iterate(con, f"report.{s}") for s in REPORT_SECTIONS}
+    pending = {s: next(cur, None) for s, cur in cursors.items()}
+    try:
+        for trust in queries.iterate(con, "report.trusts"):
+            sections: Dict[str, List[sqlite3.Row]] = {}
+            for s, cur in cursors.items():
+                rows, row = [], pending[s]
+                while row is not None and row["slug"] == trust["slug"]:
+                    rows.append(row)
+                    row = next(cur, None)
+                sections[s], pending[s] = rows, row
+            yield trust, sections
+    finally:
+        for cur in cursors.values():
+            cur.close()
+
+
+def _write_markdown(db_path: Path, dist: Path) -> Path:
+    out = dist / "board_report.md"
+    with _con(db_path) as con, _hashed_open(out) as f:
         f.write("# TRUSTINT — Board Report\n\n")
-        for t in con.execute(
-            """SELECT t.id, t.slug, t.name, t.purpose, j.code AS jz
-                                FROM trusts t LEFT JOIN jurisdictions j ON j.id=t.jurisdiction_id
-                                ORDER BY slug"""
-        ):
+        for t, sec in trust_sections(con):
             f.write(f"## {t['name']} (`{t['slug']}`) — {t['jz'] or '—'}\n")
             if t["purpose"]:
                 f.write(f"> {t['purpose']}\n\n")
             f.write("### Roles\n")
-            for r in con.execute(
-                "SELECT role_type,party,powers FROM roles WHERE trust_id=?", (t["id"],)
-            ):
+            for r in sec["roles"]:
                 f.write(f"- **{r['role_type']}** — {r['party']}\n")
             f.write("\n### Assets (LAW)\n")
-            for a in con.execute(
-                "SELECT class,descriptor FROM assets WHERE trust_id=?", (t["id"],)
-            ):
+            for a in sec["assets"]:
                 f.write(f"- **{a['class']}** — {a['descriptor']}\n")
+            f.write("\n### Obligations\n")
+            for o in sec["obligations"]:
+                when = f" ({o['schedule']})" if o["schedule"] else ""
+                f.write(f"- **{o['kind']}** — {o['name']}{when}\n")
+            f.write("\n### Filings\n")
+            for fl in sec["filings"]:
+                ref = f" `{fl['reference']}`" if fl["reference"] else ""
+                f.write(
+                    f"- {fl['filing_date']} **{fl['status']}** — "
+                    f"{fl['obligation'] or '—'}{ref}\n"
+                )
             f.write("\n---\n\n")
-    append_event({"type": "export", "format": "md", "path": str(out)})
     return out
 
 
+# Export format -> writer(db_path, dist); export_all runs them in this order.
+WRITERS: Dict[str, Callable[[Path, Path], Path]] = {
+    "jsonl": _write_jsonl,
+    "csv": _write_csv,
+    "md": _write_markdown,
+}
+
+
+def _export(fmt: str) -> Path:
+    out = WRITERS[fmt](DB_PATH, DIST)
+    append_event({"type": "export", "format": fmt, "path": str(out)})
+    return out
+
+
+def export_jsonl() -> Path:
+    return _export("jsonl")
+
+
+def export_csv() -> Path:
+    return _export("csv")
+
+
+def export_markdown() -> Path:
+    return _export("md")
+
+
+def export_jsonl_delta() -> Optional[Path]:
+    """
+    Write the trusts changed since the feed's watermark to
+    `trustint_export.delta-<seq>.jsonl`, named by the journal seq it runs up to:
+    each changed trust as its full export row, each removed one as
+    {"slug": ..., "deleted": true}. Returns None when nothing changed. Without a
+    snapshot to build on, writes the full snapshot instead. The journal is
+    pruned up to the new watermark.
+    """
+    state = _read_feed_state(DIST)
+    if state is None or not (DIST / SNAPSHOT).exists():
+        LOG.info("No JSONL snapshot to apply deltas to; writing a full export")
+        return export_jsonl()
+    since = state["seq"]
+    rows = 0
+    with _con(DB_PATH) as con:
+        con.execute("BEGIN")
+        until = _watermark(con)
+        if until == since:
+            con.commit()
+            return None
+        out = _delta_path(DIST, until)
+        name = "export.trust_changes"
+        columns = queries.columns(con, name)
+        encode, name_col = fast_json.jsonl_encoder(columns), columns.index("name")
+        with _hashed_binary(out) as f:
+            for batch in queries.batches(con, name, (since, until), EXPORT_BATCH):
+                for r in batch:
+                    if r[name_col] is None:  # no trust row: removed
+                        f.write(fast_json.dumps({"slug": r[0], "deleted": True}))
+                        f.write(b"\n")
+                    else:
+                        f.write(encode([r]))
+                rows += len(batch)
+        con.commit()
+    _write_feed_state(DIST, until)
+    _prune_journal(DB_PATH, until)
+    append_event(
+        {
+            "type": "export",
+            "format": "jsonl-delta",
+            "path": str(out),
+            "since": since,
+            "until": until,
+            "rows": rows,
+            "sha256": _digest(out),
+        }
+    )
+    return out
+
+
+def compact_jsonl() -> Path:
+    """
+    Fold every delta into the JSONL snapshot and delete the deltas. The result
+    matches a full export taken at the feed's watermark; later deltas keep
+    their increasing names.
+    """
+    state = _read_feed_state(DIST)
+    snapshot = DIST / SNAPSHOT
+    if state is None or not snapshot.exists():
+        return export_jsonl()
+    deltas = _delta_paths(DIST)
+    rows: Dict[str, dict] = {}
+    for path in [snapshot, *deltas]:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                rec = json.loads(line)
+                if rec.get("deleted"):
+                    rows.pop(rec["slug"], None)
+                else:
+                    rows[rec["slug"]] = rec
+
+    tmp = snapshot.with_name(snapshot.name + ".tmp")
+    with _hashed_binary(tmp) as f:
+        for slug in sorted(rows):
+            f.write(fast_json.dumps(rows[slug]) + b"\n")
+    os.replace(tmp, snapshot)
+    with _digests_lock:
+        _digests[str(snapshot.resolve())] = _digests.pop(str(tmp.resolve()))
+    for path in deltas:
+        path.unlink()
+    _prune_journal(DB_PATH, state["seq"])
+    append_event(
+        {
+            "type": "export",
+            "format": "jsonl-compact",
+            "path": str(snapshot),
+            "deltas": len(deltas),
+            "rows": len(rows),
+            "sha256": _digest(snapshot),
+        }
+    )
+    return snapshot
+
+
+def _arrow_field(pa: Any, column: str) -> Any:
+    if column == "id":
+        return pa.field(column, pa.int64(), nullable=False)
+    if column in _JSON_COLUMNS:
+        return pa.field(column, pa.string(), metadata={"encoding": "json"})
+    return pa.field(column, pa.string())
+
+
+def export_columnar(
+    fmt: str = "parquet", batch_size: int = COLUMNAR_BATCH
+) -> List[Path]:
+    """
+    Write each COLUMNAR_ENTITIES table to `trustint_<entity>.parquet` (or `.arrow`
+    for Arrow IPC), streaming record batches straight from the cursor. All files
+    are read from one snapshot. Needs the optional pyarrow dependency.
+    """
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"Unknown columnar format {fmt!r}")
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError(
+            "Columnar export needs pyarrow (pip install 'trustint[columnar]')"
+        ) from e
+
+    paths = []
+    with _con(DB_PATH) as con:
+        con.execute("BEGIN")
+        for entity in COLUMNAR_ENTITIES:
+            name = f"columnar.{entity}"
+            columns = queries.columns(con, name)
+            schema = pa.schema(
+                [_arrow_field(pa, c) for c in columns], metadata={"entity": entity}
+            )
+            out = DIST / f"trustint_{entity}.{COLUMNAR_FORMATS[fmt]}"
+            rows = 0
+            with _hashed_binary(out) as sink:
+                if fmt == "parquet":
+                    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+                else:
+                    writer = pa.ipc.new_file(sink, schema)
+                try:
+                    for batch in queries.batches(con, name, size=batch_size):
+                        arrays = [
+                            pa.array(values, type=field.type)
+                            for values, field in zip(
+                                zip(*batch, strict=True), schema, strict=True
+                            )
+                        ]
+                        writer.write_batch(
+                            pa.RecordBatch.from_arrays(arrays, schema=schema)
+                        )
+                        rows += len(batch)
+                finally:
+                    writer.close()
+            append_event(
+                {
+                    "type": "export",
+                    "format": fmt,
+                    "entity": entity,
+                    "path": str(out),
+                    "rows": rows,
+                }
+            )
+            paths.append(out)
+        con.commit()
+    return paths
+
+
+def _write_in_worker(
+    fmt: str, db_path: Path, dist: Path
+) -> Tuple[Path, Tuple[int, int, str]]:
+    """Process-pool entry point: write one format, return its path and digest."""
+    out = WRITERS[fmt](db_path, dist)
+    return out, _digests[str(out.resolve())]
+
+
+def export_all(workers: Optional[int] = None) -> List[Path]:
+    """
+    Write every WRITERS format and return the paths in WRITERS order.
+
+    Formats are written concurrently in worker processes (by default one per
+    format, capped at the CPU count), each on its own read-only connection;
+    `workers=1` writes them in turn in this process. Export events are appended
+    here, in order, once all files are written.
+    """
+    fmts = list(WRITERS)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(fmts)))
+    if workers == 1:
+        return [_export(fmt) for fmt in fmts]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_write_in_worker, f, DB_PATH, DIST) for f in fmts]
+        results = [future.result() for future in futures]
+    paths = []
+    for fmt, (out, digest) in zip(fmts, results, strict=True):
+        with _digests_lock:
+            _digests[str(out.resolve())] = digest
+        append_event({"type": "export", "format": fmt, "path": str(out)})
+        paths.append(out)
+    return paths
+
+
 def write_checksums(paths):
     sums = DIST / "SHA256SUMS"
     with open(sums, "w", encoding="utf-8") as f:
         for p in paths:
-            f.write(f"{sha256_file(p)}  {p.name}\n")
+            f.write(f"{_digest(p)}  {p.name}\n")
     append_event(
         {"type": "checksums", "files": [p.name for p in paths], "path": str(sums)}
     )
     LOG.info("Wrote checksums to %s", sums)
     return sums
+
+
+class _HashingReader:
+    """Read-only file wrapper that feeds every byte it returns to a sha256."""
+
+    def __init__(self, f: BinaryIO):
+        self._f = f
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._f.read(size)
+        self.sha256.update(data)
+        return data
+
+
+def write_bundle(paths: Sequence[Path], name: str = BUNDLE_NAME) -> Path:
+    """
+    Pack `paths` into a reproducible `DIST/<name>.tar.gz` in one pass: members
+    sorted by name with fixed mtime (SOURCE_DATE_EPOCH, else 0), owner and mode,
+    each hashed as it is archived, followed by a SHA256SUMS member built from
+    those hashes. The archive is hashed as it is compressed and its digest is
+    written to `<name>.sha256`. Appends one "bundle" provenance event.
+    """
+    mtime = int(os.getenv("SOURCE_DATE_EPOCH", "0"))
+    out = DIST / f"{name}.tar.gz"
+    sums: Dict[str, str] = {}
+
+    def add(tar: tarfile.TarFile, member: str, size: int, f: Any) -> None:
+        info = tarfile.TarInfo(member)
+        info.size, info.mtime, info.mode = size, mtime, 0o644
+        info.uid = info.gid = 0
+        info.uname = info.gname = ""
+        tar.addfile(info, f)
+
+    with _hashed_binary(out) as sink:
+        with gzip.GzipFile(
+            filename="", mode="wb", fileobj=sink, compresslevel=6, mtime=mtime
+        ) as gz:
+            with tarfile.open(fileobj=gz, mode="w", format=tarfile.USTAR_FORMAT) as tar:
+                for path in sorted(paths, key=lambda p: p.name):
+                    if path.name == "SHA256SUMS":
+                        continue
+                    with open(path, "rb") as f:
+                        hashing = _HashingReader(f)
+                        add(tar, path.name, os.fstat(f.fileno()).st_size, hashing)
+                    sums[path.name] = hashing.sha256.hexdigest()
+                listing = "".join(f"{h}  {n}\n" for n, h in sums.items()).encode()
+                add(tar, "SHA256SUMS", len(listing), io.BytesIO(listing))
+
+    digest = _digest(out)
+    (DIST / f"{name}.sha256").write_text(f"{digest}  {out.name}\n", encoding="utf-8")
+    append_event(
+        {"type": "bundle", "path": str(out), "sha256": digest, "members": sums}
+    )
+    LOG.info("Wrote bundle %s (%d members)", out, len(sums) + 1)
+    return out
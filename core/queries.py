@@ -0,0 +1,290 @@
+"""
+Named queries for the substrate.
+
+The SQL run by the inbox daemon, the CLI, search and the exports lives here,
+registered once by name. Python's sqlite3 compiles each distinct SQL string
+once per connection and keeps it in the connection's statement cache (sized
+by core.connections.STATEMENT_CACHE on pooled connections), so a named query
+is parsed on first use and reused after that.
+
+Every call records per-name metrics (calls, wall time, rows); `metrics()`
+returns them and `log_metrics()` writes them out, slowest first. Set
+TRUSTINT_QUERY_STATS=1 to log them when the process exits.
+"""
+
+from __future__ import annotations
+
+import atexit
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Generator, List, Optional, Sequence, Tuple
+
+from utils.logger import get_logger
+
+LOG = get_logger("queries")
+
+QUERIES: Dict[str, str] = {
+    # Inbox daemon (one set per incoming file).
+    "inbox.seen": "SELECT 1 FROM inbox_log WHERE sha256 = ?",
+    "inbox.log": """
+        INSERT INTO inbox_log
+          (sha256, src, size_bytes, file_ext, policy_id, decision, ticket_id)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    "inbox.decision_counts": """
+        SELECT decision, COUNT(*) FROM inbox_log GROUP BY decision
+    """,
+    "inbox.for_ticket": "SELECT * FROM inbox_log WHERE ticket_id = ?",
+    # Quarantine tickets.
+    "quarantine.open": """
+        INSERT INTO quarantine_ticket (id, reason, sha256) VALUES (?, ?, ?)
+    """,
+    "quarantine.get": "SELECT * FROM quarantine_ticket WHERE id = ?",
+    "quarantine.get_unresolved": """
+        SELECT id FROM quarantine_ticket WHERE id = ? AND resolved_at IS NULL
+    """,
+    "quarantine.resolve": """
+        UPDATE quarantine_ticket SET resolved_at = ?, note = ? WHERE id = ?
+    """,
+    "quarantine.list_unresolved": """
+        SELECT id, reason, created_at FROM quarantine_ticket
+        WHERE resolved_at IS NULL ORDER BY created_at ASC
+    """,
+    "quarantine.oldest_unresolved": """
+        SELECT id, created_at FROM quarantine_ticket
+        WHERE resolved_at IS NULL ORDER BY created_at ASC LIMIT 1
+    """,
+    # Search.
+    "search.all": "SELECT scope, key, content FROM search_idx WHERE content MATCH ?",
+    "search.scoped": """
+        SELECT scope, key, content FROM search_idx WHERE content MATCH ? AND scope = ?
+    """,
+    # Exports.
+    "export.trusts": """
+        SELECT t.slug, t.name, t.purpose, j.code AS jurisdiction
+        FROM trusts t LEFT JOIN jurisdictions j ON t.jurisdiction_id = j.id
+        ORDER BY t.slug
+    """,
+    # Delta feed: trusts journaled in (seq, seq]; a NULL name marks a deletion.
+    # The AUTOINCREMENT high-water mark, which pruning the journal keeps.
+    "export.watermark": """
+        SELECT IFNULL(
+          (SELECT seq FROM sqlite_sequence WHERE name = 'change_journal'), 0
+        )
+    """,
+    "export.trust_changes": """
+        SELECT c.key AS slug, t.name, t.purpose, j.code AS jurisdiction
+        FROM (
+          SELECT DISTINCT key FROM change_journal
+          WHERE entity = 'trusts' AND seq > ? AND seq <= ?
+        ) c
+        LEFT JOIN trusts t ON t.slug = c.key
+        LEFT JOIN jurisdictions j ON t.jurisdiction_id = j.id
+        ORDER BY c.key
+    """,
+    "export.prune_journal": "DELETE FROM change_journal WHERE seq <= ?",
+    "export.trust_rows": "SELECT slug, name, purpose FROM trusts ORDER BY slug",
+    "export.role_rows": """
+        SELECT t.slug, role_type, party FROM trusts t JOIN roles r ON r.trust_id = t.id
+        ORDER BY t.slug, role_type, party
+    """,
+    "export.asset_rows": """
+        SELECT t.slug, class, descriptor FROM trusts t JOIN assets a ON a.trust_id = t.id
+        ORDER BY t.slug, class, descriptor
+    """,
+    # Board report: one ordered pass per section, merged by trust slug
+    # (core.matrices.trust_sections). The child orders follow their UNIQUE
+    # indexes so none of these sorts.
+    "report.trusts": """
+        SELECT t.id, t.slug, t.name, t.purpose, j.code AS jz
+        FROM trusts t LEFT JOIN jurisdictions j ON j.id = t.jurisdiction_id
+        ORDER BY t.slug
+    """,
+    "report.roles": """
+        SELECT t.slug, r.role_type, r.party, r.powers
+        FROM trusts t JOIN roles r ON r.trust_id = t.id
+        ORDER BY t.slug, r.role_type, r.party
+    """,
+    "report.assets": """
+        SELECT t.slug, a.class, a.descriptor
+        FROM trusts t JOIN assets a ON a.trust_id = t.id
+        ORDER BY t.slug, a.class, a.descriptor
+    """,
+    "report.obligations": """
+        SELECT t.slug, o.name, o.kind, o.schedule, o.authority
+        FROM trusts t JOIN obligations o ON o.trust_id = t.id
+        ORDER BY t.slug, o.name, o.kind
+    """,
+    "report.filings": """
+        SELECT t.slug, f.filing_date, f.status, f.reference, o.name AS obligation
+        FROM trusts t JOIN filings f ON f.trust_id = t.id
+        LEFT JOIN obligations o ON o.id = f.obligation_id
+        ORDER BY t.slug, f.id
+    """,
+    # Columnar export: one table per entity, trust and jurisdiction ids
+    # resolved to their slug/code so each file stands on its own.
+    "columnar.jurisdictions": "SELECT id, code, name FROM jurisdictions ORDER BY code",
+    "columnar.trusts": """
+        SELECT t.id, t.slug, t.name, t.purpose, j.code AS jurisdiction,
+               t.created_at, t.updated_at
+        FROM trusts t LEFT JOIN jurisdictions j ON j.id = t.jurisdiction_id
+        ORDER BY t.slug
+    """,
+    "columnar.roles": """
+        SELECT r.id, t.slug AS trust, r.role_type, r.party, r.powers
+        FROM trusts t JOIN roles r ON r.trust_id = t.id
+        ORDER BY t.slug, r.role_type, r.party
+    """,
+    "columnar.assets": """
+        SELECT a.id, t.slug AS trust, a.class, a.descriptor,
+               j.code AS jurisdiction, a.metadata
+        FROM trusts t JOIN assets a ON a.trust_id = t.id
+        LEFT JOIN jurisdictions j ON j.id = a.jurisdiction_id
+        ORDER BY t.slug, a.class, a.descriptor
+    """,
+    "columnar.obligations": """
+        SELECT o.id, t.slug AS trust, o.name, o.kind, o.schedule, o.authority,
+               o.details
+        FROM trusts t JOIN obligations o ON o.trust_id = t.id
+        ORDER BY t.slug, o.name, o.kind
+    """,
+    "columnar.filings": """
+        SELECT f.id, t.slug AS trust, o.name AS obligation, f.filing_date,
+               f.status, f.reference, f.evidence_path
+        FROM trusts t JOIN filings f ON f.trust_id = t.id
+        LEFT JOIN obligations o ON o.id = f.obligation_id
+        ORDER BY t.slug, f.id
+    """,
+    # Ingest id maps.
+    "ingest.jurisdiction_ids": "SELECT code, id FROM jurisdictions",
+    "ingest.trust_ids": "SELECT slug, id FROM trusts",
+}
+
+_lock = threading.Lock()
+# name -> [calls, seconds, rows]
+_METRICS: Dict[str, List[float]] = {}
+
+
+def _record(name: str, seconds: float, rows: int) -> None:
+    with _lock:
+        m = _METRICS.setdefault(name, [0, 0.0, 0])
+        m[0] += 1
+        m[1] += seconds
+        m[2] += rows
+
+
+def execute(
+    con: sqlite3.Connection, name: str, params: Sequence[Any] = ()
+) -> sqlite3.Cursor:
+    """Run a named write; its rowcount is recorded as rows."""
+    start = time.perf_counter()
+    cur = con.execute(QUERIES[name], params)
+    _record(name, time.perf_counter() - start, max(cur.rowcount, 0))
+    return cur
+
+
+def fetch_one(
+    con: sqlite3.Connection, name: str, params: Sequence[Any] = ()
+) -> Optional[sqlite3.Row]:
+    start = time.perf_counter()
+    row = con.execute(QUERIES[name], params).fetchone()
+    _record(name, time.perf_counter() - start, row is not None)
+    return row
+
+
+def fetch_all(
+    con: sqlite3.Connection, name: str, params: Sequence[Any] = ()
+) -> List[sqlite3.Row]:
+    start = time.perf_counter()
+    rows = con.execute(QUERIES[name], params).fetchall()
+    _record(name, time.perf_counter() - start, len(rows))
+    return rows
+
+
+def iterate(
+    con: sqlite3.Connection, name: str, params: Sequence[Any] = ()
+) -> Generator[sqlite3.Row, None, None]:
+    """
+    Stream a named query's rows. Only time spent inside SQLite is recorded, not
+    the caller's work between rows.
+    """
+    spent, count = 0.0, 0
+    start = time.perf_counter()
+    cur = con.execute(QUERIES[name], params)
+    try:
+        while True:
+            row = cur.fetchone()
+            spent += time.perf_counter() - start
+            if row is None:
+                break
+            count += 1
+            yield row
+            start = time.perf_counter()
+    finally:
+        _record(name, spent, count)
+
+
+def columns(con: sqlite3.Connection, name: str) -> Tuple[str, ...]:
+    """Result column names of a named query, without running it."""
+    sql = f"SELECT * FROM ({QUERIES[name]}) WHERE 0"
+    return tuple(d[0] for d in con.execute(sql, [None] * sql.count("?")).description)
+
+
+def batches(
+    con: sqlite3.Connection, name: str, params: Sequence[Any] = (), size: int = 1000
+) -> Generator[List[Tuple[Any, ...]], None, None]:
+    """
+    Stream a named query's rows as plain tuples (no sqlite3.Row), in lists of up
+    to `size` from fetchmany. Timed like iterate.
+    """
+    spent, count = 0.0, 0
+    start = time.perf_counter()
+    cur = con.cursor()
+    cur.row_factory = None
+    cur.execute(QUERIES[name], params)
+    try:
+        while True:
+            rows = cur.fetchmany(size)
+            spent += time.perf_counter() - start
+            if not rows:
+                break
+            count += len(rows)
+            yield rows
+            start = time.perf_counter()
+    finally:
+        cur.close()
+        _record(name, spent, count)
+
+
+def metrics() -> Dict[str, Dict[str, float]]:
+    """{name: {"calls", "seconds", "rows"}} recorded in this process."""
+    with _lock:
+        return {
+            name: {"calls": m[0], "seconds": m[1], "rows": m[2]}
+            for name, m in _METRICS.items()
+        }
+
+
+def reset_metrics() -> None:
+    with _lock:
+        _METRICS.clear()
+
+
+def log_metrics() -> None:
+    """Log recorded query metrics, slowest total first."""
+    stats = sorted(metrics().items(), key=lambda kv: kv[1]["seconds"], reverse=True)
+    for name, m in stats:
+        LOG.info(
+            "QUERY_STATS: %-28s calls=%d rows=%d total=%.3fms avg=%.1fus",
+            name,
+            m["calls"],
+            m["rows"],
+            m["seconds"] * 1e3,
+            m["seconds"] / m["calls"] * 1e6,
+        )
+
+
+if os.getenv("TRUSTINT_QUERY_STATS") in {"1", "true", "True"}:
+    atexit.register(log_metrics)
@@ -1,13 +1,29 @@
 from __future__ import annotations
 
+import hashlib
+import itertools
 import json
 import sqlite3
 import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
 
+import jsonschema
 import yaml
 
+from core import queries
+from core.connections import MANAGER
+from utils import config_loader
 from utils.logger import get_logger
 from utils.provenance import append_event
 
@@ -21,12 +37,45 @@ CONFIG_DIR = Path(__file__).resolve().parents[1] / "config"
 
 
 def connect(db_path: Path) -> sqlite3.Connection:
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    con = sqlite3.connect(str(db_path), timeout=30.0)
-    con.row_factory = sqlite3.Row
-    con.execute("PRAGMA journal_mode=WAL;")  # Set WAL mode immediately on connection
-    con.execute("PRAGMA foreign_keys=ON;")
-    return con
+    """
+    This thread's long-lived connection to `db_path` (WAL, foreign keys on); see
+    core.connections. Use `with con:` for transactions and do not close it.
+    """
+    return MANAGER.connect(db_path)
+
+
+def reader(db_path: Path) -> ContextManager[sqlite3.Connection]:
+    """Borrow a pooled read-only connection: `with reader(db) as con: ...`."""
+    return MANAGER.reader(db_path)
+
+
+def close_connections() -> None:
+    """Close all pooled connections (also run at interpreter exit)."""
+    MANAGER.close_all()
+
+
+# Re-key search_idx from the base tables (rowid = id * 8 + scope tag); the
+# triggers in schema.sql keep it current from then on.
+_SEARCH_REBUILD_SQL = """
+DELETE FROM search_idx;
+INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT id * 8, 'trusts', slug, name || ' ' || IFNULL(purpose, '') FROM trusts;
+INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT r.id * 8 + 1, 'roles', t.slug, r.role_type || ' ' || r.party
+  FROM roles r JOIN trusts t ON r.trust_id = t.id;
+INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT a.id * 8 + 2, 'assets', t.slug, a.class || ' ' || a.descriptor
+  FROM assets a JOIN trusts t ON a.trust_id = t.id;
+INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT o.id * 8 + 3, 'obligations', t.slug,
+         o.name || ' ' || o.kind || ' ' || IFNULL(o.authority, '')
+  FROM obligations o JOIN trusts t ON o.trust_id = t.id;
+"""
+
+
+def rebuild_search_index(con: sqlite3.Connection) -> None:
+    """Recreate search_idx from the base tables."""
+    con.executescript(_SEARCH_REBUILD_SQL)
 
 
 def init_db(db_path: Path) -> None:
@@ -34,8 +83,14 @@ def init_db(db_path: Path) -> None:
     schema_file_path = SCHEMA_SQL.resolve()
     LOG.info("Opening schema file: %s", schema_file_path)
     with connect(db_path) as con:
+        had_triggers = con.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='trigger' AND name='trusts_fts_ai'"
+        ).fetchone()
         with open(schema_file_path, "r", encoding="utf-8") as f:
             con.executescript(f.read())
+        if not had_triggers:
+            # Index built by the old DELETE-and-rebuild ingest: re-key it once.
+            rebuild_search_index(con)
         con.execute("PRAGMA foreign_keys=ON;")  # Set foreign keys after schema
     LOG.info(
         "DB_WAL_ENABLED: Database initialized with WAL mode and foreign keys enabled."
@@ -47,185 +102,60 @@ def _now_iso() -> str:
 
 
 def _load_yaml(p: Path) -> Any:
-    return yaml.safe_load(p.read_text(encoding="utf-8")) if p.exists() else None
+    return config_loader.load_yaml(p)
 
 
-def ingest_from_config(db_path: Path) -> Dict[str, int]:
+def ingest_from_config(
+    db_path: Path, config_dir: Optional[Path] = None
+) -> Dict[str, int]:
     """
     Ingests YAMLs from config/: jurisdictions (from laws.yaml), trusts, roles, assets, obligations.
-    Populates FTS index.
-    """
-    trusts = _load_yaml(CONFIG_DIR / "trusts.yaml") or []
-    roles = _load_yaml(CONFIG_DIR / "roles.yaml") or []
-    assets = _load_yaml(CONFIG_DIR / "assets.yaml") or []
-    laws = _load_yaml(CONFIG_DIR / "laws.yaml") or {}
-
-    inserted = {
-        "jurisdictions": 0,
-        "trusts": 0,
-        "roles": 0,
-        "assets": 0,
-        "obligations": 0,
-    }
+    The FTS index follows the inserted rows through triggers (see schema.sql).
+    """
+    return ingest_config_docs(db_path, load_config_docs(config_dir))
+
+
+_INGEST_FILES = ("trusts.yaml", "roles.yaml", "assets.yaml", "laws.yaml")
 
+
+def load_config_docs(
+    config_dir: Optional[Path] = None, names: Optional[Iterable[str]] = None
+) -> Dict[str, Any]:
+    """
+    Parse the ingestable config/ YAMLs into {"trusts", "roles", "assets", "laws"}.
+    With `names`, files not listed are left unparsed (and come back empty).
+    """
+    config_dir = config_dir or CONFIG_DIR
+    wanted = set(_INGEST_FILES if names is None else names)
+    docs: Dict[str, Any] = {}
+    for name in _INGEST_FILES:
+        doc = _load_yaml(config_dir / name) if name in wanted else None
+        docs[Path(name).stem] = doc or ({} if name == "laws.yaml" else [])
+    return docs
+
+
+def ingest_config_docs(db_path: Path, docs: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Load parsed config documents (see load_config_docs) in one transaction.
+    Every record is upserted on its natural key with one executemany per entity
+    type, through the same rows and statements as the diff ingest; rows already
+    current are left untouched. Returns row counts per table.
+    """
+    inserted: Dict[str, int] = {}
     with connect(db_path) as con:
         cur = con.cursor()
-
-        # Jurisdictions from laws.yaml: {jurisdictions: [{code,name},...]}
-        jzs: List[Dict[str, str]] = (laws or {}).get("jurisdictions", [])
-        for j in jzs:
-            cur.execute(
-                "INSERT OR IGNORE INTO jurisdictions(code,name) VALUES(?,?)",
-                (j["code"], j["name"]),
-            )
-            if cur.rowcount == 0:
-                LOG.info(
-                    "DB_INGEST_CONFLICT_IGNORED: Jurisdiction '%s' already exists, skipped.",
-                    j["code"],
-                )
-        inserted["jurisdictions"] = cur.execute(
-            "SELECT count(*) c FROM jurisdictions"
-        ).fetchone()["c"]
-
-        # Trusts
-        for t in trusts:
-            cur.execute(
-                """
-                INSERT OR IGNORE INTO trusts(slug,name,purpose,jurisdiction_id,created_at,updated_at)
-                VALUES (?, ?, ?, (SELECT id FROM jurisdictions WHERE code=?), ?, ?)
-            """,
-                (
-                    t["slug"],
-                    t["name"],
-                    t.get("purpose", ""),
-                    t.get("jurisdiction", "NZ"),
-                    _now_iso(),
-                    _now_iso(),
-                ),
-            )
-            if cur.rowcount == 0:
+        for entity, rows in _config_rows(con, docs, _INGEST_FILES):
+            cur.executemany(_UPSERT_SQL[entity], list(rows.values()))
+            unchanged = len(rows) - max(cur.rowcount, 0)
+            if unchanged:
                 LOG.info(
-                    "DB_INGEST_CONFLICT_IGNORED: Trust '%s' already exists, skipped.",
-                    t["slug"],
+                    "DB_INGEST_CONFLICT_IGNORED: %d %s already current, skipped.",
+                    unchanged,
+                    entity,
                 )
-        inserted["trusts"] = cur.execute("SELECT count(*) c FROM trusts").fetchone()[
-            "c"
-        ]
-
-        # Roles
-        for r in roles:
-            cur.execute(
-                """
-              INSERT OR IGNORE INTO roles(trust_id,role_type,party,powers)
-              SELECT id, ?, ?, ?
-              FROM trusts WHERE slug=?
-            """,
-                (
-                    r["role"],
-                    r["party"],
-                    json.dumps(r.get("powers", {}), separators=("", ":")),
-                    r["trust"],
-                ),
-            )
-            if cur.rowcount == 0:
-                LOG.info(
-                    "DB_INGEST_CONFLICT_IGNORED: Role for trust '%s' and party '%s' already exists, skipped.",
-                    r["trust"],
-                    r["party"],
-                )
-        inserted["roles"] = cur.execute("SELECT count(*) c FROM roles").fetchone()["c"]
-
-        # Assets
-        for a in assets:
-            cur.execute(
-                """
-              INSERT OR IGNORE INTO assets(trust_id,class,descriptor,jurisdiction_id,metadata)
-              SELECT id, ?, ?, (SELECT id FROM jurisdictions WHERE code=?), ?
-              FROM trusts WHERE slug=?
-            """,
-                (
-                    a["class"],
-                    a["descriptor"],
-                    a.get("jurisdiction", "NZ"),
-                    json.dumps(a.get("metadata", {}), separators=("", ":")),
-                    a["trust"],
-                ),
-            )
-            if cur.rowcount == 0:
-                LOG.info(
-                    "DB_INGEST_CONFLICT_IGNORED: Asset '%s' for trust '%s' already exists, skipped.",
-                    a["descriptor"],
-                    a["trust"],
-                )
-        inserted["assets"] = cur.execute("SELECT count(*) c FROM assets").fetchone()[
-            "c"
-        ]
-
-        # Obligations: in laws.yaml: {obligations:[{trust, name, kind, schedule, authority, details},...]}
-        for o in (laws or {}).get("obligations", []):
-            cur.execute(
-                """
-              INSERT OR IGNORE INTO obligations(trust_id,name,kind,schedule,authority,details)
-              SELECT id, ?, ?, ?, ?, ?
-              FROM trusts WHERE slug=?
-            """,
-                (
-                    o["name"],
-                    o["kind"],
-                    o.get("schedule", ""),
-                    o.get("authority", ""),
-                    json.dumps(o.get("details", {}), separators=("", ":")),
-                    o["trust"],
-                ),
-            )
-            if cur.rowcount == 0:
-                LOG.info(
-                    "DB_INGEST_CONFLICT_IGNORED: Obligation '%s' for trust '%s' already exists, skipped.",
-                    o["name"],
-                    o["trust"],
-                )
-        inserted["obligations"] = cur.execute(
-            "SELECT count(*) c FROM obligations"
-        ).fetchone()["c"]
-
-        # Rebuild FTS
-        cur.execute("DELETE FROM search_idx")
-        # trusts
-        for row in cur.execute("SELECT slug,name,purpose FROM trusts"):
-            cur.execute(
-                "INSERT INTO search_idx(scope,key,content) VALUES(?,?,?)",
-                ("trusts", row["slug"], f'{row["name"]} {row["purpose"]}'),
-            )
-        # roles
-        for row in cur.execute(
-            "SELECT r.id,t.slug,role_type,party FROM roles r JOIN trusts t ON r.trust_id=t.id"
-        ):
-            cur.execute(
-                "INSERT INTO search_idx(scope,key,content) VALUES(?,?,?)",
-                ("roles", row["slug"], f'{row["role_type"]} {row["party"]}'),
-            )
-        # assets
-        rows = cur.execute(
-            "SELECT a.id,t.slug,class,descriptor FROM assets a JOIN trusts t ON a.trust_id=t.id"
-        ).fetchall()
-        for row in rows:
-            cur.execute(
-                "INSERT INTO search_idx(scope,key,content) VALUES(?,?,?)",
-                ("assets", row["slug"], f'{row["class"]} {row["descriptor"]}'),
-            )
-        # obligations
-        for row in cur.execute(
-            "SELECT o.id,t.slug,o.name,o.kind,o.authority FROM obligations o JOIN trusts t ON o.trust_id=t.id"
-        ):
-            cur.execute(
-                "INSERT INTO search_idx(scope,key,content) VALUES(?,?,?)",
-                (
-                    "obligations",
-                    row["slug"],
-                    f'{row["name"]} {row["kind"]} {row["authority"]}',
-                ),
-            )
-
+            inserted[entity] = cur.execute(
+                f"SELECT count(*) c FROM {entity}"
+            ).fetchone()["c"]
         con.commit()
 
     append_event({"type": "ingest", "source": "config/", "counters": inserted})
@@ -233,12 +163,404 @@ def ingest_from_config(db_path: Path) -> Dict[str, int]:
     return inserted
 
 
+# Same output as json.dumps(obj, separators=(",", ":")) without building an
+# encoder per call.
+_COMPACT_ENCODER = json.JSONEncoder(separators=(",", ":"))
+
+
+def _compact_json(obj: Any) -> str:
+    return "{}" if obj == {} else _COMPACT_ENCODER.encode(obj)
+
+
+# Config ingest: every entity type, in dependency order, with the config file
+# it comes from, the upsert keyed on its natural key, and the delete by natural
+# key. Upserts skip rows whose values are already current, so the FTS triggers
+# only fire on real changes.
+_ENTITY_SOURCES = {
+    "jurisdictions": "laws.yaml",
+    "trusts": "trusts.yaml",
+    "roles": "roles.yaml",
+    "assets": "assets.yaml",
+    "obligations": "laws.yaml",
+}
+
+_UPSERT_SQL = {
+    "jurisdictions": """
+        INSERT INTO jurisdictions(code,name) VALUES (?, ?)
+        ON CONFLICT(code) DO UPDATE SET name = excluded.name
+        WHERE name IS NOT excluded.name
+    """,
+    "trusts": """
+        INSERT INTO trusts(slug,name,purpose,jurisdiction_id,created_at,updated_at)
+        VALUES (?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'),
+                strftime('%Y-%m-%dT%H:%M:%S', 'now', 'localtime'))
+        ON CONFLICT(slug) DO UPDATE SET
+          name = excluded.name, purpose = excluded.purpose,
+          jurisdiction_id = excluded.jurisdiction_id, updated_at = excluded.updated_at
+        WHERE name IS NOT excluded.name OR purpose IS NOT excluded.purpose
+           OR jurisdiction_id IS NOT excluded.jurisdiction_id
+    """,
+    "roles": """
+        INSERT INTO roles(trust_id,role_type,party,powers) VALUES (?, ?, ?, ?)
+        ON CONFLICT(trust_id, role_type, party) DO UPDATE SET powers = excluded.powers
+        WHERE powers IS NOT excluded.powers
+    """,
+    "assets": """
+        INSERT INTO assets(trust_id,class,descriptor,jurisdiction_id,metadata)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(trust_id, class, descriptor) DO UPDATE SET
+          jurisdiction_id = excluded.jurisdiction_id, metadata = excluded.metadata
+        WHERE jurisdiction_id IS NOT excluded.jurisdiction_id
+           OR metadata IS NOT excluded.metadata
+    """,
+    "obligations": """
+        INSERT INTO obligations(trust_id,name,kind,schedule,authority,details)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(trust_id, name, kind) DO UPDATE SET
+          schedule = excluded.schedule, authority = excluded.authority,
+          details = excluded.details
+        WHERE schedule IS NOT excluded.schedule OR authority IS NOT excluded.authority
+           OR details IS NOT excluded.details
+    """,
+}
+
+_DELETE_SQL = {
+    # A jurisdiction still referenced by a trust or asset is kept.
+    "jurisdictions": """
+        DELETE FROM jurisdictions WHERE code = ? AND id NOT IN (
+          SELECT jurisdiction_id FROM trusts WHERE jurisdiction_id IS NOT NULL
+          UNION SELECT jurisdiction_id FROM assets WHERE jurisdiction_id IS NOT NULL)
+    """,
+    "trusts": "DELETE FROM trusts WHERE slug = ?",
+    "roles": """
+        DELETE FROM roles WHERE trust_id = (SELECT id FROM trusts WHERE slug = ?)
+          AND role_type = ? AND party = ?
+    """,
+    "assets": """
+        DELETE FROM assets WHERE trust_id = (SELECT id FROM trusts WHERE slug = ?)
+          AND class = ? AND descriptor = ?
+    """,
+    "obligations": """
+        DELETE FROM obligations WHERE trust_id = (SELECT id FROM trusts WHERE slug = ?)
+          AND name = ? AND kind = ?
+    """,
+}
+
+
+def _id_map(con: sqlite3.Connection, name: str) -> Dict[str, int]:
+    """{natural key: id} from a two-column named query."""
+    return {r[0]: r[1] for r in queries.fetch_all(con, name)}
+
+
+def _file_digest(path: Path) -> str:
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return ""
+
+
+def _role_values(r: Dict[str, Any]) -> tuple:
+    return (_compact_json(r.get("powers", {})),)
+
+
+def _asset_values(a: Dict[str, Any]) -> tuple:
+    return (_compact_json(a.get("metadata", {})),)
+
+
+def _obligation_values(o: Dict[str, Any]) -> tuple:
+    return (
+        o.get("schedule", ""),
+        o.get("authority", ""),
+        _compact_json(o.get("details", {})),
+    )
+
+
+# Per-trust records: natural key fields (after the trust slug), whether the row
+# carries a jurisdiction id next, and the rest of the row.
+_CHILD_SPECS: Dict[
+    str, Tuple[Tuple[str, ...], bool, Callable[[Dict[str, Any]], tuple]]
+] = {
+    "roles": (("role", "party"), False, _role_values),
+    "assets": (("class", "descriptor"), True, _asset_values),
+    "obligations": (("name", "kind"), False, _obligation_values),
+}
+
+
+def _record_row(
+    entity: str,
+    rec: Dict[str, Any],
+    jz_ids: Dict[str, int],
+    trust_ids: Dict[str, int],
+) -> Optional[Tuple[tuple, tuple]]:
+    """
+    (natural key, row as written) for one config record, or None when it
+    belongs to an unknown trust. Rows carry resolved ids.
+    """
+    if entity == "jurisdictions":
+        return (rec["code"],), (rec["code"], rec["name"])
+    if entity == "trusts":
+        jz_id = jz_ids.get(rec.get("jurisdiction", "NZ"))
+        return (rec["slug"],), (rec["slug"], rec["name"], rec.get("purpose", ""), jz_id)
+    fields, located, values = _CHILD_SPECS[entity]
+    trust_id = trust_ids.get(rec["trust"])
+    if trust_id is None:
+        return None
+    natural = tuple(rec[f] for f in fields)
+    jz = (jz_ids.get(rec.get("jurisdiction", "NZ")),) if located else ()
+    return (rec["trust"], *natural), (trust_id, *natural, *jz, *values(rec))
+
+
+def _entity_rows(
+    entity: str,
+    docs: Dict[str, Any],
+    jz_ids: Dict[str, int],
+    trust_ids: Dict[str, int],
+) -> Dict[str, tuple]:
+    """
+    {natural key (JSON array): row as written} for one entity type. Since rows
+    carry resolved ids, a record whose trust or jurisdiction changes identity is
+    rewritten. Records for an unknown trust are left out; the first of
+    duplicate keys wins, as with INSERT OR IGNORE.
+    """
+    if entity in ("jurisdictions", "obligations"):
+        records = docs["laws"].get(entity, [])
+    else:
+        records = docs[entity]
+    rows: Dict[str, tuple] = {}
+    unknown = 0
+    for rec in records:
+        built = _record_row(entity, rec, jz_ids, trust_ids)
+        if built is None:
+            unknown += 1
+            continue
+        rows.setdefault(json.dumps(built[0], ensure_ascii=False), built[1])
+    if unknown:
+        LOG.info(
+            "DB_INGEST_UNKNOWN_TRUST: %d %s reference an unknown trust, skipped.",
+            unknown,
+            entity,
+        )
+    return rows
+
+
+def _config_rows(
+    con: sqlite3.Connection, docs: Dict[str, Any], files: Iterable[str]
+) -> Iterator[Tuple[str, Dict[str, tuple]]]:
+    """
+    (entity, rows) for each entity type sourced from one of `files`, in
+    dependency order. Jurisdiction and trust ids are looked up when the next
+    entity type needs them, so the caller must write each batch before asking
+    for the next.
+    """
+    jz_ids: Dict[str, int] = {}
+    trust_ids: Dict[str, int] = {}
+    for entity, source in _ENTITY_SOURCES.items():
+        if entity == "trusts":
+            jz_ids = _id_map(con, "ingest.jurisdiction_ids")
+        elif entity == "roles":
+            trust_ids = _id_map(con, "ingest.trust_ids")
+        if source in files:
+            yield entity, _entity_rows(entity, docs, jz_ids, trust_ids)
+
+
+def _apply_diff(
+    cur: sqlite3.Cursor, entity: str, rows: Dict[str, tuple], force: bool
+) -> Dict[str, List[str]]:
+    """Write the added/changed rows of one entity type and delete removed ones."""
+    stored = dict(
+        cur.execute(
+            "SELECT key, sha256 FROM ingest_record WHERE entity = ?", (entity,)
+        ).fetchall()
+    )
+    hashes = {
+        key: hashlib.sha256(
+            json.dumps(row, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+        for key, row in rows.items()
+    }
+    diff = {
+        "added": [k for k in rows if k not in stored],
+        "changed": [k for k in rows if k in stored and stored[k] != hashes[k]],
+        "removed": [k for k in stored if k not in rows],
+    }
+    write = list(rows) if force else diff["added"] + diff["changed"]
+
+    cur.executemany(_UPSERT_SQL[entity], [rows[k] for k in write])
+    cur.executemany(
+        _DELETE_SQL[entity], [tuple(json.loads(k)) for k in diff["removed"]]
+    )
+    cur.executemany(
+        "INSERT OR REPLACE INTO ingest_record(entity,key,sha256) VALUES (?, ?, ?)",
+        [(entity, k, hashes[k]) for k in write],
+    )
+    cur.executemany(
+        "DELETE FROM ingest_record WHERE entity = ? AND key = ?",
+        [(entity, k) for k in diff["removed"]],
+    )
+    return diff
+
+
+def ingest_config_diff(
+    db_path: Path, config_dir: Optional[Path] = None, force: bool = False
+) -> Dict[str, Dict[str, int]]:
+    """
+    Change-detecting ingest. Config files whose content hash matches the last
+    ingest are not parsed; for the rest, each record is hashed under its natural
+    key and only added, changed or removed records are written. Edited values
+    (a trust's purpose, an asset's metadata) are applied in place.
+
+    `force` re-parses every file and rewrites every record. Returns
+    {entity: {"added", "changed", "removed"}} counts and appends a compact
+    `ingest_diff` provenance event naming the changed keys.
+    """
+    config_dir = config_dir or CONFIG_DIR
+    digests = {name: _file_digest(config_dir / name) for name in _INGEST_FILES}
+    summary: Dict[str, Dict[str, int]] = {}
+    changes: Dict[str, Dict[str, List[str]]] = {}
+
+    with connect(db_path) as con:
+        cur = con.cursor()
+        seen = dict(cur.execute("SELECT name, sha256 FROM ingest_file").fetchall())
+        dirty = {n for n in _INGEST_FILES if force or digests[n] != seen.get(n)}
+        # Trusts resolve jurisdiction codes and every child resolves its trust
+        # slug, so a change upstream re-checks the files downstream of it.
+        if dirty & {"laws.yaml", "trusts.yaml"}:
+            dirty = set(_INGEST_FILES)
+
+        docs = load_config_docs(config_dir, names=dirty)
+        for entity, rows in _config_rows(con, docs, dirty):
+            diff = _apply_diff(cur, entity, rows, force)
+            summary[entity] = {op: len(keys) for op, keys in diff.items()}
+            if any(diff.values()):
+                changes[entity] = diff
+
+        now = _now_iso()
+        cur.executemany(
+            "INSERT OR REPLACE INTO ingest_file(name,sha256,ingested_at) VALUES (?, ?, ?)",
+            [(n, digests[n], now) for n in sorted(dirty)],
+        )
+        con.commit()
+
+    event: Dict[str, Any] = {
+        "type": "ingest_diff",
+        "source": "config/",
+        "files": sorted(dirty),
+    }
+    for op in ("added", "changed", "removed"):
+        # Additions are counted (a first ingest adds everything); edits and
+        # removals are listed by natural key.
+        event[op] = {
+            entity: len(diff[op]) if op == "added" else diff[op]
+            for entity, diff in changes.items()
+            if diff[op]
+        }
+    append_event(event)
+    LOG.info("Diff ingest complete: files=%s %s", sorted(dirty), summary)
+    return summary
+
+
+STREAM_CHUNK = 5000
+
+
+def iter_records(source: Path) -> Iterator[Dict[str, Any]]:
+    """
+    Read records from `source` one at a time: JSONL (one object per line), or a
+    multi-document YAML stream where each document is one record or a list of
+    records. Memory stays bounded by the largest document.
+    """
+    with open(source, "r", encoding="utf-8") as f:
+        if source.suffix == ".jsonl":
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{source}:{n}: {e}") from e
+        else:
+            for doc in yaml.load_all(f, Loader=config_loader.SafeLoader):
+                if isinstance(doc, list):
+                    yield from doc
+                elif doc is not None:
+                    yield doc
+
+
+def ingest_stream(
+    db_path: Path,
+    entity: str,
+    source: Path,
+    chunk_size: int = STREAM_CHUNK,
+    progress: Optional[Callable[[int, float], None]] = None,
+) -> Dict[str, int]:
+    """
+    Stream `entity` records from a JSONL or multi-document YAML `source` into the
+    database in chunks of `chunk_size`: each chunk is validated (see
+    core.lattice.check_record), upserted on natural keys and committed, so
+    memory stays constant however large the source is. Invalid records and
+    records for unknown trusts are counted and skipped; re-running a source is
+    idempotent. `progress(records_read, elapsed_seconds)` is called per chunk.
+    """
+    from core.lattice import check_record
+
+    if entity not in _UPSERT_SQL:
+        raise ValueError(f"Unknown entity {entity!r}")
+    counts = {"read": 0, "written": 0, "invalid": 0, "unknown_trust": 0}
+    start = time.perf_counter()
+    records = iter_records(source)
+    with connect(db_path) as con:
+        jz_ids = _id_map(con, "ingest.jurisdiction_ids")
+        trust_ids = _id_map(con, "ingest.trust_ids")
+        while chunk := list(itertools.islice(records, chunk_size)):
+            rows = []
+            for n, rec in enumerate(chunk, counts["read"] + 1):
+                try:
+                    check_record(entity, rec)
+                except (jsonschema.ValidationError, ValueError) as e:
+                    counts["invalid"] += 1
+                    LOG.warning(
+                        "DB_INGEST_INVALID: %s record %d skipped: %s",
+                        entity,
+                        n,
+                        getattr(e, "message", e),
+                    )
+                    continue
+                built = _record_row(entity, rec, jz_ids, trust_ids)
+                if built is None:
+                    counts["unknown_trust"] += 1
+                else:
+                    rows.append(built[1])
+            con.executemany(_UPSERT_SQL[entity], rows)
+            con.commit()
+            counts["read"] += len(chunk)
+            counts["written"] += len(rows)
+            if progress is not None:
+                progress(counts["read"], time.perf_counter() - start)
+
+    elapsed = time.perf_counter() - start
+    append_event(
+        {
+            "type": "ingest_stream",
+            "entity": entity,
+            "source": source.name,
+            "counters": counts,
+            "seconds": round(elapsed, 3),
+        }
+    )
+    LOG.info(
+        "Stream ingest complete: %s %s in %.1fs (%.0f records/s)",
+        entity,
+        counts,
+        elapsed,
+        counts["read"] / elapsed if elapsed else 0.0,
+    )
+    return counts
+
+
 def search_fts(db_path: Path, query: str, scope: str = "all") -> List[Dict[str, Any]]:
     """Search the FTS index."""
-    with connect(db_path) as con:
-        sql = "SELECT scope, key, content FROM search_idx WHERE content MATCH ?"
-        params = [query]
-        if scope != "all":
-            sql += " AND scope = ?"
-            params.append(scope)
-        return [dict(row) for row in con.execute(sql, tuple(params))]
+    with reader(db_path) as con:
+        if scope == "all":
+            rows = queries.fetch_all(con, "search.all", (query,))
+        else:
+            rows = queries.fetch_all(con, "search.scoped", (query, scope))
+        return [dict(row) for row in rows]
@@ -56,6 +56,13 @@ CREATE TABLE IF NOT EXISTS filings(
   evidence_path TEXT                 -- path into vault/refs/
 );
 
+-- Foreign keys not already leading a UNIQUE constraint (roles, assets and
+-- obligations are covered by theirs), so cascades and jurisdiction checks seek.
+CREATE INDEX IF NOT EXISTS filings_trust_idx ON filings(trust_id);
+CREATE INDEX IF NOT EXISTS filings_obligation_idx ON filings(obligation_id);
+CREATE INDEX IF NOT EXISTS trusts_jurisdiction_idx ON trusts(jurisdiction_id);
+CREATE INDEX IF NOT EXISTS assets_jurisdiction_idx ON assets(jurisdiction_id);
+
 -- Free-text search index for quick discovery
 CREATE VIRTUAL TABLE IF NOT EXISTS search_idx USING fts5(
   scope,                             -- trusts|roles|assets|obligations|filings
@@ -64,6 +71,124 @@ CREATE VIRTUAL TABLE IF NOT EXISTS search_idx USING fts5(
   tokenize='unicode61 remove_diacritics 2'
 );
 
+-- Keep search_idx current with triggers instead of rebuilding it on every ingest.
+-- Each base row owns exactly one index row: rowid = id * 8 + scope tag
+-- (trusts 0, roles 1, assets 2, obligations 3), so an insert, update or delete
+-- touches only that row. INSERT OR IGNORE conflicts fire no trigger, so
+-- re-ingesting an unchanged config writes nothing to the index.
+CREATE TRIGGER IF NOT EXISTS trusts_fts_ai AFTER INSERT ON trusts BEGIN
+  INSERT INTO search_idx(rowid, scope, key, content)
+  VALUES (NEW.id * 8, 'trusts', NEW.slug, NEW.name || ' ' || IFNULL(NEW.purpose, ''));
+END;
+CREATE TRIGGER IF NOT EXISTS trusts_fts_ad AFTER DELETE ON trusts BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8;
+END;
+CREATE TRIGGER IF NOT EXISTS trusts_fts_au AFTER UPDATE OF id, slug, name, purpose ON trusts BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8;
+  INSERT INTO search_idx(rowid, scope, key, content)
+  VALUES (NEW.id * 8, 'trusts', NEW.slug, NEW.name || ' ' || IFNULL(NEW.purpose, ''));
+  -- Child rows are keyed by the trust slug.
+  UPDATE search_idx SET key = NEW.slug
+  WHERE OLD.slug IS NOT NEW.slug AND rowid IN (
+    SELECT id * 8 + 1 FROM roles WHERE trust_id = NEW.id
+    UNION ALL SELECT id * 8 + 2 FROM assets WHERE trust_id = NEW.id
+    UNION ALL SELECT id * 8 + 3 FROM obligations WHERE trust_id = NEW.id
+  );
+END;
+
+CREATE TRIGGER IF NOT EXISTS roles_fts_ai AFTER INSERT ON roles BEGIN
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 1, 'roles', slug, NEW.role_type || ' ' || NEW.party
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+CREATE TRIGGER IF NOT EXISTS roles_fts_ad AFTER DELETE ON roles BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS roles_fts_au AFTER UPDATE OF id, trust_id, role_type, party ON roles BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 1;
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 1, 'roles', slug, NEW.role_type || ' ' || NEW.party
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS assets_fts_ai AFTER INSERT ON assets BEGIN
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 2, 'assets', slug, NEW.class || ' ' || NEW.descriptor
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+CREATE TRIGGER IF NOT EXISTS assets_fts_ad AFTER DELETE ON assets BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 2;
+END;
+CREATE TRIGGER IF NOT EXISTS assets_fts_au AFTER UPDATE OF id, trust_id, class, descriptor ON assets BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 2;
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 2, 'assets', slug, NEW.class || ' ' || NEW.descriptor
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS obligations_fts_ai AFTER INSERT ON obligations BEGIN
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 3, 'obligations', slug,
+         NEW.name || ' ' || NEW.kind || ' ' || IFNULL(NEW.authority, '')
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+CREATE TRIGGER IF NOT EXISTS obligations_fts_ad AFTER DELETE ON obligations BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 3;
+END;
+CREATE TRIGGER IF NOT EXISTS obligations_fts_au AFTER UPDATE OF id, trust_id, name, kind, authority ON obligations BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 3;
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 3, 'obligations', slug,
+         NEW.name || ' ' || NEW.kind || ' ' || IFNULL(NEW.authority, '')
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+
+-- Change-detecting ingest state: the content hash of each config file as last
+-- ingested, and of each record as last written, keyed by its natural key (a
+-- JSON array, e.g. ["whenua-aurora","trustee","PTC Ltd"] for a role).
+CREATE TABLE IF NOT EXISTS ingest_file(
+  name TEXT PRIMARY KEY,             -- trusts.yaml, roles.yaml, assets.yaml, laws.yaml
+  sha256 TEXT NOT NULL,
+  ingested_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ingest_record(
+  entity TEXT NOT NULL,              -- jurisdictions|trusts|roles|assets|obligations
+  key TEXT NOT NULL,
+  sha256 TEXT NOT NULL,
+  PRIMARY KEY(entity, key)
+) WITHOUT ROWID;
+
+-- Change journal for delta exports: one row per changed trust, appended by
+-- triggers and read from a watermark (see core.matrices.export_jsonl_delta).
+CREATE TABLE IF NOT EXISTS change_journal(
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  entity TEXT NOT NULL,              -- trusts
+  key TEXT NOT NULL                  -- natural key of the changed row (trust slug)
+);
+
+CREATE TRIGGER IF NOT EXISTS trusts_journal_ai AFTER INSERT ON trusts BEGIN
+  INSERT INTO change_journal(entity, key) VALUES ('trusts', NEW.slug);
+END;
+CREATE TRIGGER IF NOT EXISTS trusts_journal_ad AFTER DELETE ON trusts BEGIN
+  INSERT INTO change_journal(entity, key) VALUES ('trusts', OLD.slug);
+END;
+CREATE TRIGGER IF NOT EXISTS trusts_journal_au
+AFTER UPDATE OF slug, name, purpose, jurisdiction_id ON trusts
+WHEN OLD.slug IS NOT NEW.slug OR OLD.name IS NOT NEW.name
+  OR OLD.purpose IS NOT NEW.purpose OR OLD.jurisdiction_id IS NOT NEW.jurisdiction_id
+BEGIN
+  INSERT INTO change_journal(entity, key)
+  SELECT 'trusts', OLD.slug WHERE OLD.slug IS NOT NEW.slug;
+  INSERT INTO change_journal(entity, key) VALUES ('trusts', NEW.slug);
+END;
+-- Exported trust rows carry their jurisdiction's code.
+CREATE TRIGGER IF NOT EXISTS jurisdictions_journal_au AFTER UPDATE OF code ON jurisdictions
+WHEN OLD.code IS NOT NEW.code BEGIN
+  INSERT INTO change_journal(entity, key)
+  SELECT 'trusts', slug FROM trusts WHERE jurisdiction_id = NEW.id;
+END;
+
 -- A table to track the current schema version of the database.
 CREATE TABLE IF NOT EXISTS schema_version (
   version INTEGER NOT NULL UNIQUE
@@ -0,0 +1,86 @@
+-- Incremental FTS maintenance.
+--
+-- Re-key search_idx so every row's rowid is derived from its base row, then
+-- install the triggers that keep it current. Replaces the DELETE-and-rebuild
+-- previously run at the end of every ingest.
+
+DELETE FROM search_idx;
+INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT id * 8, 'trusts', slug, name || ' ' || IFNULL(purpose, '') FROM trusts;
+INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT r.id * 8 + 1, 'roles', t.slug, r.role_type || ' ' || r.party
+  FROM roles r JOIN trusts t ON r.trust_id = t.id;
+INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT a.id * 8 + 2, 'assets', t.slug, a.class || ' ' || a.descriptor
+  FROM assets a JOIN trusts t ON a.trust_id = t.id;
+INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT o.id * 8 + 3, 'obligations', t.slug,
+         o.name || ' ' || o.kind || ' ' || IFNULL(o.authority, '')
+  FROM obligations o JOIN trusts t ON o.trust_id = t.id;
+
+CREATE TRIGGER IF NOT EXISTS trusts_fts_ai AFTER INSERT ON trusts BEGIN
+  INSERT INTO search_idx(rowid, scope, key, content)
+  VALUES (NEW.id * 8, 'trusts', NEW.slug, NEW.name || ' ' || IFNULL(NEW.purpose, ''));
+END;
+CREATE TRIGGER IF NOT EXISTS trusts_fts_ad AFTER DELETE ON trusts BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8;
+END;
+CREATE TRIGGER IF NOT EXISTS trusts_fts_au AFTER UPDATE OF id, slug, name, purpose ON trusts BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8;
+  INSERT INTO search_idx(rowid, scope, key, content)
+  VALUES (NEW.id * 8, 'trusts', NEW.slug, NEW.name || ' ' || IFNULL(NEW.purpose, ''));
+  -- Child rows are keyed by the trust slug.
+  UPDATE search_idx SET key = NEW.slug
+  WHERE OLD.slug IS NOT NEW.slug AND rowid IN (
+    SELECT id * 8 + 1 FROM roles WHERE trust_id = NEW.id
+    UNION ALL SELECT id * 8 + 2 FROM assets WHERE trust_id = NEW.id
+    UNION ALL SELECT id * 8 + 3 FROM obligations WHERE trust_id = NEW.id
+  );
+END;
+
+CREATE TRIGGER IF NOT EXISTS roles_fts_ai AFTER INSERT ON roles BEGIN
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 1, 'roles', slug, NEW.role_type || ' ' || NEW.party
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+CREATE TRIGGER IF NOT EXISTS roles_fts_ad AFTER DELETE ON roles BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 1;
+END;
+CREATE TRIGGER IF NOT EXISTS roles_fts_au AFTER UPDATE OF id, trust_id, role_type, party ON roles BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 1;
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 1, 'roles', slug, NEW.role_type || ' ' || NEW.party
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS assets_fts_ai AFTER INSERT ON assets BEGIN
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 2, 'assets', slug, NEW.class || ' ' || NEW.descriptor
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+CREATE TRIGGER IF NOT EXISTS assets_fts_ad AFTER DELETE ON assets BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 2;
+END;
+CREATE TRIGGER IF NOT EXISTS assets_fts_au AFTER UPDATE OF id, trust_id, class, descriptor ON assets BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 2;
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 2, 'assets', slug, NEW.class || ' ' || NEW.descriptor
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS obligations_fts_ai AFTER INSERT ON obligations BEGIN
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 3, 'obligations', slug,
+         NEW.name || ' ' || NEW.kind || ' ' || IFNULL(NEW.authority, '')
+  FROM trusts WHERE id = NEW.trust_id;
+END;
+CREATE TRIGGER IF NOT EXISTS obligations_fts_ad AFTER DELETE ON obligations BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 3;
+END;
+CREATE TRIGGER IF NOT EXISTS obligations_fts_au AFTER UPDATE OF id, trust_id, name, kind, authority ON obligations BEGIN
+  DELETE FROM search_idx WHERE rowid = OLD.id * 8 + 3;
+  INSERT INTO search_idx(rowid, scope, key, content)
+  SELECT NEW.id * 8 + 3, 'obligations', slug,
+         NEW.name || ' ' || NEW.kind || ' ' || IFNULL(NEW.authority, '')
+  FROM trusts WHERE id = NEW.trust_id;
+END;
@@ -0,0 +1,18 @@
+-- Change-detecting ingest.
+--
+-- Per-file and per-record content hashes recorded by `trustint ingest`, so a
+-- re-run skips unchanged config files and writes only the records that were
+-- added, changed or removed.
+
+CREATE TABLE IF NOT EXISTS ingest_file(
+  name TEXT PRIMARY KEY,
+  sha256 TEXT NOT NULL,
+  ingested_at TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS ingest_record(
+  entity TEXT NOT NULL,
+  key TEXT NOT NULL,
+  sha256 TEXT NOT NULL,
+  PRIMARY KEY(entity, key)
+) WITHOUT ROWID;
@@ -0,0 +1,19 @@
+-- Indexes for foreign keys and hot lookups.
+--
+-- roles, assets and obligations already have trust_id as the leading column of
+-- their UNIQUE constraints, so per-trust lookups use those indexes. What was
+-- left scanning: cascades from trusts/obligations into filings, jurisdiction
+-- references, the open-ticket queries behind `quarantine list` and
+-- `inbox status`, and inbox rows looked up by ticket.
+
+CREATE INDEX IF NOT EXISTS filings_trust_idx ON filings(trust_id);
+CREATE INDEX IF NOT EXISTS filings_obligation_idx ON filings(obligation_id);
+CREATE INDEX IF NOT EXISTS trusts_jurisdiction_idx ON trusts(jurisdiction_id);
+CREATE INDEX IF NOT EXISTS assets_jurisdiction_idx ON assets(jurisdiction_id);
+
+-- Open tickets only, in the order they are listed; resolved tickets drop out.
+CREATE INDEX IF NOT EXISTS quarantine_open_idx
+  ON quarantine_ticket(created_at) WHERE resolved_at IS NULL;
+
+CREATE INDEX IF NOT EXISTS inbox_log_ticket_idx
+  ON inbox_log(ticket_id) WHERE ticket_id IS NOT NULL;
@@ -0,0 +1,33 @@
+-- Change journal for delta exports.
+--
+-- Triggers append one row per changed trust (by slug) to change_journal, so
+-- `trustint export-delta` can write only the trusts changed since its last
+-- watermark instead of the whole feed. Compaction prunes the journal.
+
+CREATE TABLE IF NOT EXISTS change_journal(
+  seq INTEGER PRIMARY KEY AUTOINCREMENT,
+  entity TEXT NOT NULL,              -- trusts
+  key TEXT NOT NULL                  -- natural key of the changed row (trust slug)
+);
+
+CREATE TRIGGER IF NOT EXISTS trusts_journal_ai AFTER INSERT ON trusts BEGIN
+  INSERT INTO change_journal(entity, key) VALUES ('trusts', NEW.slug);
+END;
+CREATE TRIGGER IF NOT EXISTS trusts_journal_ad AFTER DELETE ON trusts BEGIN
+  INSERT INTO change_journal(entity, key) VALUES ('trusts', OLD.slug);
+END;
+CREATE TRIGGER IF NOT EXISTS trusts_journal_au
+AFTER UPDATE OF slug, name, purpose, jurisdiction_id ON trusts
+WHEN OLD.slug IS NOT NEW.slug OR OLD.name IS NOT NEW.name
+  OR OLD.purpose IS NOT NEW.purpose OR OLD.jurisdiction_id IS NOT NEW.jurisdiction_id
+BEGIN
+  INSERT INTO change_journal(entity, key)
+  SELECT 'trusts', OLD.slug WHERE OLD.slug IS NOT NEW.slug;
+  INSERT INTO change_journal(entity, key) VALUES ('trusts', NEW.slug);
+END;
+-- Exported trust rows carry their jurisdiction's code.
+CREATE TRIGGER IF NOT EXISTS jurisdictions_journal_au AFTER UPDATE OF code ON jurisdictions
+WHEN OLD.code IS NOT NEW.code BEGIN
+  INSERT INTO change_journal(entity, key)
+  SELECT 'trusts', slug FROM trusts WHERE jurisdiction_id = NEW.id;
+END;
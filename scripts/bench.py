@@ -0,0 +1,500 @@
+"""
+Micro-benchmarks for TRUSTINT hot paths.
+
+Each command builds its fixtures in a temporary directory and never touches
+the real vault.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+import click
+import yaml
+
+from utils import config_loader, provenance
+
+BENCH_KEY = b"\x01" * provenance.KEY_LEN_BYTES
+
+
+def _seed_ledger(path: Path, lines: int) -> None:
+    """Write `lines` synthetic ledger records (macs are placeholders, not a valid chain)."""
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(lines):
+            mac = f"{i:064x}"
+            f.write(
+                json.dumps({"event": "SEED", "n": i, "prev": "", "mac": mac}) + "\n"
+            )
+
+
+@click.group()
+def cli():
+    """Micro-benchmarks for TRUSTINT hot paths."""
+
+
+@cli.command("append")
+@click.option(
+    "--sizes",
+    default="10,100000,1000000",
+    show_default=True,
+    help="Comma-separated pre-existing ledger sizes (lines).",
+)
+@click.option(
+    "--events", default=1000, show_default=True, help="Appends timed per size."
+)
+def bench_append(sizes, events):
+    """Time append_event against ledgers of increasing length."""
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = Path(tmp) / "events.jsonl"
+        original = provenance.LEDGER_PATH
+        provenance.LEDGER_PATH = ledger
+        try:
+            for size in (int(s) for s in sizes.split(",")):
+                _seed_ledger(ledger, size)
+                ledger.with_suffix(".head").unlink(missing_ok=True)
+                start = time.perf_counter()
+                for i in range(events):
+                    provenance.append_event({"event": "BENCH", "n": i}, key=BENCH_KEY)
+                elapsed = time.perf_counter() - start
+                click.echo(
+                    f"ledger={size:>9} lines  {events} appends  "
+                    f"{elapsed * 1e6 / events:8.1f} us/append  "
+                    f"({os.path.getsize(ledger) / 1e6:.1f} MB)"
+                )
+        finally:
+            provenance.LEDGER_PATH = original
+
+
+@cli.command("batch")
+@click.option("--files", default=2000, show_default=True, help="Simulated inbox files.")
+@click.option("--per-file", default=5, show_default=True, help="Events per file.")
+@click.option("--fsync", is_flag=True, help="fsync once per batch.")
+def bench_batch(files, per_file, fsync):
+    """Compare per-event appends with one EventBatch per inbox file."""
+    with tempfile.TemporaryDirectory() as tmp:
+        original = provenance.LEDGER_PATH
+        try:
+            for mode in ("append_event", "EventBatch"):
+                provenance.LEDGER_PATH = Path(tmp) / f"{mode}.jsonl"
+                start = time.perf_counter()
+                for i in range(files):
+                    if mode == "append_event":
+                        for j in range(per_file):
+                            provenance.append_event(
+                                {"event": "BENCH", "n": i, "j": j}, key=BENCH_KEY
+                            )
+                    else:
+                        with provenance.EventBatch(key=BENCH_KEY, fsync=fsync) as b:
+                            for j in range(per_file):
+                                b.append({"event": "BENCH", "n": i, "j": j})
+                elapsed = time.perf_counter() - start
+                click.echo(
+                    f"{mode:<13} {files} files x {per_file} events  "
+                    f"{files / elapsed:10.0f} files/s"
+                )
+        finally:
+            provenance.LEDGER_PATH = original
+
+
+@cli.command("verify")
+@click.option("--lines", default=500000, show_default=True, help="Ledger length.")
+@click.option("--workers", default="1,0", show_default=True, help="0 = all cores.")
+def bench_verify(lines, workers):
+    """Time chain verification in-process versus across a process pool."""
+    from utils import verify
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = Path(tmp) / "events.jsonl"
+        original = provenance.LEDGER_PATH
+        provenance.LEDGER_PATH = ledger
+        try:
+            with provenance.EventBatch(key=BENCH_KEY) as batch:
+                for i in range(lines):
+                    batch.append({"event": "BENCH", "n": i})
+        finally:
+            provenance.LEDGER_PATH = original
+        for w in (int(x) for x in workers.split(",")):
+            start = time.perf_counter()
+            result = verify.verify_chain(ledger, BENCH_KEY, workers=w or None)
+            elapsed = time.perf_counter() - start
+            click.echo(
+                f"workers={w or os.cpu_count()!s:>3}  {result.count} events  "
+                f"{elapsed:6.2f}s  ok={result.ok}"
+            )
+
+
+def _portfolio_docs(trusts: int) -> dict:
+    """Synthetic config docs: `trusts` trusts and 3 roles, 2 assets, 1 obligation each."""
+    slugs = [f"trust-{i:06d}" for i in range(trusts)]
+    return {
+        "trusts": [
+            {"slug": s, "name": s.title(), "purpose": "bench", "jurisdiction": "NZ"}
+            for s in slugs
+        ],
+        "roles": [
+            {"trust": s, "role": role, "party": f"{role} of {s}"}
+            for s in slugs
+            for role in ("trustee", "protector", "beneficiary")
+        ],
+        "assets": [
+            {"trust": s, "class": cls, "descriptor": f"{cls} of {s}"}
+            for s in slugs
+            for cls in ("land", "water")
+        ],
+        "laws": {
+            "jurisdictions": [{"code": "NZ", "name": "New Zealand"}],
+            "obligations": [
+                {"trust": s, "name": "Annual Return", "kind": "compliance"}
+                for s in slugs
+            ],
+        },
+    }
+
+
+def _write_portfolio(config: Path, trusts: int) -> None:
+    """Write _portfolio_docs(trusts) as a config/ directory."""
+    config.mkdir()
+    for name, doc in _portfolio_docs(trusts).items():
+        (config / f"{name}.yaml").write_text(yaml.safe_dump(doc), encoding="utf-8")
+
+
+@cli.command("ingest")
+@click.option("--trusts", default=20000, show_default=True, help="Trusts to ingest.")
+def bench_ingest(trusts):
+    """Time config parsing, the full ingest and the diff ingest."""
+    from core.substrate import (
+        ingest_config_diff,
+        ingest_config_docs,
+        init_db,
+        load_config_docs,
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = Path(tmp) / "config"
+        _write_portfolio(config, trusts)
+        key_file = Path(tmp) / ".hmac_key"
+        key_file.write_bytes(BENCH_KEY)
+        original = provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH
+        original_cache = config_loader.CACHE_DIR
+        env_key = os.environ.pop("TRUSTINT_HMAC_KEY", None)
+        provenance.LEDGER_PATH = Path(tmp) / "events.jsonl"
+        provenance.DEFAULT_KEY_PATH = key_file
+        config_loader.CACHE_DIR = Path(tmp) / "cache"
+        try:
+            for label in ("yaml parse", "cached parse"):
+                start = time.perf_counter()
+                docs = load_config_docs(config)
+                click.echo(f"{label:<14} {time.perf_counter() - start:13.2f}s")
+            ingests = {
+                "full ingest": lambda db: ingest_config_docs(db, docs),
+                "diff ingest": lambda db: ingest_config_diff(db, config_dir=config),
+            }
+            for label, ingest in ingests.items():
+                db_path = Path(tmp) / f"{label.split()[0]}.db"
+                init_db(db_path)
+                start = time.perf_counter()
+                ingest(db_path)
+                elapsed = time.perf_counter() - start
+                click.echo(f"{label:<14} {elapsed:13.2f}s")
+        finally:
+            provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH = original
+            config_loader.CACHE_DIR = original_cache
+            if env_key is not None:
+                os.environ["TRUSTINT_HMAC_KEY"] = env_key
+
+
+@cli.command("stream")
+@click.option(
+    "--sizes",
+    default="10000,100000",
+    show_default=True,
+    help="Comma-separated assets.jsonl sizes (records).",
+)
+@click.option("--chunk-size", default=5000, show_default=True)
+def bench_stream(sizes, chunk_size):
+    """Stream assets.jsonl sources of growing size; peak memory should stay flat."""
+    import tracemalloc
+
+    from core.substrate import ingest_stream, init_db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        key_file = Path(tmp) / ".hmac_key"
+        key_file.write_bytes(BENCH_KEY)
+        original = provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH
+        env_key = os.environ.pop("TRUSTINT_HMAC_KEY", None)
+        provenance.LEDGER_PATH = Path(tmp) / "events.jsonl"
+        provenance.DEFAULT_KEY_PATH = key_file
+        try:
+            for size in (int(s) for s in sizes.split(",")):
+                source = Path(tmp) / f"assets-{size}.jsonl"
+                with open(source, "w", encoding="utf-8") as f:
+                    for i in range(size):
+                        asset = {
+                            "trust": "bench-trust",
+                            "class": "land",
+                            "descriptor": f"Lot {i} DP {i * 7 % 99991}",
+                            "jurisdiction": "NZ",
+                            "metadata": {"area_ha": i % 500},
+                        }
+                        f.write(json.dumps(asset) + "\n")
+                db_path = Path(tmp) / f"stream-{size}.db"
+                init_db(db_path)
+                with sqlite3.connect(db_path) as con:
+                    con.execute(
+                        "INSERT INTO trusts(slug,name,created_at,updated_at)"
+                        " VALUES ('bench-trust', 'Bench Trust', '', '')"
+                    )
+                tracemalloc.start()
+                start = time.perf_counter()
+                counts = ingest_stream(db_path, "assets", source, chunk_size)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                click.echo(
+                    f"records={size:>9}  written={counts['written']:>9}  "
+                    f"{size / elapsed:9,.0f} records/s  peak {peak / 1e6:6.1f} MB"
+                )
+        finally:
+            provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH = original
+            if env_key is not None:
+                os.environ["TRUSTINT_HMAC_KEY"] = env_key
+
+
+@cli.command("pragmas")
+@click.option("--trusts", default=20000, show_default=True, help="Trusts to ingest.")
+@click.option(
+    "--page-sizes",
+    default="4096,8192,16384",
+    show_default=True,
+    help="Comma-separated.",
+)
+@click.option("--commits", default=500, show_default=True, help="Small transactions.")
+def bench_pragmas(trusts, page_sizes, commits):
+    """Time ingest, export scans, point reads and small commits per DB profile."""
+    from core.connections import MANAGER, PROFILES
+    from core.substrate import connect, ingest_config_docs, init_db, reader
+
+    docs = _portfolio_docs(trusts)
+    slugs = [t["slug"] for t in docs["trusts"]]
+    with tempfile.TemporaryDirectory() as tmp:
+        key_file = Path(tmp) / ".hmac_key"
+        key_file.write_bytes(BENCH_KEY)
+        original = provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH
+        original_profile = MANAGER.profile, dict(PROFILES)
+        env_key = os.environ.pop("TRUSTINT_HMAC_KEY", None)
+        provenance.LEDGER_PATH = Path(tmp) / "events.jsonl"
+        provenance.DEFAULT_KEY_PATH = key_file
+        click.echo(
+            f"{'profile':<8} {'page':>6} {'ingest':>8} {'scan':>8} "
+            f"{'lookups':>8} {'commits':>8}"
+        )
+        try:
+            for profile in PROFILES:
+                for page_size in (int(p) for p in page_sizes.split(",")):
+                    PROFILES[profile] = {**PROFILES[profile], "page_size": page_size}
+                    MANAGER.set_profile(profile)
+                    db_path = Path(tmp) / f"{profile}-{page_size}.db"
+                    init_db(db_path)
+
+                    start = time.perf_counter()
+                    ingest_config_docs(db_path, docs)
+                    ingest = time.perf_counter() - start
+
+                    MANAGER.close_all()  # cold-ish scan through a fresh reader
+                    start = time.perf_counter()
+                    with reader(db_path) as con:
+                        for _ in con.execute(
+                            "SELECT t.slug, a.class, a.descriptor, j.code"
+                            " FROM assets a JOIN trusts t ON a.trust_id = t.id"
+                            " LEFT JOIN jurisdictions j ON a.jurisdiction_id = j.id"
+                        ):
+                            pass
+                    scan = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    with reader(db_path) as con:
+                        for slug in slugs[::2]:
+                            con.execute(
+                                "SELECT r.party FROM roles r JOIN trusts t"
+                                " ON r.trust_id = t.id WHERE t.slug = ?",
+                                (slug,),
+                            ).fetchall()
+                    lookups = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    for i in range(commits):
+                        with connect(db_path) as con:
+                            con.execute(
+                                "UPDATE trusts SET purpose = ? WHERE slug = ?",
+                                (f"rev {i}", slugs[i % len(slugs)]),
+                            )
+                    small = time.perf_counter() - start
+                    click.echo(
+                        f"{profile:<8} {page_size:>6} {ingest:7.2f}s {scan:7.2f}s "
+                        f"{lookups:7.2f}s {small:7.2f}s"
+                    )
+        finally:
+            provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH = original
+            MANAGER.set_profile(original_profile[0])
+            PROFILES.update(original_profile[1])
+            MANAGER.close_all()
+            if env_key is not None:
+                os.environ["TRUSTINT_HMAC_KEY"] = env_key
+
+
+@cli.command("report")
+@click.option(
+    "--sizes",
+    default="2000,8000,32000",
+    show_default=True,
+    help="Comma-separated portfolio sizes (trusts).",
+)
+def bench_report(sizes):
+    """Board report: per-trust lookups (N+1) vs the single-pass section merge."""
+    from core import matrices
+    from core.substrate import ingest_config_docs, init_db, reader
+
+    with tempfile.TemporaryDirectory() as tmp:
+        key_file = Path(tmp) / ".hmac_key"
+        key_file.write_bytes(BENCH_KEY)
+        original = provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH
+        env_key = os.environ.pop("TRUSTINT_HMAC_KEY", None)
+        provenance.LEDGER_PATH = Path(tmp) / "events.jsonl"
+        provenance.DEFAULT_KEY_PATH = key_file
+        try:
+            for size in (int(s) for s in sizes.split(",")):
+                db_path = Path(tmp) / f"report-{size}.db"
+                init_db(db_path)
+                ingest_config_docs(db_path, _portfolio_docs(size))
+                with reader(db_path) as con:
+                    start = time.perf_counter()
+                    for t in con.execute("SELECT id FROM trusts ORDER BY slug"):
+                        for table in matrices.REPORT_SECTIONS:
+                            con.execute(
+                                f"SELECT * FROM {table} WHERE trust_id = ?", (t[0],)
+                            ).fetchall()
+                    per_trust = time.perf_counter() - start
+
+                    start = time.perf_counter()
+                    for _ in matrices.trust_sections(con):
+                        pass
+                    merged = time.perf_counter() - start
+                click.echo(
+                    f"trusts={size:>7}  per-trust {per_trust:6.2f}s  "
+                    f"single-pass {merged:6.2f}s  "
+                    f"({size / merged:9,.0f} trusts/s)"
+                )
+        finally:
+            provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH = original
+            if env_key is not None:
+                os.environ["TRUSTINT_HMAC_KEY"] = env_key
+
+
+@cli.command("export")
+@click.option("--trusts", default=50000, show_default=True, help="Portfolio size.")
+def bench_export(trusts):
+    """Time each export format alone, then all of them serially and in parallel."""
+    from core import matrices
+    from core.substrate import ingest_config_docs, init_db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        key_file = Path(tmp) / ".hmac_key"
+        key_file.write_bytes(BENCH_KEY)
+        original = provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH
+        original_paths = matrices.DB_PATH, matrices.DIST
+        env_key = os.environ.pop("TRUSTINT_HMAC_KEY", None)
+        provenance.LEDGER_PATH = Path(tmp) / "events.jsonl"
+        provenance.DEFAULT_KEY_PATH = key_file
+        matrices.DB_PATH = Path(tmp) / "export.db"
+        matrices.DIST = Path(tmp) / "dist"
+        matrices.DIST.mkdir()
+        try:
+            init_db(matrices.DB_PATH)
+            ingest_config_docs(matrices.DB_PATH, _portfolio_docs(trusts))
+            for fmt, write in matrices.WRITERS.items():
+                start = time.perf_counter()
+                write()
+                click.echo(f"{fmt:<16} {time.perf_counter() - start:6.2f}s")
+            for label, workers in (("serial", 1), ("parallel", len(matrices.WRITERS))):
+                start = time.perf_counter()
+                paths = matrices.export_all(workers)
+                matrices.write_checksums(paths)
+                click.echo(
+                    f"{label + ' + sums':<16} {time.perf_counter() - start:6.2f}s"
+                )
+        finally:
+            provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH = original
+            matrices.DB_PATH, matrices.DIST = original_paths
+            if env_key is not None:
+                os.environ["TRUSTINT_HMAC_KEY"] = env_key
+
+
+@cli.command("jsonl")
+@click.option(
+    "--sizes",
+    default="50000,200000",
+    show_default=True,
+    help="Comma-separated portfolio sizes (trusts).",
+)
+def bench_jsonl(sizes):
+    """JSONL export: per-row Row/dict/json.dumps vs fetchmany batches (json, orjson)."""
+    import tracemalloc
+
+    from core import queries
+    from core.substrate import ingest_config_docs, init_db, reader
+    from utils import fast_json
+
+    def per_row(con, out):
+        with open(out, "w", encoding="utf-8") as f:
+            for row in con.execute(queries.QUERIES["export.trusts"]):
+                f.write(json.dumps(dict(row), ensure_ascii=False) + "\n")
+
+    def batched(con, out):
+        with open(out, "wb") as f:
+            encode = fast_json.jsonl_encoder(queries.columns(con, "export.trusts"))
+            for batch in queries.batches(con, "export.trusts", size=5000):
+                f.write(encode(batch))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        key_file = Path(tmp) / ".hmac_key"
+        key_file.write_bytes(BENCH_KEY)
+        original = provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH
+        env_key = os.environ.pop("TRUSTINT_HMAC_KEY", None)
+        orjson = fast_json._orjson
+        provenance.LEDGER_PATH = Path(tmp) / "events.jsonl"
+        provenance.DEFAULT_KEY_PATH = key_file
+        try:
+            for size in (int(s) for s in sizes.split(",")):
+                db_path = Path(tmp) / f"jsonl-{size}.db"
+                init_db(db_path)
+                docs = _portfolio_docs(size)
+                ingest_config_docs(db_path, {**docs, "roles": [], "assets": []})
+                runs = [("per-row", per_row, orjson), ("batched json", batched, None)]
+                if orjson is not None:
+                    runs.append(("batched orjson", batched, orjson))
+                for label, write, backend in runs:
+                    fast_json._orjson = backend
+                    with reader(db_path) as con:
+                        start = time.perf_counter()
+                        write(con, Path(tmp) / "out.jsonl")
+                        elapsed = time.perf_counter() - start
+                        tracemalloc.start()
+                        write(con, Path(tmp) / "out.jsonl")
+                        peak = tracemalloc.get_traced_memory()[1]
+                        tracemalloc.stop()
+                    click.echo(
+                        f"trusts={size:>7}  {label:<15} {elapsed:6.2f}s "
+                        f"{size / elapsed:10,.0f} rows/s  peak {peak / 1e6:6.2f} MB"
+                    )
+        finally:
+            provenance.LEDGER_PATH, provenance.DEFAULT_KEY_PATH = original
+            fast_json._orjson = orjson
+            if env_key is not None:
+                os.environ["TRUSTINT_HMAC_KEY"] = env_key
+
+
+if __name__ == "__main__":
+    cli()
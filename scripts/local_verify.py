@@ -1,82 +1,73 @@
 #!/usr/bin/env python3
 """
 Local end-to-end verifier for a TRUSTINT ledger file.
-- Verifies prev chain and HMACs using vault/.hmac_key
-- Reports first failure with line number; exits 0 on full pass
+- Verifies prev chain and HMACs using vault/.hmac_key (or the given key file)
+- A sealed segment file chains from its own first `prev`, so any segment can
+  be checked on its own
+- Reports first failure with line number; exits 0 on full pass, 1 on a broken
+  chain and 2 on a usage error or missing file
+
+Run from the repository root as
+`python -m scripts.local_verify <ledger.jsonl> [key_file]`.
+Invoked as a plain script from elsewhere, it puts the repository root on
+sys.path itself so `utils` still imports.
 """
 
 import base64
-import hashlib
-import hmac
-import io
 import json
 import os
 import sys
-from typing import Any, Dict
-
-if len(sys.argv) != 2:
-    print("usage: local_verify.py <ledger.jsonl>", file=sys.stderr)
-    sys.exit(2)
-
-LEDGER = sys.argv[1]
-KEY_PATH = "vault/.hmac_key"
-
-if not os.path.exists(LEDGER):
-    print(f"ERR: ledger not found: {LEDGER}", file=sys.stderr)
-    sys.exit(2)
-if not os.path.exists(KEY_PATH):
-    print(f"ERR: key not found: {KEY_PATH}", file=sys.stderr)
-    sys.exit(2)
-
-
-def canon(obj: Dict[str, Any]) -> bytes:
-    # TRUSTINT canonical form: compact separators + sorted keys
-    return json.dumps(obj, separators=(",", ":"), sort_keys=True).encode("utf-8")
-
-
-# load key (base64url, 32 bytes when decoded)
-k = open(KEY_PATH, "rb").read().strip()
-k += b"=" * ((4 - (len(k) % 4)) % 4)
-key = base64.urlsafe_b64decode(k)
-
-prev_mac = None
-count = 0
-
-with io.open(LEDGER, "r", encoding="utf-8", newline="") as f:
-    for idx, line in enumerate(f, start=1):
-        line = line.rstrip("\n")
-        if not line:
-            continue
-        try:
-            obj = json.loads(line)
-        except Exception as e:
-            print(f"FAIL line {idx}: JSON parse error: {e}")
-            sys.exit(1)
-
-        mac_stored = obj.get("mac")
-        if mac_stored is None:
-            print(f"FAIL line {idx}: missing 'mac'")
-            sys.exit(1)
-
-        # Check linkage (if not first record)
-        if prev_mac is not None:
-            if obj.get("prev") != prev_mac:
-                print(
-                    f"FAIL line {idx}: prev mismatch\n  expected: {prev_mac}\n  actual:   {obj.get('prev')}"
-                )
-                sys.exit(1)
-
-        # Compute HMAC over all fields except 'mac'
-        payload = {k: v for k, v in obj.items() if k != "mac"}
-        mac_calc = hmac.new(key, canon(payload), hashlib.sha256).hexdigest()
-
-        if mac_calc.lower() != mac_stored.lower():
-            print(
-                f"FAIL line {idx}: HMAC mismatch\n  mac_file: {mac_stored}\n  mac_calc: {mac_calc}"
-            )
-            sys.exit(1)
-
-        prev_mac = mac_stored
-        count += 1
-
-print(f"PASS: verified {count} events; linkage & HMAC OK")
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from utils.verify import Checkpoint, verify_chain  # noqa: E402
+
+KEY_PATH = str(ROOT / "vault" / ".hmac_key")
+
+
+def main() -> int:
+    if len(sys.argv) not in (2, 3):
+        print(
+            "usage: python -m scripts.local_verify <ledger.jsonl> [key_file]",
+            file=sys.stderr,
+        )
+        return 2
+
+    ledger = sys.argv[1]
+    key_path = sys.argv[2] if len(sys.argv) == 3 else KEY_PATH
+    if not os.path.exists(ledger):
+        print(f"ERR: ledger not found: {ledger}", file=sys.stderr)
+        return 2
+    if not os.path.exists(key_path):
+        print(f"ERR: key not found: {key_path}", file=sys.stderr)
+        return 2
+
+    # load key (base64url, 32 bytes when decoded)
+    k = open(key_path, "rb").read().strip()
+    k += b"=" * ((4 - (len(k) % 4)) % 4)
+    key = base64.urlsafe_b64decode(k)
+
+    # Seed the chain from the first record's prev: "" for a whole ledger, the
+    # previous segment's last mac for a later segment file.
+    with open(ledger, "rb") as f:
+        first = next((raw for raw in f if raw.strip()), b"")
+    try:
+        prev = json.loads(first).get("prev", "") if first else ""
+    except ValueError:
+        prev = ""
+    start = Checkpoint(line=0, offset=0, count=0, mac=str(prev or ""))
+
+    result = verify_chain(Path(ledger), key, start=start)
+    if not result.ok:
+        print(f"FAIL line {result.line}: {result.error}")
+        return 1
+
+    print(f"PASS: verified {result.count} events; linkage & HMAC OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,18 +1,33 @@
 import base64
-import hashlib
-import hmac
 import json
 import os
+from pathlib import Path
 
 import click
 
-from core.matrices import export_csv, export_jsonl, export_markdown, write_checksums
+from core.matrices import export_all, write_checksums
+from utils import merkle
 from utils.logger import get_logger
-from utils.provenance import LEDGER_PATH, load_hmac_key
+from utils.provenance import LEDGER_PATH, load_hmac_key, rotate_ledger
+from utils.provenance import follow as follow_ledger
+from utils.provenance import tail as tail_ledger
+from utils.segments import compress_segment, is_empty, list_segments
+from utils.verify import verify_ledger
 
 LOG = get_logger("prov_tools")
 
 
+def _key_or_abort(announce: bool = False) -> bytes:
+    """Load the ledger HMAC key, echoing where it came from if `announce`."""
+    key, status = load_hmac_key()
+    if not key:
+        LOG.error(f"Failed to load HMAC key: {status}")
+        raise click.Abort()
+    if announce:
+        click.echo(status.replace("PASS: ", ""))
+    return key
+
+
 @click.group()
 def cli():
     """Provenance tools for TRUSTINT."""
@@ -27,51 +42,193 @@ def keygen():
 
 
 @cli.command()
-def chain_verify():
+@click.option(
+    "--workers",
+    type=int,
+    default=None,
+    help="Processes used for MAC checks (default: all cores).",
+)
+@click.option(
+    "--full", is_flag=True, help="Ignore the checkpoint and re-verify from line 1."
+)
+@click.option(
+    "--segment",
+    "seqs",
+    type=int,
+    multiple=True,
+    help="Verify only this segment number (repeatable).",
+)
+@click.option(
+    "--checkpoint",
+    "save",
+    is_flag=True,
+    help="Save a checkpoint at the end of the verified chain for later runs.",
+)
+def chain_verify(workers, full, seqs, save):
     """Verify the integrity of the event chain."""
-    if not LEDGER_PATH.exists():
-        LOG.warning("Ledger file not found. Nothing to verify.")
+    if is_empty(LEDGER_PATH):
+        LOG.warning("Ledger is empty. Nothing to verify.")
         return
 
-    key, status = load_hmac_key()
-    if not key:
-        LOG.error(f"Failed to load HMAC key: {status}")
+    key = _key_or_abort(announce=True)
+    result, start = verify_ledger(
+        LEDGER_PATH, key, full=full, workers=workers, seqs=seqs or None, save=save
+    )
+    if start is not None:
+        click.echo(f"Resumed from checkpoint at line {start.line}.")
+    if not result.ok:
+        LOG.error(f"Chain broken at line {result.line}: {result.error}.")
         raise click.Abort()
-    click.echo(status.replace("PASS: ", ""))
 
-    lines = LEDGER_PATH.read_text(encoding="utf-8").strip().splitlines()
-    last_mac = ""
+    click.echo("Chain verification successful.")
+
+
+@cli.command()
+@click.option("-n", "lines", default=5, show_default=True, help="Lines to show.")
+@click.option(
+    "--follow", "-f", is_flag=True, help="Keep printing events as they are appended."
+)
+def tail(lines, follow):
+    """Print the last events of the provenance ledger."""
+    if not follow:
+        for line in tail_ledger(lines):
+            click.echo(line)
+        return
+    try:
+        for line in follow_ledger(lines):
+            click.echo(line)
+    except KeyboardInterrupt:
+        pass
+
 
-    for i, line in enumerate(lines):
-        try:
-            event = json.loads(line)
-            mac = event.pop("mac")
+@cli.command()
+def segments():
+    """List ledger segments from the manifest."""
+    for seg in list_segments(LEDGER_PATH):
+        if seg.entry is None:
+            size = seg.path.stat().st_size if seg.path.exists() else 0
+            click.echo(f"{seg.seq:>6}  active   lines {seg.first_line}-  {size} bytes")
+            continue
+        e = seg.entry
+        click.echo(
+            f"{seg.seq:>6}  sealed   lines {e['first_line']}-{e['last_line']}  "
+            f"{e['bytes']} bytes  {e['first_ts']} .. {e['last_ts']}  "
+            f"last_mac {e['last_mac'][:16]}"
+        )
 
-            msg = json.dumps(event, sort_keys=True, separators=(",", ":")).encode()
-            expected_mac = hmac.new(key, msg, hashlib.sha256).hexdigest()
 
-            if not hmac.compare_digest(mac, expected_mac):
-                LOG.error(f"Chain broken at line {i+1}: MAC mismatch.")
-                raise click.Abort()
+@cli.command()
+def rotate():
+    """Seal the active ledger as a new segment now."""
+    entry = rotate_ledger()
+    if entry is None:
+        click.echo("Active ledger is empty; nothing to rotate.")
+        return
+    click.echo(f"Sealed segment {entry['seq']} ({entry['file']}).")
 
-            prev_mac = event.get("prev", "")
-            if prev_mac != last_mac:
-                LOG.error(f"Chain broken at line {i+1}: prev MAC mismatch.")
-                raise click.Abort()
 
-            last_mac = mac
-        except (json.JSONDecodeError, KeyError) as e:
-            LOG.error(f"Error decoding JSON at line {i+1}: {e}")
-            raise e
+@cli.command()
+@click.option(
+    "--keep",
+    default=1,
+    show_default=True,
+    help="Leave the most recent N sealed segments uncompressed.",
+)
+def compress(keep):
+    """Compress cold sealed segments (framed gzip, readable in place)."""
+    key = _key_or_abort()
+    sealed = [s for s in list_segments(LEDGER_PATH) if s.sealed]
+    for seg in sealed[: max(len(sealed) - keep, 0)]:
+        entry = compress_segment(LEDGER_PATH, seg.seq, key)
+        if entry is not None:
+            click.echo(
+                f"Compressed segment {seg.seq}: {entry['bytes']} -> "
+                f"{entry['compressed_bytes']} bytes"
+            )
+
+
+@cli.command("merkle-build")
+@click.option(
+    "--rebuild",
+    is_flag=True,
+    help="Start over from the whole ledger; old signed roots are archived first.",
+)
+def merkle_build(rebuild):
+    """Build the Merkle accumulator; appends keep it current afterwards."""
+    key = _key_or_abort()
+    try:
+        if rebuild or not merkle.exists(LEDGER_PATH):
+            leaves = merkle.rebuild(LEDGER_PATH, key)
+        else:
+            merkle.sync(LEDGER_PATH, key)
+            leaves = merkle.tree_size(LEDGER_PATH)
+    except merkle.MerkleMismatch as e:
+        raise click.ClickException(f"{e}; use --rebuild to start over") from e
+    record = merkle.sign_root(LEDGER_PATH, key)
+    click.echo(f"Merkle tree over {leaves} lines; root {record['root']}.")
 
-    click.echo("Chain verification successful.")
+
+@cli.command()
+@click.argument("line", type=int)
+@click.option(
+    "--out",
+    type=click.Path(dir_okay=False, path_type=Path),
+    help="Write the proof here instead of stdout.",
+)
+@click.option(
+    "--size", type=int, help="Prove against the signed root over this many lines."
+)
+def prove(line, out, size):
+    """Produce an inclusion proof for ledger LINE against a signed root."""
+    key = _key_or_abort()
+    try:
+        proof = merkle.prove(LEDGER_PATH, line, key, size=size)
+    except ValueError as e:
+        raise click.ClickException(str(e)) from e
+    text = json.dumps(proof, indent=2)
+    if out:
+        out.write_text(text + "\n", encoding="utf-8")
+        click.echo(f"Proof for line {line} written to {out}.")
+    else:
+        click.echo(text)
+
+
+@cli.command("check-proof")
+@click.argument(
+    "proof_file", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@click.option(
+    "--root",
+    "root_hex",
+    help="Root hash obtained out of band; checks the proof against it without a key.",
+)
+def check_proof(proof_file, root_hex):
+    """
+    Check an inclusion proof produced by `prove`.
+
+    With --root, the audit path is checked against that root hash and no key
+    is needed. Without it, the proof's own root is trusted by its HMAC, which
+    needs the ledger key.
+    """
+    proof = json.loads(proof_file.read_text(encoding="utf-8"))
+    if root_hex:
+        ok, against = merkle.verify_inclusion(proof, root_hex), "the given root"
+    else:
+        ok, against = merkle.verify_proof(proof, _key_or_abort()), "the signed root"
+    if not ok:
+        LOG.error("Inclusion proof is invalid.")
+        raise click.Abort()
+    click.echo(
+        f"Line {proof['line']} is included in {against} over "
+        f"{proof['root']['size']} lines."
+    )
 
 
 @cli.command()
 def checksums():
     """Regenerate all checksums for exported files."""
     try:
-        paths = [export_jsonl(), export_csv(), export_markdown()]
+        paths = export_all()
         write_checksums(paths)
         LOG.info("Checksums regenerated successfully.")
     except Exception as e:
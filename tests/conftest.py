@@ -2,6 +2,16 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _config_cache(tmp_path, monkeypatch):
+    """Keep parsed-config pickles out of the repository vault."""
+    from utils import config_loader
+
+    monkeypatch.setattr(config_loader, "CACHE_DIR", tmp_path / "config-cache")
@@ -0,0 +1,76 @@
+import os
+import pickle
+
+import pytest
+import yaml
+
+from utils import config_loader
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    path = tmp_path / "cache"
+    monkeypatch.setattr(config_loader, "CACHE_DIR", path)
+    return path
+
+
+def test_cache_skips_parsing_until_file_changes(tmp_path, cache_dir, monkeypatch):
+    src = tmp_path / "trusts.yaml"
+    src.write_text("- slug: alpha\n  since: 2024-01-02\n")
+    first = config_loader.load_yaml(src)
+    assert len(list(cache_dir.glob("*.pickle"))) == 1
+
+    with monkeypatch.context() as m:
+        m.setattr(config_loader, "parse_yaml", None)
+        assert config_loader.load_yaml(src) == first
+
+    src.write_text("- slug: beta\n")
+    assert config_loader.load_yaml(src) == [{"slug": "beta"}]
+    assert config_loader.load_yaml(tmp_path / "missing.yaml") is None
+
+
+def test_bad_cache_entries_are_reparsed(tmp_path, cache_dir):
+    src = tmp_path / "roles.yaml"
+    src.write_text("- role: trustee\n")
+    config_loader.load_yaml(src)
+    (entry,) = cache_dir.glob("*.pickle")
+
+    entry.write_bytes(b"not a pickle")
+    assert config_loader.load_yaml(src) == [{"role": "trustee"}]
+
+    # Only the datetime types safe_load produces may be unpickled.
+    entry.write_bytes(
+        pickle.dumps(str(src.resolve()))
+        + pickle.dumps((config_loader._file_sig(src), os.getcwd))
+    )
+    assert config_loader.load_yaml(src) == [{"role": "trustee"}]
+
+
+def test_entries_for_removed_sources_are_pruned(tmp_path, cache_dir):
+    gone, kept = tmp_path / "gone.yaml", tmp_path / "kept.yaml"
+    gone.write_text("a: 1\n")
+    kept.write_text("b: 2\n")
+    config_loader.load_yaml(gone)
+    config_loader.load_yaml(kept)
+    (cache_dir / "junk.pickle").write_bytes(b"junk")
+    assert len(list(cache_dir.glob("*.pickle"))) == 3
+
+    gone.unlink()
+    kept.write_text("b: 3\n")
+    assert config_loader.load_yaml(kept) == {"b": 3}
+    assert list(cache_dir.glob("*.pickle")) == [
+        config_loader._cache_path(str(kept.resolve()))
+    ]
+
+
+def test_readonly_writes_no_cache(tmp_path, cache_dir, monkeypatch):
+    monkeypatch.setenv("TRUSTINT_READONLY", "1")
+    src = tmp_path / "laws.yaml"
+    src.write_text("jurisdictions: []\n")
+    assert config_loader.load_yaml(src) == {"jurisdictions": []}
+    assert not cache_dir.exists()
+
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason="PyYAML built without libyaml")
+def test_uses_libyaml():
+    assert config_loader.SafeLoader is yaml.CSafeLoader
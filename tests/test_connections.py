@@ -0,0 +1,136 @@
+import gc
+import os
+import sqlite3
+import threading
+from contextlib import closing
+
+import pytest
+from click.testing import CliRunner
+
+from core.connections import PROFILES, ConnectionManager, profile_mismatches
+from scripts.trustint import cli
+
+
+@pytest.fixture
+def manager():
+    mgr = ConnectionManager(pool_size=1)
+    yield mgr
+    mgr.close_all()
+
+
+def test_writer_is_reused_per_thread(manager, tmp_path):
+    db = tmp_path / "sub" / "t.db"
+    con = manager.connect(db)
+    assert manager.connect(db) is con
+    assert con.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    assert con.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(manager.connect(db)))
+    t.start()
+    t.join()
+    assert other[0] is not con
+
+    con.close()
+    assert manager.connect(db) is not con
+
+
+def test_writer_follows_a_recreated_database(manager, tmp_path):
+    db = tmp_path / "t.db"
+    with manager.connect(db) as con:
+        con.execute("CREATE TABLE a(x)")
+    for suffix in ("", "-wal", "-shm"):
+        db.with_name(db.name + suffix).unlink(missing_ok=True)
+    fresh = manager.connect(db)
+    assert fresh is not con
+    assert fresh.execute("SELECT count(*) FROM sqlite_master").fetchone()[0] == 0
+
+
+def test_reader_pool(manager, tmp_path):
+    db = tmp_path / "t.db"
+    with manager.connect(db) as con:
+        con.execute("CREATE TABLE a(x)")
+        con.execute("INSERT INTO a VALUES (1)")
+
+    with manager.reader(db) as r1:
+        assert r1.execute("SELECT x FROM a").fetchone()["x"] == 1
+        with pytest.raises(sqlite3.OperationalError):
+            r1.execute("INSERT INTO a VALUES (2)")
+        with manager.reader(db) as r2:
+            assert r2 is not r1
+    # pool_size=1: r2 went back to the pool first, so r1 was closed.
+    with pytest.raises(sqlite3.ProgrammingError):
+        r1.execute("SELECT 1")
+    with manager.reader(db) as again:
+        assert again is r2
+
+    manager.close_all()
+    with pytest.raises(sqlite3.ProgrammingError):
+        r2.execute("SELECT 1")
+
+
+def test_profiles(manager, tmp_path, monkeypatch):
+    monkeypatch.setitem(PROFILES, "bulk", {**PROFILES["bulk"], "page_size": 8192})
+    manager.set_profile("bulk")
+    db = tmp_path / "t.db"
+    con = manager.connect(db)
+    with con:
+        con.execute("CREATE TABLE a(x)")
+    assert profile_mismatches(con, "bulk") == {}
+    assert con.execute("PRAGMA page_size").fetchone()[0] == 8192
+
+    # Switching applies to pooled connections on their next checkout.
+    manager.set_profile("safe")
+    assert manager.connect(db) is con
+    assert profile_mismatches(con, "safe") == {"page_size": (4096, 8192)}
+    with manager.reader(db) as ro:
+        assert ro.execute("PRAGMA synchronous").fetchone()[0] == 2
+
+    with pytest.raises(ValueError):
+        manager.set_profile("turbo")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs os.fork")
+def test_forked_child_leaves_parent_connections_open(manager, tmp_path):
+    db = tmp_path / "t.db"
+    with manager.connect(db) as con:
+        con.execute("CREATE TABLE a(x)")
+        con.execute("INSERT INTO a VALUES (1)")
+    with manager.reader(db) as ro:
+        ro.execute("SELECT COUNT(*) FROM a").fetchone()
+    del con, ro
+
+    def live():
+        return sum(isinstance(o, sqlite3.Connection) for o in gc.get_objects())
+
+    pid = os.fork()
+    if pid == 0:  # child: drop the inherited pool and let GC run
+        code = 1
+        try:
+            before = live()
+            manager.forget_all()
+            gc.collect()
+            code = 0 if live() == before else 2
+        finally:
+            os._exit(code)
+    assert os.waitpid(pid, 0)[1] == 0
+    assert db.with_name(db.name + "-wal").exists()
+
+    with manager.connect(db) as con:
+        con.execute("INSERT INTO a VALUES (2)")
+    assert db.with_name(db.name + "-wal").exists()
+    with manager.reader(db) as ro:
+        assert ro.execute("SELECT COUNT(*) FROM a").fetchone()[0] == 2
+
+
+def test_doctor_reads_database_settings_on_a_plain_connection(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", tmp_path / "events.jsonl")
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", "A" * 43)
+    db = tmp_path / "t.db"
+    with closing(sqlite3.connect(db)) as con:
+        con.execute("PRAGMA page_size=8192")
+        con.execute("CREATE TABLE a(x)")
+    out = CliRunner().invoke(cli, ["--db", str(db), "doctor"]).output
+    assert "DB Journal Mode (WAL)         : FAIL (Current: DELETE)" in out
+    assert "WARN (8192, profile wants 4096" in out
+    assert "DB Foreign Keys (ON)          : PASS" in out
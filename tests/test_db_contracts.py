@@ -1,3 +1,5 @@
+import sqlite3
+from contextlib import closing
 from pathlib import Path
 
 from core.substrate import connect, ingest_from_config, init_db
@@ -78,3 +80,44 @@ class TestDbContracts:
 
         # If duplicates occur, ingest should log ignored conflicts.
         # Bronze-level tests do not assert on log contents.
+
+    def test_reingest_leaves_fts_untouched(self, tmp_path):
+        db_path = tmp_path / "test_db_dir" / "trustint.db"
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        init_db(db_path)
+        counts = ingest_from_config(db_path)
+        # data_version changes whenever another connection commits a write, so
+        # observe from a connection of our own rather than the pooled one.
+        with closing(sqlite3.connect(db_path)) as con:
+            indexed = con.execute("SELECT count(*) FROM search_idx").fetchone()[0]
+            assert indexed == sum(v for k, v in counts.items() if k != "jurisdictions")
+            before = con.execute("PRAGMA data_version").fetchone()[0]
+            ingest_from_config(db_path)
+            after = con.execute("PRAGMA data_version").fetchone()[0]
+        assert after == before
+
+    def test_fts_follows_updates_and_deletes(self, tmp_path):
+        db_path = tmp_path / "test_db_dir" / "trustint.db"
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        init_db(db_path)
+        ingest_from_config(db_path)
+        with connect(db_path) as con:
+            slug = con.execute("SELECT slug FROM trusts").fetchone()[0]
+            con.execute(
+                "UPDATE trusts SET slug = 'renamed', purpose = 'zebra' WHERE slug = ?",
+                (slug,),
+            )
+            con.execute("UPDATE roles SET party = 'Quokka Ltd' WHERE id = 1")
+            for term in ("zebra", "quokka"):
+                rows = con.execute(
+                    "SELECT key FROM search_idx WHERE content MATCH ?", (term,)
+                ).fetchall()
+                assert [r["key"] for r in rows] == ["renamed"]
+            assert not con.execute(
+                "SELECT 1 FROM search_idx WHERE key = ?", (slug,)
+            ).fetchone()
+
+            con.execute("DELETE FROM trusts WHERE slug = 'renamed'")
+            assert con.execute("SELECT count(*) FROM search_idx").fetchone()[0] == 0
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from utils import fast_json
+
+COLUMNS = ("slug", "name", "purpose", "n")
+ROWS = [
+    ("whenua-aurora", "Whenua Aurora — Māori 信託", None, 1),
+    ('quo"te', "back\\slash\tand\nnewline", "\x00\x1f\x7f", -2),
+    ("emoji", "🌿", "", 0),
+]
+
+
+def _reference(rows):
+    return "".join(
+        json.dumps(
+            dict(zip(COLUMNS, r, strict=True)),
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        + "\n"
+        for r in rows
+    ).encode("utf-8")
+
+
+def test_stdlib_encoder_matches_json_dumps(monkeypatch):
+    monkeypatch.setattr(fast_json, "_orjson", None)
+    assert fast_json.backend() == "json"
+    assert fast_json.jsonl_encoder(COLUMNS)(ROWS) == _reference(ROWS)
+    assert (
+        fast_json.dumps({"slug": "x", "deleted": True})
+        == b'{"slug":"x","deleted":true}'
+    )
+
+
+def test_backends_write_the_same_bytes(monkeypatch):
+    pytest.importorskip("orjson")
+    fast = fast_json.jsonl_encoder(COLUMNS)(ROWS)
+    fast_obj = fast_json.dumps({"slug": "ā", "deleted": True})
+    monkeypatch.setattr(fast_json, "_orjson", None)
+    assert fast == fast_json.jsonl_encoder(COLUMNS)(ROWS) == _reference(ROWS)
+    assert fast_obj == fast_json.dumps({"slug": "ā", "deleted": True})
@@ -1,4 +1,14 @@
-from core.substrate import connect, ingest_from_config, init_db
+import json
+import sqlite3
+from contextlib import closing
+
+from core.substrate import (
+    CONFIG_DIR,
+    connect,
+    ingest_config_diff,
+    ingest_from_config,
+    init_db,
+)
 
 
 def test_ingest_idempotent(tmp_path):
@@ -27,3 +37,115 @@ def test_ingest_idempotent(tmp_path):
 
     # Ensure counts unchanged → idempotency confirmed
     assert counts2 == counts1
+
+
+def _snapshot(db_path):
+    with connect(db_path) as con:
+        return {
+            "trusts": con.execute(
+                "SELECT slug, name, purpose, jurisdiction_id FROM trusts ORDER BY slug"
+            ).fetchall(),
+            "roles": con.execute(
+                "SELECT trust_id, role_type, party, powers FROM roles ORDER BY id"
+            ).fetchall(),
+            "assets": con.execute(
+                "SELECT trust_id, class, descriptor, jurisdiction_id, metadata"
+                " FROM assets ORDER BY id"
+            ).fetchall(),
+            "obligations": con.execute(
+                "SELECT trust_id, name, kind, schedule, authority, details"
+                " FROM obligations ORDER BY id"
+            ).fetchall(),
+            "search_idx": sorted(
+                tuple(r)
+                for r in con.execute("SELECT scope, key, content FROM search_idx")
+            ),
+        }
+
+
+def test_full_ingest_matches_diff_ingest(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", tmp_path / "events.jsonl")
+    monkeypatch.setattr("utils.provenance.DEFAULT_KEY_PATH", tmp_path / ".hmac_key")
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", "A" * 43)
+
+    # Real config plus rows that hit the edge cases: an unknown jurisdiction,
+    # a role for an unknown trust and a duplicate asset.
+    config = tmp_path / "config"
+    config.mkdir()
+    for name in ("trusts.yaml", "roles.yaml", "assets.yaml", "laws.yaml"):
+        (config / name).write_text((CONFIG_DIR / name).read_text())
+    with open(config / "trusts.yaml", "a") as f:
+        f.write("\n- slug: extra\n  name: Extra Trust\n  jurisdiction: XX\n")
+    with open(config / "roles.yaml", "a") as f:
+        f.write("\n- trust: missing\n  role: trustee\n  party: Nobody\n")
+    with open(config / "assets.yaml", "a") as f:
+        f.write(
+            "\n- trust: extra\n  class: land\n  descriptor: Lot 1\n"
+            "- trust: extra\n  class: land\n  descriptor: Lot 1\n"
+        )
+
+    full, diff = tmp_path / "full.db", tmp_path / "diff.db"
+    init_db(full)
+    counts = ingest_from_config(full, config_dir=config)
+    assert ingest_from_config(full, config_dir=config) == counts
+    # The role for the unknown trust is skipped; the duplicate asset lands once.
+    assert (counts["roles"], counts["assets"]) == (2, 4)
+    init_db(diff)
+    ingest_config_diff(diff, config_dir=config)
+
+    assert _snapshot(full) == _snapshot(diff)
+
+
+def test_diff_ingest_applies_only_changes(tmp_path, monkeypatch):
+    ledger = tmp_path / "events.jsonl"
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", ledger)
+    monkeypatch.setattr("utils.provenance.DEFAULT_KEY_PATH", tmp_path / ".hmac_key")
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", "A" * 43)
+    config = tmp_path / "config"
+    config.mkdir()
+    for name in ("trusts.yaml", "roles.yaml", "assets.yaml", "laws.yaml"):
+        (config / name).write_text((CONFIG_DIR / name).read_text())
+    db_path = tmp_path / "trustint.db"
+    init_db(db_path)
+
+    # A database loaded by the plain ingest converges without rewriting rows.
+    ingest_from_config(db_path, config_dir=config)
+    before = _snapshot(db_path)
+    first = ingest_config_diff(db_path, config_dir=config)
+    assert first["trusts"] == {"added": 1, "changed": 0, "removed": 0}
+    assert _snapshot(db_path) == before
+
+    # Nothing changed: no file is parsed and nothing is written.
+    with closing(sqlite3.connect(db_path)) as con, monkeypatch.context() as m:
+        version = con.execute("PRAGMA data_version").fetchone()[0]
+        m.setattr("core.substrate._load_yaml", None)
+        assert ingest_config_diff(db_path, config_dir=config) == {}
+        assert con.execute("PRAGMA data_version").fetchone()[0] == version
+
+    # Edit a purpose and drop the protector role.
+    trusts = config / "trusts.yaml"
+    trusts.write_text(trusts.read_text().replace("Stewardship", "Guardianship"))
+    roles = config / "roles.yaml"
+    roles.write_text(roles.read_text().replace("role: protector", "role: observer"))
+    summary = ingest_config_diff(db_path, config_dir=config)
+    assert summary["trusts"]["changed"] == 1
+    assert summary["roles"] == {"added": 1, "changed": 0, "removed": 1}
+    assert summary["assets"] == {"added": 0, "changed": 0, "removed": 0}
+
+    with connect(db_path) as con:
+        purpose = con.execute("SELECT purpose FROM trusts").fetchone()[0]
+        roles_now = {r[0] for r in con.execute("SELECT role_type FROM roles")}
+        hits = con.execute(
+            "SELECT key FROM search_idx WHERE content MATCH 'Guardianship'"
+        ).fetchall()
+    assert purpose.startswith("Guardianship")
+    assert "protector" not in roles_now and "observer" in roles_now
+    assert [h[0] for h in hits] == ["whenua-aurora"]
+
+    event = json.loads(ledger.read_text().splitlines()[-1])
+    assert event["type"] == "ingest_diff"
+    assert event["changed"] == {"trusts": ['["whenua-aurora"]']}
+    assert event["removed"] == {
+        "roles": ['["whenua-aurora", "protector", "K. Mcleod"]']
+    }
+    assert event["added"] == {"roles": 1}
@@ -0,0 +1,82 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from core.substrate import connect, ingest_from_config, ingest_stream, init_db
+from scripts.trustint import cli
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", tmp_path / "events.jsonl")
+    monkeypatch.setattr("utils.provenance.DEFAULT_KEY_PATH", tmp_path / ".hmac_key")
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", "A" * 43)
+    path = tmp_path / "trustint.db"
+    init_db(path)
+    ingest_from_config(path)
+    return path
+
+
+def _parcel(i, **extra):
+    return {
+        "trust": "whenua-aurora",
+        "class": "land",
+        "descriptor": f"Parcel {i}",
+        "metadata": {"n": i},
+        **extra,
+    }
+
+
+def test_jsonl_streams_in_chunks(db_path, tmp_path):
+    source = tmp_path / "assets.jsonl"
+    records = [_parcel(i) for i in range(7)]
+    records[2] = {"trust": "whenua-aurora", "class": "moon", "descriptor": "Crater"}
+    records[5] = _parcel(5, trust="missing")
+    source.write_text("\n".join(json.dumps(r) for r in records) + "\n\n")
+
+    calls = []
+    counts = ingest_stream(
+        db_path, "assets", source, chunk_size=3, progress=lambda n, _: calls.append(n)
+    )
+    assert counts == {"read": 7, "written": 5, "invalid": 1, "unknown_trust": 1}
+    assert calls == [3, 6, 7]
+
+    # Re-streaming an edited source updates in place.
+    source.write_text(json.dumps(_parcel(0, metadata={"n": 99})) + "\n")
+    ingest_stream(db_path, "assets", source)
+    with connect(db_path) as con:
+        rows = con.execute(
+            "SELECT descriptor, metadata FROM assets WHERE descriptor LIKE 'Parcel %'"
+            " ORDER BY descriptor"
+        ).fetchall()
+    assert [r["descriptor"] for r in rows] == [
+        "Parcel 0",
+        "Parcel 1",
+        "Parcel 3",
+        "Parcel 4",
+        "Parcel 6",
+    ]
+    assert json.loads(rows[0]["metadata"]) == {"n": 99}
+
+
+def test_multi_document_yaml_cli(db_path, tmp_path):
+    source = tmp_path / "roles.yaml"
+    source.write_text(
+        "trust: whenua-aurora\nrole: advisor\nparty: Counsel One\n"
+        "---\n"
+        "- {trust: whenua-aurora, role: beneficiary, party: Hapu A}\n"
+        "- {trust: whenua-aurora, role: beneficiary, party: Hapu B}\n"
+    )
+    result = CliRunner().invoke(
+        cli,
+        ["--db", str(db_path), "ingest-stream", "roles", str(source)],
+        catch_exceptions=False,
+    )
+    assert result.exit_code == 0, result.output
+    assert "3 written, 0 invalid" in result.output
+    with connect(db_path) as con:
+        hits = con.execute(
+            "SELECT count(*) FROM search_idx WHERE content MATCH 'Hapu'"
+        ).fetchone()[0]
+    assert hits == 2
@@ -0,0 +1,111 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from scripts.trustint import cli
+from utils import ledger_index, segments
+from utils.provenance import EventBatch, append_event, rotate_ledger
+
+KEY = b"k" * 32
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = tmp_path / "vault" / "events.jsonl"
+    path.parent.mkdir()
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", path)
+    return path
+
+
+def _inbox(n):
+    with EventBatch(key=KEY) as batch:
+        for i in range(n):
+            sha = f"{i:064x}"
+            batch.append({"event": "INBOX_CHECKSUM", "sha256": sha})
+            if i % 3 == 0:
+                batch.append(
+                    {"event": "INBOX_REJECT", "sha256": sha, "ticket_id": f"T{i}"}
+                )
+            else:
+                batch.append({"event": "INBOX_ACCEPT", "sha256": sha})
+
+
+def test_query_after_rebuild(ledger):
+    _inbox(10)
+    append_event({"type": "export", "format": "csv"}, key=KEY)
+    assert ledger_index.rebuild(ledger) == 21
+
+    hits = list(ledger_index.query(ledger, sha256=f"{3:064x}"))
+    assert [e["event"] for _, e in hits] == ["INBOX_CHECKSUM", "INBOX_REJECT"]
+    assert [line for line, _ in hits] == [7, 8]
+
+    rejects = list(ledger_index.query(ledger, event="INBOX_REJECT"))
+    assert [e["ticket_id"] for _, e in rejects] == ["T0", "T3", "T6", "T9"]
+    assert [e["format"] for _, e in ledger_index.query(ledger, event="export")] == [
+        "csv"
+    ]
+    assert len(list(ledger_index.query(ledger, event="INBOX_ACCEPT", limit=2))) == 2
+
+
+def test_write_path_keeps_index_current_across_rotation(ledger, monkeypatch):
+    ledger_index.rebuild(ledger)
+    _inbox(3)
+    rotate_ledger(KEY)
+    segments.compress_segment(ledger, 1, KEY)
+    _inbox(6)
+
+    with ledger_index._connect(ledger) as con:
+        count = con.execute("SELECT COUNT(*) FROM ledger_index").fetchone()[0]
+    assert count == 18
+    hits = list(ledger_index.query(ledger, ticket_id="T0", refresh=False))
+    assert [(e["event"], line) for line, e in hits] == [
+        ("INBOX_REJECT", 2),
+        ("INBOX_REJECT", 8),
+    ]
+
+
+def test_index_rebuilds_when_ledger_replaced(ledger):
+    _inbox(3)
+    ledger_index.sync(ledger)
+    ledger.unlink()
+    ledger.with_suffix(".head").unlink()
+    append_event({"event": "fresh"}, key=KEY)
+    assert [e["event"] for _, e in ledger_index.query(ledger)] == ["fresh"]
+
+
+def test_prov_query_cli(ledger):
+    _inbox(4)
+    result = CliRunner().invoke(
+        cli, ["prov", "query", "--ticket", "T3"], catch_exceptions=False
+    )
+    assert result.exit_code == 0, result.output
+    line, _, raw = result.output.strip().partition(": ")
+    assert line == "8" and json.loads(raw)["event"] == "INBOX_REJECT"
+
+
+def test_appends_reuse_one_connection_without_schema_pass(ledger, monkeypatch):
+    _inbox(2)
+    ledger_index.rebuild(ledger)
+    con = ledger_index._connect(ledger)
+    monkeypatch.setattr(ledger_index, "_SCHEMA", "not sql")
+    _inbox(3)
+    assert ledger_index._connect(ledger) is con
+    assert len(list(ledger_index.query(ledger, event="INBOX_CHECKSUM"))) == 5
+    assert ledger_index.locate(ledger, 1) == (
+        1,
+        0,
+        len(ledger.read_bytes().split(b"\n")[0]) + 1,
+    )
+
+
+def test_utils_do_not_import_core():
+    code = (
+        "import sys, utils.provenance, utils.ledger_index;"
+        "sys.exit(any(m.split('.')[0] == 'core' for m in sys.modules))"
+    )
+    root = Path(__file__).resolve().parents[1]
+    assert subprocess.run([sys.executable, "-c", code], cwd=root).returncode == 0
@@ -0,0 +1,227 @@
+import hashlib
+import io
+import json
+import os
+import tarfile
+
+import pytest
+
+from core import matrices, queries
+from core.substrate import connect, ingest_from_config, init_db
+from utils import provenance
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", tmp_path / "events.jsonl")
+    monkeypatch.setattr("utils.provenance.DEFAULT_KEY_PATH", tmp_path / ".hmac_key")
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", "A" * 43)
+    monkeypatch.setattr(matrices, "DIST", tmp_path / "dist")
+    (tmp_path / "dist").mkdir()
+    path = tmp_path / "trustint.db"
+    monkeypatch.setattr(matrices, "DB_PATH", path)
+    init_db(path)
+    ingest_from_config(path)
+    with connect(path) as con:
+        for slug in ("aaa-empty", "zzz-last"):
+            con.execute(
+                "INSERT INTO trusts(slug, name, created_at, updated_at)"
+                " VALUES (?, ?, '', '')",
+                (slug, slug.title()),
+            )
+        con.execute(
+            "INSERT INTO roles(trust_id, role_type, party)"
+            " SELECT id, 'trustee', 'Last Trustee' FROM trusts WHERE slug = 'zzz-last'"
+        )
+        con.execute(
+            "INSERT INTO filings(trust_id, obligation_id, filing_date, status, reference)"
+            " SELECT trust_id, id, '2026-03-31', 'filed', 'R-1' FROM obligations"
+            " WHERE trust_id = (SELECT id FROM trusts WHERE slug = 'whenua-aurora')"
+            " LIMIT 1"
+        )
+    return path
+
+
+def test_trust_sections_group_every_child_under_its_trust(db_path):
+    with connect(db_path) as con:
+        expected = {
+            s: con.execute(f"SELECT COUNT(*) FROM {s}").fetchone()[0]
+            for s in matrices.REPORT_SECTIONS
+        }
+        with matrices._con(db_path) as ro:
+            grouped = list(matrices.trust_sections(ro))
+
+    assert [t["slug"] for t, _ in grouped] == ["aaa-empty", "whenua-aurora", "zzz-last"]
+    for s in matrices.REPORT_SECTIONS:
+        assert sum(len(sec[s]) for _, sec in grouped) == expected[s]
+    for trust, sec in grouped:
+        for rows in sec.values():
+            assert all(r["slug"] == trust["slug"] for r in rows)
+    assert not any(grouped[0][1].values())
+    assert [r["party"] for r in grouped[2][1]["roles"]] == ["Last Trustee"]
+
+
+def test_markdown_report_runs_one_query_per_section(db_path):
+    queries.reset_metrics()
+    out = matrices.export_markdown()
+    stats = queries.metrics()
+    queries.reset_metrics()
+
+    text = out.read_text(encoding="utf-8")
+    assert text.count("\n## ") == 3
+    assert "### Obligations" in text
+    assert "**filed**" in text and "`R-1`" in text
+    assert {n for n in stats if n.startswith("report.")} == {
+        "report.trusts",
+        *(f"report.{s}" for s in matrices.REPORT_SECTIONS),
+    }
+    assert all(m["calls"] == 1 for n, m in stats.items() if n.startswith("report."))
+
+
+def test_parallel_export_hashes_while_writing(db_path, monkeypatch):
+    serial = {p.name: p.read_bytes() for p in matrices.export_all(workers=1)}
+    paths = matrices.export_all(workers=len(matrices.WRITERS))
+    assert [p.name for p in paths] == list(serial)
+    assert {p.name: p.read_bytes() for p in paths} == serial
+
+    def no_reread(path):
+        raise AssertionError(f"{path} was read back")
+
+    sha256_file = matrices.sha256_file
+    monkeypatch.setattr(matrices, "sha256_file", no_reread)
+    sums = matrices.write_checksums(paths).read_text(encoding="utf-8").splitlines()
+    assert sums == [
+        f"{hashlib.sha256(data).hexdigest()}  {name}" for name, data in serial.items()
+    ]
+
+    # A file changed after export is hashed from disk again.
+    monkeypatch.setattr(matrices, "sha256_file", sha256_file)
+    paths[0].write_text("edited\n", encoding="utf-8")
+    sums = matrices.write_checksums(paths).read_text(encoding="utf-8").splitlines()
+    assert sums[0].startswith(hashlib.sha256(b"edited\n").hexdigest())
+
+
+def test_writers_take_their_paths_as_arguments(db_path, tmp_path):
+    dist, other = matrices.DIST, tmp_path / "other"
+    other.mkdir()
+    for fmt in matrices.WRITERS:
+        out, digest = matrices._write_in_worker(fmt, db_path, other)
+        assert out.parent == other
+        assert digest[2] == hashlib.sha256(out.read_bytes()).hexdigest()
+    assert (matrices.DIST, matrices.DB_PATH) == (dist, db_path)
+    assert not list(dist.iterdir())
+
+
+def _lines(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_delta_feed_and_compaction(db_path):
+    snapshot = matrices.export_jsonl()
+    assert matrices.export_jsonl_delta() is None
+    ingest_from_config(db_path)  # unchanged rows journal nothing
+    assert matrices.export_jsonl_delta() is None
+
+    with connect(db_path) as con:
+        con.execute(
+            "UPDATE trusts SET purpose = 'revised' WHERE slug = 'whenua-aurora'"
+        )
+        con.execute("UPDATE trusts SET purpose = purpose WHERE slug = 'zzz-last'")
+        con.execute("DELETE FROM trusts WHERE slug = 'aaa-empty'")
+        con.execute(
+            "INSERT INTO trusts(slug, name, created_at, updated_at)"
+            " VALUES ('mmm-new', 'New', '', '')"
+        )
+    delta1 = matrices.export_jsonl_delta()
+    with connect(db_path) as con:
+        assert con.execute("SELECT COUNT(*) FROM change_journal").fetchone()[0] == 0
+        seq = con.execute("SELECT seq FROM sqlite_sequence").fetchone()[0]
+    assert delta1.name == f"trustint_export.delta-{seq:012d}.jsonl"
+    assert _lines(delta1) == [
+        {"slug": "aaa-empty", "deleted": True},
+        {"slug": "mmm-new", "name": "New", "purpose": None, "jurisdiction": None},
+        {**_lines(snapshot)[1], "purpose": "revised"},
+    ]
+
+    with connect(db_path) as con:
+        con.execute("UPDATE jurisdictions SET code = code || '-X'")
+    delta2 = matrices.export_jsonl_delta()
+    assert delta1.name < delta2.name
+    assert [r["slug"] for r in _lines(delta2)] == ["whenua-aurora"]
+    assert _lines(delta2)[0]["jurisdiction"].endswith("-X")
+
+    compacted = matrices.compact_jsonl().read_bytes()
+    assert not list(matrices.DIST.glob("*.delta-*"))
+    with connect(db_path) as con:
+        assert con.execute("SELECT COUNT(*) FROM change_journal").fetchone()[0] == 0
+    assert matrices.export_jsonl().read_bytes() == compacted
+    assert matrices.export_jsonl_delta() is None
+
+    # Delta names are never reused after compaction or a full export.
+    with connect(db_path) as con:
+        con.execute("UPDATE trusts SET purpose = 'again' WHERE slug = 'zzz-last'")
+    assert matrices.export_jsonl_delta().name > delta2.name
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "ipc"])
+def test_columnar_export(db_path, fmt):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    def read(path):
+        if fmt == "parquet":
+            return pq.read_table(path)
+        return pa.ipc.open_file(path).read_all()
+
+    paths = matrices.export_columnar(fmt, batch_size=2)
+    tables = dict(zip(matrices.COLUMNAR_ENTITIES, map(read, paths), strict=True))
+    assert [p.name for p in paths] == [
+        f"trustint_{e}.{matrices.COLUMNAR_FORMATS[fmt]}"
+        for e in matrices.COLUMNAR_ENTITIES
+    ]
+    with connect(db_path) as con:
+        for entity, table in tables.items():
+            count = con.execute(f"SELECT COUNT(*) FROM {entity}").fetchone()[0]
+            assert table.num_rows == count
+            assert table.schema.field("id").type == pa.int64()
+            assert table.schema.metadata[b"entity"] == entity.encode()
+    for path in paths:
+        assert matrices._digest(path) == hashlib.sha256(path.read_bytes()).hexdigest()
+
+    roles = tables["roles"]
+    assert roles.schema.field("powers").metadata == {b"encoding": b"json"}
+    powers = [p for p in roles.column("powers").to_pylist() if p is not None]
+    assert powers and all(isinstance(json.loads(p), dict) for p in powers)
+    assert set(roles.column("trust").to_pylist()) == {"whenua-aurora", "zzz-last"}
+
+
+def test_bundle_is_reproducible(db_path):
+    paths = matrices.export_all(workers=1)
+    matrices.write_checksums(paths)
+    first = matrices.write_bundle(paths).read_bytes()
+    for path in paths:
+        os.utime(path, (1_700_000_000, 1_700_000_000))
+    out = matrices.write_bundle(paths)
+    assert out.read_bytes() == first
+
+    digest = hashlib.sha256(first).hexdigest()
+    sidecar = matrices.DIST / f"{matrices.BUNDLE_NAME}.sha256"
+    assert sidecar.read_text(encoding="utf-8") == f"{digest}  {out.name}\n"
+
+    with tarfile.open(fileobj=io.BytesIO(first), mode="r:gz") as tar:
+        members = tar.getmembers()
+        data = {m.name: tar.extractfile(m).read() for m in members}
+    names = sorted(p.name for p in paths)
+    assert [m.name for m in members] == [*names, "SHA256SUMS"]
+    assert {(m.mtime, m.uid, m.gid, m.mode) for m in members} == {(0, 0, 0, 0o644)}
+    assert data["SHA256SUMS"].decode().splitlines() == [
+        f"{hashlib.sha256(data[n]).hexdigest()}  {n}" for n in names
+    ]
+
+    bundles = [
+        json.loads(line)
+        for line in provenance.LEDGER_PATH.read_text(encoding="utf-8").splitlines()
+        if json.loads(line).get("type") == "bundle"
+    ]
+    assert len(bundles) == 2 and bundles[-1]["sha256"] == digest
+    assert list(bundles[-1]["members"]) == names
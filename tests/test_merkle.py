@@ -0,0 +1,172 @@
+import hashlib
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from scripts.prov_tools import cli as prov_cli
+from utils import merkle, segments
+from utils.provenance import (
+    EventBatch,
+    append_event,
+    load_hmac_key,
+    rotate_ledger,
+)
+
+KEY = b"k" * 32
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = tmp_path / "vault" / "events.jsonl"
+    path.parent.mkdir()
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", path)
+    monkeypatch.setattr("scripts.prov_tools.LEDGER_PATH", path)
+    monkeypatch.setattr(merkle, "ROOT_EVERY", 8)
+    return path
+
+
+def _mth(leaves):
+    """Reference RFC 6962 Merkle tree hash."""
+    if not leaves:
+        return hashlib.sha256(b"").digest()
+    if len(leaves) == 1:
+        return hashlib.sha256(b"\x00" + leaves[0]).digest()
+    k = 1 << ((len(leaves) - 1).bit_length() - 1)
+    return hashlib.sha256(b"\x01" + _mth(leaves[:k]) + _mth(leaves[k:])).digest()
+
+
+def _lines(ledger):
+    return [
+        json.dumps(e, ensure_ascii=False).encode() for e in segments.iter_events(ledger)
+    ]
+
+
+def test_roots_match_reference_as_ledger_grows(ledger):
+    merkle.rebuild(ledger, KEY)
+    for i in range(13):
+        append_event({"event": "test", "n": i}, key=KEY)
+    with EventBatch(key=KEY) as batch:
+        for i in range(13, 21):
+            batch.append({"event": "test", "n": i})
+
+    lines = _lines(ledger)
+    assert merkle.tree_size(ledger) == 21
+    for size in range(22):
+        assert merkle.root(ledger, size) == _mth(lines[:size])
+    assert [r["size"] for r in merkle.signed_roots(ledger)] == [8, 16]
+
+
+def test_inclusion_proofs(ledger):
+    for i in range(21):
+        append_event({"event": "test", "n": i}, key=KEY)
+    merkle.rebuild(ledger, KEY)
+    merkle.sign_root(ledger, KEY)
+
+    for line in range(1, 22):
+        proof = merkle.prove(ledger, line, KEY)
+        assert json.loads(proof["event"])["n"] == line - 1
+        assert len(proof["path"]) <= 5
+        assert merkle.verify_proof(proof, KEY)
+
+    assert merkle.prove(ledger, 5, KEY)["root"]["size"] == 21
+    proof = merkle.prove(ledger, 5, KEY, size=8)
+    assert merkle.verify_proof(proof, KEY)
+    assert not merkle.verify_proof({**proof, "line": 6}, KEY)
+    assert not merkle.verify_proof(
+        {**proof, "event": proof["event"].replace('"n": 4', '"n": 5')}, KEY
+    )
+    assert not merkle.verify_proof({**proof, "root": {**proof["root"], "size": 9}}, KEY)
+    assert not merkle.verify_proof(proof, b"x" * 32)
+
+
+def test_accumulator_follows_rotation_and_repairs_torn_writes(ledger):
+    merkle.rebuild(ledger, KEY)
+    for i in range(5):
+        append_event({"event": "test", "n": i}, key=KEY)
+    rotate_ledger(KEY)
+    segments.compress_segment(ledger, 1, KEY)
+    # A crash after the level appends but before the state write.
+    with open(merkle.merkle_dir(ledger) / "level-00.bin", "ab") as f:
+        f.write(b"\xff" * 40)
+    for i in range(5, 11):
+        append_event({"event": "test", "n": i}, key=KEY)
+
+    assert merkle.root(ledger) == _mth(_lines(ledger))
+    assert merkle.verify_proof(merkle.prove(ledger, 3, KEY), KEY)
+
+
+def test_prove_cli_roundtrip(ledger, tmp_path, monkeypatch):
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", "A" * 43)
+    for i in range(3):
+        append_event({"event": "test", "n": i})
+    runner = CliRunner()
+    result = runner.invoke(prov_cli, ["merkle-build"], catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+
+    out = tmp_path / "proof.json"
+    result = runner.invoke(prov_cli, ["prove", "2", "--out", str(out)])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(prov_cli, ["check-proof", str(out)])
+    assert result.exit_code == 0, result.output
+    assert "Line 2 is included" in result.output
+
+    proof = json.loads(out.read_text())
+    proof["event"] = proof["event"].replace('"n": 1', '"n": 9')
+    out.write_text(json.dumps(proof))
+    result = runner.invoke(prov_cli, ["check-proof", str(out)])
+    assert result.exit_code != 0
+
+
+def test_mismatch_keeps_signed_roots_until_explicit_rebuild(ledger, monkeypatch):
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", "A" * 43)
+    for i in range(10):
+        append_event({"event": "test", "n": i})
+    runner = CliRunner()
+    assert runner.invoke(prov_cli, ["merkle-build"]).exit_code == 0
+    roots = merkle.merkle_dir(ledger) / "roots.jsonl"
+    before = roots.read_bytes()
+
+    # Replace the ledger with a different history.
+    ledger.unlink()
+    ledger.with_suffix(".head").unlink()
+    for i in range(12):
+        append_event({"event": "other", "n": i})
+    assert roots.read_bytes() == before
+    with pytest.raises(merkle.MerkleMismatch):
+        merkle.sync(ledger, load_hmac_key()[0])
+
+    result = runner.invoke(prov_cli, ["merkle-build"])
+    assert result.exit_code != 0 and "--rebuild" in result.output
+    assert roots.read_bytes() == before
+
+    result = runner.invoke(prov_cli, ["merkle-build", "--rebuild"])
+    assert result.exit_code == 0, result.output
+    (archived,) = merkle.merkle_dir(ledger).glob("roots-*.jsonl")
+    assert archived.read_bytes() == before
+    assert merkle.tree_size(ledger) == 12
+
+
+def test_check_proof_without_a_key(ledger, tmp_path, monkeypatch):
+    for i in range(9):
+        append_event({"event": "test", "n": i}, key=KEY)
+    merkle.rebuild(ledger, KEY)
+    out = tmp_path / "proof.json"
+    proof = merkle.prove(ledger, 4, KEY)
+    out.write_text(json.dumps(proof))
+    published = proof["root"]["root"]
+
+    # No key anywhere: the check must not need one.
+    monkeypatch.delenv("TRUSTINT_HMAC_KEY", raising=False)
+    monkeypatch.setattr("utils.provenance.DEFAULT_KEY_PATH", tmp_path / "absent")
+    assert merkle.verify_inclusion(proof, published)
+    assert not merkle.verify_inclusion(proof, "00" * 32)
+    assert not merkle.verify_inclusion({**proof, "line": 5}, published)
+
+    runner = CliRunner()
+    result = runner.invoke(prov_cli, ["check-proof", str(out), "--root", published])
+    assert result.exit_code == 0, result.output
+    assert "Line 4 is included in the given root over 8 lines." in result.output
+    result = runner.invoke(prov_cli, ["check-proof", str(out), "--root", "00" * 32])
+    assert result.exit_code != 0
+    assert not (tmp_path / "absent").exists()
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from scripts.prov_tools import cli as prov_cli
+from utils.provenance import EventBatch, append_event
+
+TEST_KEY_B64 = "A" * 43
+
+
+@pytest.fixture
+def isolated_vault(tmp_path, monkeypatch):
+    vault_path = tmp_path / "vault"
+    vault_path.mkdir()
+    ledger_path = vault_path / "events.jsonl"
+
+    monkeypatch.setattr("utils.provenance.DEFAULT_KEY_PATH", vault_path / ".hmac_key")
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", ledger_path)
+    monkeypatch.setattr("scripts.prov_tools.LEDGER_PATH", ledger_path)
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", TEST_KEY_B64)
+    yield vault_path
+
+
+def _verify():
+    result = CliRunner().invoke(prov_cli, ["chain-verify"], catch_exceptions=False)
+    assert result.exit_code == 0, result.output
+    assert "Chain verification successful" in result.output
+
+
+def test_head_tracks_ledger(isolated_vault):
+    e1 = append_event({"event": "one"})
+    e2 = append_event({"event": "two"})
+    assert e2["prev"] == e1["mac"]
+
+    head = json.loads((isolated_vault / "events.head").read_text())
+    assert head["mac"] == e2["mac"]
+    assert head["size"] == (isolated_vault / "events.jsonl").stat().st_size
+    _verify()
+
+
+def test_missing_head_falls_back_to_tail(isolated_vault):
+    e1 = append_event({"event": "one"})
+    (isolated_vault / "events.head").unlink()
+
+    e2 = append_event({"event": "two"})
+    assert e2["prev"] == e1["mac"]
+    _verify()
+
+
+def test_stale_head_after_crash_uses_tail(isolated_vault):
+    append_event({"event": "one"})
+    stale = (isolated_vault / "events.head").read_text()
+    e2 = append_event({"event": "two"})
+    # Simulate a crash after the ledger write but before the head update.
+    (isolated_vault / "events.head").write_text(stale)
+
+    e3 = append_event({"event": "three"})
+    assert e3["prev"] == e2["mac"]
+    _verify()
+
+
+def test_tail_read_spans_blocks(isolated_vault):
+    append_event({"event": "small"})
+    big = append_event({"event": "big", "blob": "x" * 20000})
+    (isolated_vault / "events.head").unlink()
+
+    e3 = append_event({"event": "after"})
+    assert e3["prev"] == big["mac"]
+    _verify()
+
+
+def test_event_batch_matches_single_appends(isolated_vault):
+    first = append_event({"event": "before"})
+    with EventBatch() as batch:
+        a = batch.append({"event": "a"})
+        b = batch.append({"event": "b"})
+        assert (isolated_vault / "events.jsonl").read_text().count("\n") == 1
+    assert a["prev"] == first["mac"]
+    assert b["prev"] == a["mac"]
+
+    lines = (isolated_vault / "events.jsonl").read_text().splitlines()
+    assert [json.loads(line)["mac"] for line in lines] == [
+        first["mac"],
+        a["mac"],
+        b["mac"],
+    ]
+    _verify()
+
+
+def test_event_batch_rechains_after_concurrent_append(isolated_vault):
+    with EventBatch() as batch:
+        a = batch.append({"event": "a"})
+        other = append_event({"event": "interleaved"})
+    assert a["prev"] == other["mac"]
+    _verify()
+
+
+def test_event_batch_flushes_on_error(isolated_vault):
+    with pytest.raises(RuntimeError), EventBatch(fsync=True) as batch:
+        batch.append({"event": "a"})
+        raise RuntimeError("boom")
+    assert (isolated_vault / "events.jsonl").read_text().count("\n") == 1
+    _verify()
@@ -1,10 +1,11 @@
 import base64
 import os
+from pathlib import Path
 
 import pytest
 
 # Import the function to test
-from utils.provenance import load_hmac_key
+from utils.provenance import _preflight_hmac_or_die, clear_key_cache, load_hmac_key
 
 
 # Fixture to manage environment variables and temporary file paths for tests
@@ -149,3 +150,35 @@ def test_non_standard_key_length_warns():
     assert loaded_key == key_bytes
     assert "WARN" in status
     assert "not the recommended" in status
+
+
+def test_signing_key_is_cached_until_file_changes(tmp_path, monkeypatch):
+    """
+    The signing key is read once per process and re-read only when the key
+    file is replaced; refusals still apply to cached keys.
+    """
+    key_path = tmp_path / "vault" / ".hmac_key"
+    first, second = os.urandom(32), os.urandom(32)
+    key_path.write_text(base64.urlsafe_b64encode(first).decode().rstrip("="))
+
+    reads = []
+    real_read = Path.read_bytes
+    monkeypatch.setattr(Path, "read_bytes", lambda p: reads.append(p) or real_read(p))
+    assert _preflight_hmac_or_die() == first
+    assert _preflight_hmac_or_die() == first
+    assert len(reads) == 1
+
+    tmp = key_path.with_name("new_key")
+    tmp.write_text(base64.urlsafe_b64encode(second).decode().rstrip("="))
+    os.replace(tmp, key_path)
+    assert _preflight_hmac_or_die() == second
+    assert len(reads) == 2
+
+    monkeypatch.setenv("TRUSTINT_READONLY", "1")
+    with pytest.raises(SystemExit):
+        _preflight_hmac_or_die()
+    monkeypatch.delenv("TRUSTINT_READONLY")
+
+    clear_key_cache()
+    assert _preflight_hmac_or_die() == second
+    assert len(reads) == 3
@@ -0,0 +1,58 @@
+import pytest
+
+from core import queries
+from core.connections import ConnectionManager
+from scripts.migrate import run_migrations
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", tmp_path / "events.jsonl")
+    monkeypatch.setattr("utils.provenance.DEFAULT_KEY_PATH", tmp_path / ".hmac_key")
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", "A" * 43)
+    path = tmp_path / "trustint.db"
+    run_migrations(path)
+    mgr = ConnectionManager()
+    yield mgr.connect(path)
+    mgr.close_all()
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    queries.reset_metrics()
+    yield
+    queries.reset_metrics()
+
+
+def test_every_named_query_compiles(db):
+    for sql in queries.QUERIES.values():
+        db.execute(f"EXPLAIN {sql}", [None] * sql.count("?")).fetchall()
+
+
+def test_metrics_count_calls_and_rows(db):
+    with db:
+        queries.execute(db, "quarantine.open", ("Q-1", "test", "a" * 64))
+        queries.execute(db, "quarantine.open", ("Q-2", "test", "b" * 64))
+    assert queries.fetch_one(db, "quarantine.get", ("Q-1",))["reason"] == "test"
+    assert queries.fetch_one(db, "quarantine.get", ("Q-9",)) is None
+    assert len(queries.fetch_all(db, "quarantine.list_unresolved")) == 2
+    stream = queries.iterate(db, "quarantine.list_unresolved")
+    next(stream)
+    stream.close()
+
+    stats = queries.metrics()
+    assert stats["quarantine.open"]["calls"] == 2
+    assert stats["quarantine.open"]["rows"] == 2
+    assert stats["quarantine.get"]["calls"] == 2
+    assert stats["quarantine.get"]["rows"] == 1
+    assert stats["quarantine.list_unresolved"]["calls"] == 2
+    assert stats["quarantine.list_unresolved"]["rows"] == 3
+    assert all(m["seconds"] >= 0 for m in stats.values())
+
+    queries.reset_metrics()
+    assert queries.metrics() == {}
+
+
+def test_unknown_query_name(db):
+    with pytest.raises(KeyError):
+        queries.fetch_all(db, "no.such.query")
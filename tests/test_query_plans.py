@@ -0,0 +1,90 @@
+import pytest
+
+from core import queries
+from core.connections import ConnectionManager
+from core.substrate import init_db
+from scripts.migrate import run_migrations
+
+# Named queries that must go through an index, never scan the table or sort.
+HOT = {
+    "inbox.seen": ("a" * 64,),
+    "inbox.for_ticket": ("Q-1",),
+    "quarantine.get": ("Q-1",),
+    "quarantine.get_unresolved": ("Q-1",),
+    "quarantine.list_unresolved": (),
+    "quarantine.oldest_unresolved": (),
+}
+# Full ordered reads (exports, reports) must stream in order without a sort step.
+ORDERED = sorted(
+    n for n, sql in queries.QUERIES.items() if "ORDER BY" in sql and "?" not in sql
+)
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", tmp_path / "events.jsonl")
+    monkeypatch.setattr("utils.provenance.DEFAULT_KEY_PATH", tmp_path / ".hmac_key")
+    monkeypatch.setenv("TRUSTINT_HMAC_KEY", "A" * 43)
+    mgr = ConnectionManager()
+    yield mgr
+    mgr.close_all()
+
+
+def _plan(con, sql, params):
+    return [row[3] for row in con.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def _unindexed_foreign_keys(con):
+    missing = []
+    tables = [
+        r[0]
+        for r in con.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND sql NOT LIKE "
+            "'CREATE VIRTUAL%'"
+        )
+    ]
+    for table in tables:
+        leading = {
+            con.execute(f"PRAGMA index_info('{idx[1]}')").fetchone()[2]
+            for idx in con.execute(f"PRAGMA index_list('{table}')")
+        }
+        for fk in con.execute(f"PRAGMA foreign_key_list('{table}')"):
+            if fk[3] not in leading:
+                missing.append(f"{table}.{fk[3]}")
+    return missing
+
+
+@pytest.mark.parametrize("name", sorted(HOT))
+def test_hot_queries_use_indexes(manager, tmp_path, name):
+    db = tmp_path / "trustint.db"
+    run_migrations(db)
+    plan = _plan(manager.connect(db), queries.QUERIES[name], HOT[name])
+    # Scanning an index is fine: quarantine_open_idx only holds open tickets.
+    scans = [s for s in plan if s.startswith("SCAN") and "USING" not in s]
+    assert not scans, plan
+    assert not [step for step in plan if "TEMP B-TREE" in step], plan
+
+
+@pytest.mark.parametrize("name", ORDERED)
+def test_report_queries_stream_in_order(manager, tmp_path, name):
+    db = tmp_path / "trustint.db"
+    run_migrations(db)
+    plan = _plan(manager.connect(db), queries.QUERIES[name], ())
+    assert not [step for step in plan if "TEMP B-TREE" in step], plan
+
+
+def test_open_tickets_use_partial_index(manager, tmp_path):
+    db = tmp_path / "trustint.db"
+    run_migrations(db)
+    plan = _plan(manager.connect(db), queries.QUERIES["quarantine.list_unresolved"], ())
+    assert any("quarantine_open_idx" in step for step in plan), plan
+
+
+def test_every_foreign_key_is_indexed(manager, tmp_path):
+    migrated = tmp_path / "migrated.db"
+    run_migrations(migrated)
+    assert _unindexed_foreign_keys(manager.connect(migrated)) == []
+
+    legacy = tmp_path / "legacy.db"
+    init_db(legacy)
+    assert _unindexed_foreign_keys(manager.connect(legacy)) == []
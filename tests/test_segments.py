@@ -0,0 +1,264 @@
+import base64
+import json
+from itertools import pairwise
+
+import pytest
+from click.testing import CliRunner
+
+from scripts.prov_tools import cli as prov_cli
+from scripts.trustint import cli as trustint_cli
+from utils import segments
+from utils.provenance import (
+    append_event,
+    follow,
+    get_provenance_tail,
+    rotate_ledger,
+    tail,
+)
+from utils.verify import checkpoint_path, verify_ledger
+
+KEY = b"k" * 32
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = tmp_path / "vault" / "events.jsonl"
+    path.parent.mkdir()
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", path)
+    monkeypatch.setenv(segments.SEGMENT_BYTES_ENV, "1000")
+    return path
+
+
+def _fill(n, start=0):
+    return [append_event({"event": "test", "n": i}, key=KEY) for i in range(start, n)]
+
+
+def test_size_rotation_keeps_one_chain(ledger):
+    events = _fill(40)
+    entries = segments.load_manifest(ledger)
+    assert len(entries) >= 3
+    assert all(segments.entry_valid(KEY, e) for e in entries)
+
+    # Line ranges are contiguous and each segment chains to the previous one.
+    for prev, cur in pairwise(entries):
+        assert cur["first_line"] == prev["last_line"] + 1
+        assert cur["first_prev"] == prev["last_mac"]
+
+    assert [e["n"] for e in segments.iter_events(ledger)] == list(range(40))
+    assert [e["mac"] for e in segments.iter_events(ledger)] == [
+        e["mac"] for e in events
+    ]
+
+    result, _ = verify_ledger(ledger, KEY, save=True)
+    assert result.ok, result.message
+    assert result.count == 40
+    assert result.line == 40
+
+
+def test_subset_verification(ledger):
+    _fill(40)
+    seg1 = segments.segment_path(ledger, 1)
+    lines = seg1.read_text().splitlines()
+    obj = json.loads(lines[0])
+    obj["n"] = 7
+    lines[0] = json.dumps(obj)
+    seg1.write_text("\n".join(lines) + "\n")
+
+    result, _ = verify_ledger(ledger, KEY, seqs=[2, 3])
+    assert result.ok, result.message
+    result, _ = verify_ledger(ledger, KEY, full=True)
+    assert result.message == "MAC mismatch at line 1"
+
+
+def test_tampered_manifest_is_rejected(ledger):
+    _fill(40)
+    path = segments.manifest_path(ledger)
+    manifest = json.loads(path.read_text())
+    manifest["segments"][0]["last_line"] += 1
+    path.write_text(json.dumps(manifest))
+    result, _ = verify_ledger(ledger, KEY, full=True)
+    assert result.error == "manifest entry signature invalid"
+
+
+def test_checkpoint_survives_rotation(ledger, monkeypatch):
+    monkeypatch.delenv(segments.SEGMENT_BYTES_ENV)
+    _fill(5)
+    verify_ledger(ledger, KEY, save=True)
+    assert rotate_ledger(KEY)["seq"] == 1
+    _fill(8, start=5)
+
+    result, start = verify_ledger(ledger, KEY, save=True)
+    assert result.ok, result.message
+    assert start is not None and (start.segment, start.line) == (1, 5)
+    assert (result.segment, result.line, result.count) == (2, 8, 8)
+
+
+def test_recover_interrupted_rotation(ledger, monkeypatch):
+    monkeypatch.delenv(segments.SEGMENT_BYTES_ENV)
+    _fill(5)
+    head = ledger.with_suffix(".head").read_text()
+    rotate_ledger(KEY)
+    # Simulate a crash after the file move but before the manifest/head writes.
+    segments.manifest_path(ledger).unlink()
+    ledger.with_suffix(".head").write_text(head)
+
+    after = append_event({"event": "after"}, key=KEY)
+    entries = segments.load_manifest(ledger)
+    assert len(entries) == 1 and segments.entry_valid(KEY, entries[0])
+    assert after["prev"] == entries[0]["last_mac"]
+    result, _ = verify_ledger(ledger, KEY, full=True)
+    assert result.ok, result.message
+    assert result.count == 6
+
+
+def test_malformed_rotation_limits_fall_back(ledger, monkeypatch):
+    monkeypatch.setenv(segments.SEGMENT_BYTES_ENV, "1k")
+    monkeypatch.setenv(segments.SEGMENT_SECONDS_ENV, "-5")
+    events = _fill(3)
+    assert segments.load_manifest(ledger) == []
+    assert json.loads(tail(1)[0])["mac"] == events[-1]["mac"]
+    result, _ = verify_ledger(ledger, KEY, full=True)
+    assert result.ok and result.count == 3
+
+
+@pytest.fixture
+def cli_env(ledger, tmp_path, monkeypatch):
+    monkeypatch.setattr("scripts.prov_tools.LEDGER_PATH", ledger)
+    monkeypatch.setattr("utils.provenance.DEFAULT_KEY_PATH", tmp_path / ".hmac_key")
+    monkeypatch.setenv(
+        "TRUSTINT_HMAC_KEY", base64.urlsafe_b64encode(KEY).rstrip(b"=").decode()
+    )
+    monkeypatch.delenv(segments.SEGMENT_BYTES_ENV)
+    return tmp_path
+
+
+def _check(cli_env):
+    runner = CliRunner()
+    verify = runner.invoke(prov_cli, ["chain-verify", "--full"])
+    doctor = runner.invoke(
+        trustint_cli, ["--db", str(cli_env / "trustint.db"), "doctor", "--full"]
+    )
+    line = next(
+        ln for ln in doctor.output.splitlines() if ln.startswith("Provenance Chain")
+    )
+    return verify, line
+
+
+def test_cli_checks_verify_sealed_segments(cli_env, ledger):
+    _fill(5)
+    rotate_ledger(KEY)
+    assert not ledger.exists()
+
+    verify, doctor = _check(cli_env)
+    assert verify.exit_code == 0, verify.output
+    assert "Chain verification successful" in verify.output
+    assert doctor.endswith(": PASS")
+
+
+def test_cli_checks_fail_on_tampered_sealed_segment(cli_env, ledger):
+    _fill(5)
+    rotate_ledger(KEY)
+    seg1 = segments.segment_path(ledger, 1)
+    lines = seg1.read_text().splitlines()
+    lines[2] = json.dumps({**json.loads(lines[2]), "n": 9})
+    seg1.write_text("\n".join(lines) + "\n")
+
+    verify, doctor = _check(cli_env)
+    assert verify.exit_code != 0
+    assert "FAIL: MAC mismatch at line 3" in doctor
+
+
+def test_verification_leaves_interrupted_rotation_alone(ledger, monkeypatch):
+    monkeypatch.delenv(segments.SEGMENT_BYTES_ENV)
+    _fill(5)
+    rotate_ledger(KEY)
+    segments.manifest_path(ledger).unlink()
+
+    result, _ = verify_ledger(ledger, KEY)
+    assert result.ok and result.count == 5
+    assert not segments.manifest_path(ledger).exists()
+    assert not checkpoint_path(ledger).exists()
+
+    result, _ = verify_ledger(ledger, KEY, save=True)
+    assert result.ok and len(segments.load_manifest(ledger)) == 1
+    assert checkpoint_path(ledger).exists()
+
+
+def test_tail_spans_segments(ledger, monkeypatch):
+    monkeypatch.delenv(segments.SEGMENT_BYTES_ENV)
+    _fill(3)
+    rotate_ledger(KEY)
+    _fill(5, start=3)
+    assert [json.loads(line)["n"] for line in get_provenance_tail()] == [0, 1, 2, 3, 4]
+
+
+def test_compressed_segments_read_in_place(ledger, monkeypatch):
+    monkeypatch.setattr(segments, "FRAME_BYTES", 300)
+    events = _fill(40)
+    verify_ledger(ledger, KEY, save=True)
+    for seg in segments.list_segments(ledger):
+        if seg.sealed:
+            segments.compress_segment(ledger, seg.seq, KEY)
+
+    entries = segments.load_manifest(ledger)
+    assert all(e["file"].endswith(".gz") and len(e["frames"]) > 1 for e in entries)
+    assert all(segments.entry_valid(KEY, e) for e in entries)
+    assert not list(segments.segments_dir(ledger).glob("*.jsonl"))
+
+    assert [e["mac"] for e in segments.iter_events(ledger)] == [
+        e["mac"] for e in events
+    ]
+    assert json.loads(get_provenance_tail()[-1])["n"] == 39
+    result, _ = verify_ledger(ledger, KEY, full=True)
+    assert result.ok, result.message
+    assert result.count == 40
+
+
+def test_seek_into_compressed_frame(ledger, monkeypatch):
+    monkeypatch.setattr(segments, "FRAME_BYTES", 300)
+    monkeypatch.setenv(segments.SEGMENT_BYTES_ENV, "5000")
+    _fill(30)
+    seg = segments.list_segments(ledger)[0]
+    plain = seg.path.read_bytes()
+    segments.compress_segment(ledger, 1, KEY)
+    seg = segments.list_segments(ledger)[0]
+
+    for offset in (0, 1, 299, 300, 1234, len(plain) - 1):
+        with seg.open(offset) as f:
+            assert f.read() == plain[offset:]
+    cut = plain.index(b"\n", 1000) + 1
+    assert seg.last_line(cut) == plain[:cut].rstrip(b"\n").rsplit(b"\n", 1)[-1]
+
+
+def test_tail_reads_backwards_across_compressed_segments(ledger, monkeypatch):
+    monkeypatch.setattr(segments, "FRAME_BYTES", 300)
+    _fill(40)
+    segments.compress_segment(ledger, 1, KEY)
+    assert [json.loads(line)["n"] for line in tail(25)] == list(range(15, 40))
+    assert [json.loads(line)["n"] for line in tail(100)] == list(range(40))
+    assert tail(0) == []
+
+
+def test_follow_streams_across_rotation(ledger, monkeypatch):
+    monkeypatch.delenv(segments.SEGMENT_BYTES_ENV)
+    _fill(3)
+    stream = follow(2, interval=0.01)
+    _fill(5, start=3)
+    rotate_ledger(KEY)
+    _fill(7, start=5)
+    assert [json.loads(next(stream))["n"] for _ in range(6)] == [1, 2, 3, 4, 5, 6]
+
+
+def test_reverse_lines_small_blocks(tmp_path):
+    path = tmp_path / "x.jsonl"
+    path.write_bytes(b"alpha\n\nbeta\r\ngamma-delta\nz")
+    assert list(segments.iter_lines_reversed(path, block=3)) == [
+        b"z",
+        b"gamma-delta",
+        b"beta",
+        b"alpha",
+    ]
+    assert list(segments.iter_lines_reversed(path, end=11, block=4)) == [
+        b"beta",
+        b"alpha",
+    ]
@@ -0,0 +1,165 @@
+import base64
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from utils import segments, verify
+from utils.provenance import append_event, rotate_ledger
+from utils.verify import checkpoint_path, load_checkpoint, verify_chain, verify_ledger
+
+KEY = b"k" * 32
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    path = tmp_path / "events.jsonl"
+    monkeypatch.setattr("utils.provenance.LEDGER_PATH", path)
+    for i in range(50):
+        append_event({"event": "test", "n": i}, key=KEY)
+    return path
+
+
+def _rewrite_line(path, index, mutate):
+    lines = path.read_text(encoding="utf-8").splitlines()
+    obj = json.loads(lines[index])
+    mutate(obj)
+    lines[index] = json.dumps(obj)
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_verify_valid_chain(ledger, monkeypatch, workers):
+    monkeypatch.setattr(verify, "PARALLEL_MIN_BYTES", 0)
+    result = verify_chain(ledger, KEY, workers=workers, chunk_lines=7)
+    assert result.ok, result.message
+    assert result.count == 50
+    assert result.offset == ledger.stat().st_size
+    assert result.last_mac == json.loads(ledger.read_text().splitlines()[-1])["mac"]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_verify_detects_tampered_payload(ledger, monkeypatch, workers):
+    monkeypatch.setattr(verify, "PARALLEL_MIN_BYTES", 0)
+    _rewrite_line(ledger, 20, lambda obj: obj.update(n=999))
+    result = verify_chain(ledger, KEY, workers=workers, chunk_lines=7)
+    assert not result.ok
+    assert result.message == "MAC mismatch at line 21"
+    assert result.count == 20
+
+
+def test_verify_detects_broken_linkage(ledger):
+    lines = ledger.read_text(encoding="utf-8").splitlines()
+    del lines[10]
+    ledger.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    result = verify_chain(ledger, KEY)
+    assert result.message == "prev MAC mismatch at line 11"
+
+
+def test_verify_reports_json_errors(ledger):
+    with open(ledger, "a", encoding="utf-8") as f:
+        f.write("{not json\n")
+    result = verify_chain(ledger, KEY)
+    assert not result.ok
+    assert result.line == 51
+    assert result.error.startswith("JSON error")
+
+
+def test_verify_wrong_key(ledger):
+    result = verify_chain(ledger, b"x" * 32)
+    assert result.message == "MAC mismatch at line 1"
+
+
+def test_checkpoint_resumes_and_advances(ledger):
+    result, start = verify_ledger(ledger, KEY, save=True)
+    assert result.ok and start is None
+    assert checkpoint_path(ledger).exists()
+
+    for i in range(3):
+        append_event({"event": "new", "n": i}, key=KEY)
+    result, start = verify_ledger(ledger, KEY, save=True)
+    assert result.ok
+    assert start is not None and start.line == 50
+    assert result.count == 53
+    assert load_checkpoint(ledger, KEY).line == 53
+
+
+def test_full_ignores_checkpoint(ledger):
+    verify_ledger(ledger, KEY, save=True)
+    # Same-length edit so the checkpoint boundary still lines up.
+    _rewrite_line(ledger, 5, lambda obj: obj.update(n=7))
+    append_event({"event": "after"}, key=KEY)
+
+    # Damage before a checkpoint is only found by a full pass.
+    result, start = verify_ledger(ledger, KEY, save=True)
+    assert start is not None and result.ok
+    result, _ = verify_ledger(ledger, KEY, full=True)
+    assert result.message == "MAC mismatch at line 6"
+
+
+def test_checkpoint_rejected_when_forged_or_stale(ledger):
+    verify_ledger(ledger, KEY, save=True)
+    cp_file = checkpoint_path(ledger)
+    raw = json.loads(cp_file.read_text())
+    raw["line"] = 1
+    cp_file.write_text(json.dumps(raw))
+    assert load_checkpoint(ledger, KEY) is None
+
+    verify_ledger(ledger, KEY, full=True, save=True)
+    assert load_checkpoint(ledger, KEY) is not None
+    lines = ledger.read_text(encoding="utf-8").splitlines()
+    ledger.write_text("\n".join(lines[:10]) + "\n", encoding="utf-8")
+    assert load_checkpoint(ledger, KEY) is None
+
+
+def test_readonly_does_not_write_checkpoint(ledger, monkeypatch):
+    monkeypatch.setenv("TRUSTINT_READONLY", "1")
+    result, _ = verify_ledger(ledger, KEY, save=True)
+    assert result.ok
+    assert not checkpoint_path(ledger).exists()
+
+
+def test_verification_is_read_only_by_default(ledger):
+    result, _ = verify_ledger(ledger, KEY)
+    assert result.ok
+    assert not checkpoint_path(ledger).exists()
+
+
+def _local_verify(tmp_path, *args):
+    script = Path(__file__).resolve().parents[1] / "scripts" / "local_verify.py"
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+    return subprocess.run(
+        [sys.executable, str(script), *map(str, args)],
+        cwd=tmp_path,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_local_verify_runs_outside_the_repo(ledger, tmp_path):
+    key_file = tmp_path / "key.b64"
+    key_file.write_text(base64.urlsafe_b64encode(KEY).rstrip(b"=").decode())
+    rotate_ledger(KEY)
+    for i in range(3):
+        append_event({"event": "after", "n": i}, key=KEY)
+
+    # The sealed segment and the active file after it each verify on their own.
+    sealed = _local_verify(tmp_path, segments.segment_path(ledger, 1), key_file)
+    assert (sealed.returncode, sealed.stderr) == (0, "")
+    assert "PASS: verified 50 events" in sealed.stdout
+    active = _local_verify(tmp_path, ledger, key_file)
+    assert (active.returncode, active.stderr) == (0, "")
+    assert "PASS: verified 3 events" in active.stdout
+
+    _rewrite_line(ledger, 1, lambda obj: obj.update(n=9))
+    broken = _local_verify(tmp_path, ledger, key_file)
+    assert broken.returncode == 1
+    assert broken.stdout.startswith("FAIL line 2: MAC mismatch")
+
+    missing = _local_verify(tmp_path, ledger, tmp_path / "nokey")
+    assert missing.returncode == 2
+    assert "ERR: key not found" in missing.stderr
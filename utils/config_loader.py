@@ -0,0 +1,127 @@
+"""
+Shared YAML loader for config/.
+
+Files are parsed with libyaml's CSafeLoader when PyYAML was built with it (the
+pure-Python SafeLoader otherwise). Parsed documents are cached as pickles under
+the repository's `vault/cache/config/`, one entry per source path, validated
+against the file's (inode, size, mtime, ctime) signature, so `trustint validate`
+followed by `trustint ingest` parses each file once. Each entry starts with its
+source path, and entries whose source no longer exists are pruned whenever a new
+entry is written. The cache is derived data: it is not written in read-only mode
+and any unreadable entry is simply re-parsed.
+"""
+
+from __future__ import annotations
+
+import datetime
+import hashlib
+import io
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Optional
+
+import yaml
+
+from utils.logger import get_logger
+
+LOG = get_logger("config_loader")
+
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+CACHE_DIR = Path(__file__).resolve().parents[1] / "vault" / "cache" / "config"
+
+# safe_load only builds plain containers, scalars and these.
+_ALLOWED_GLOBALS = {
+    ("datetime", "date"): datetime.date,
+    ("datetime", "datetime"): datetime.datetime,
+    ("datetime", "timedelta"): datetime.timedelta,
+    ("datetime", "timezone"): datetime.timezone,
+}
+
+
+class _Unpickler(pickle.Unpickler):
+    """Refuses every global but the datetime types safe_load can produce."""
+
+    def find_class(self, module: str, name: str) -> Any:
+        try:
+            return _ALLOWED_GLOBALS[(module, name)]
+        except KeyError:
+            raise pickle.UnpicklingError(f"{module}.{name} is not allowed") from None
+
+
+def _file_sig(path: Path) -> Optional[tuple]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def _cache_path(source: str) -> Path:
+    name = hashlib.sha256(source.encode("utf-8")).hexdigest()[:32]
+    return CACHE_DIR / f"{name}.pickle"
+
+
+def _prune(keep: Path) -> None:
+    """Remove cache entries whose source file no longer exists."""
+    for entry in CACHE_DIR.glob("*.pickle"):
+        if entry == keep:
+            continue
+        try:
+            with open(entry, "rb") as f:
+                source = _Unpickler(f).load()
+            if isinstance(source, str) and Path(source).exists():
+                continue
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            LOG.debug("Config cache entry %s unusable: %s", entry, e)
+        entry.unlink(missing_ok=True)
+
+
+def _readonly() -> bool:
+    return os.getenv("TRUSTINT_READONLY") in {"1", "true", "True"}
+
+
+def parse_yaml(text: str) -> Any:
+    return yaml.load(text, Loader=SafeLoader)
+
+
+def load_yaml(path: Path) -> Any:
+    """Parsed contents of the YAML file at `path`, or None if it does not exist."""
+    sig = _file_sig(path)
+    if sig is None:
+        return None
+    source = str(path.resolve())
+    cache = _cache_path(source)
+    try:
+        with open(cache, "rb") as f:
+            unpickler = _Unpickler(f)
+            cached_source = unpickler.load()
+            cached_sig, data = unpickler.load()
+        if cached_source == source and tuple(cached_sig) == sig:
+            return data
+    except FileNotFoundError:
+        pass
+    except Exception as e:  # a stale or corrupt entry is re-parsed
+        LOG.debug("Config cache entry %s unusable: %s", cache, e)
+
+    data = parse_yaml(path.read_text(encoding="utf-8"))
+    if not _readonly():
+        try:
+            buf = io.BytesIO()
+            pickle.dump(source, buf, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump((sig, data), buf, protocol=pickle.HIGHEST_PROTOCOL)
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+            tmp.write_bytes(buf.getvalue())
+            os.replace(tmp, cache)
+            _prune(cache)
+        except OSError as e:
+            LOG.warning("Could not write config cache %s: %s", cache, e)
+    return data
+
+
+def clear_cache() -> None:
+    for entry in CACHE_DIR.glob("*.pickle"):
+        entry.unlink(missing_ok=True)
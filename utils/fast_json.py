@@ -0,0 +1,66 @@
+"""
+Compact JSON encoding for exports.
+
+Uses orjson when it is installed and the stdlib encoder otherwise. Both write
+compact separators and keep non-ASCII text as UTF-8, so for the text, integer
+and null values the exports carry they produce the same bytes.
+"""
+
+from __future__ import annotations
+
+import importlib
+import json
+from typing import Any, Callable, Sequence
+
+_orjson: Any = None
+try:
+    _orjson = importlib.import_module("orjson")
+except ImportError:
+    pass
+
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def backend() -> str:
+    return "orjson" if _orjson is not None else "json"
+
+
+def dumps(obj: Any) -> bytes:
+    if _orjson is not None:
+        return _orjson.dumps(obj)
+    return _ENCODER.encode(obj).encode("utf-8")
+
+
+def jsonl_encoder(
+    columns: Sequence[str],
+) -> Callable[[Sequence[Sequence[Any]]], bytes]:
+    """
+    A function turning a batch of row tuples into JSONL bytes, one object per
+    row keyed by `columns`.
+    """
+    if _orjson is not None:
+        dumps, opt = _orjson.dumps, _orjson.OPT_APPEND_NEWLINE
+        names = tuple(columns)
+
+        def encode_fast(rows: Sequence[Sequence[Any]]) -> bytes:
+            return b"".join(
+                [dumps(dict(zip(names, r, strict=True)), option=opt) for r in rows]
+            )
+
+        return encode_fast
+
+    # Key prefixes are encoded once; per row only the values are.
+    keys = [
+        ("{" if i == 0 else ",") + json.dumps(c) + ":" for i, c in enumerate(columns)
+    ]
+    enc = _ENCODER.encode
+
+    def encode(rows: Sequence[Sequence[Any]]) -> bytes:
+        return "".join(
+            [
+                "".join([k + enc(v) for k, v in zip(keys, r, strict=True)]) + "}\n"
+                for r in rows
+            ]
+        ).encode("utf-8")
+
+    return encode
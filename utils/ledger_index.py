@@ -0,0 +1,235 @@
+"""
+SQLite index over the provenance ledger.
+
+`vault/events.index.db` maps every ledger line to its segment and byte offset,
+keyed by event type, sha256, ticket_id and ts, so forensic lookups seek straight
+to the matching lines instead of scanning the JSONL. The index is derived data:
+`sync` catches it up from a watermark (segment, offset, line, mac) and
+`rebuild` recreates it from the ledger. Once the index exists, the write path
+keeps it current after every append on a connection each thread keeps open
+for the index file; the schema is only created with the file.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils import segments
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger_index (
+    line      INTEGER PRIMARY KEY,  -- global (1-based) ledger line
+    segment   INTEGER NOT NULL,
+    offset    INTEGER NOT NULL,     -- uncompressed byte offset within the segment
+    length    INTEGER NOT NULL,
+    event     TEXT,
+    sha256    TEXT,
+    ticket_id TEXT,
+    ts        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_ledger_index_event ON ledger_index(event, ts);
+CREATE INDEX IF NOT EXISTS idx_ledger_index_sha256 ON ledger_index(sha256);
+CREATE INDEX IF NOT EXISTS idx_ledger_index_ticket ON ledger_index(ticket_id);
+CREATE INDEX IF NOT EXISTS idx_ledger_index_ts ON ledger_index(ts);
+CREATE TABLE IF NOT EXISTS ledger_index_state (
+    id      INTEGER PRIMARY KEY CHECK (id = 1),
+    segment INTEGER NOT NULL,
+    offset  INTEGER NOT NULL,
+    line    INTEGER NOT NULL,
+    mac     TEXT NOT NULL
+);
+"""
+
+# (segment, offset, line, mac): everything before `offset` in `segment` is indexed.
+_Watermark = Tuple[int, int, int, str]
+
+
+def index_path(ledger: Path) -> Path:
+    return ledger.with_suffix(".index.db")
+
+
+def exists(ledger: Path) -> bool:
+    return index_path(ledger).exists()
+
+
+# This thread's open index connections: path -> (inode, connection).
+_local = threading.local()
+# Connections inherited across fork; kept referenced and never closed.
+_inherited: List[sqlite3.Connection] = []
+
+
+def _forget_after_fork() -> None:
+    global _local
+    _inherited.extend(con for _, con in getattr(_local, "cons", {}).values())
+    _local = threading.local()
+
+
+os.register_at_fork(after_in_child=_forget_after_fork)
+
+
+def _connect(ledger: Path) -> sqlite3.Connection:
+    """This thread's connection to the index, opened (and created) on first use."""
+    path = index_path(ledger)
+    cons = _local.__dict__.setdefault("cons", {})
+    try:
+        inode = path.stat().st_ino
+    except FileNotFoundError:
+        inode = -1
+    cached = cons.get(str(path))
+    if cached is not None and cached[0] == inode:
+        return cached[1]
+    if cached is not None:
+        cached[1].close()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    created = inode == -1 or path.stat().st_size == 0
+    con = sqlite3.connect(str(path), timeout=30.0)
+    con.row_factory = sqlite3.Row
+    con.execute("PRAGMA journal_mode=WAL;")
+    # Rebuildable from the ledger, so commits need not be durable.
+    con.execute("PRAGMA synchronous=OFF;")
+    if created:
+        con.executescript(_SCHEMA)
+    cons[str(path)] = (path.stat().st_ino, con)
+    return con
+
+
+def _watermark(con: sqlite3.Connection) -> _Watermark:
+    row = con.execute(
+        "SELECT segment, offset, line, mac FROM ledger_index_state WHERE id = 1"
+    ).fetchone()
+    return tuple(row) if row else (1, 0, 0, "")
+
+
+def _row(seq: int, offset: int, line: int, raw: bytes) -> Optional[Tuple[tuple, str]]:
+    try:
+        event = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(event, dict):
+        return None
+    return (
+        line,
+        seq,
+        offset,
+        len(raw),
+        event.get("event") or event.get("type"),
+        event.get("sha256"),
+        event.get("ticket_id"),
+        event.get("ts"),
+    ), event.get("mac", "")
+
+
+def _sync(con: sqlite3.Connection, ledger: Path) -> int:
+    segs = segments.list_segments(ledger)
+    seq, offset, line, mac = _watermark(con)
+    if not segments.prefix_intact(segs, seq, offset, mac):
+        con.execute("DELETE FROM ledger_index")
+        seq, offset, line, mac = 1, 0, 0, ""
+    rows = []
+    for at_seq, start, raw in segments.iter_lines(segs, seq, offset):
+        seq, offset = at_seq, start + len(raw)
+        line += 1
+        parsed = _row(seq, start, line, raw) if raw.strip() else None
+        if parsed is not None:
+            rows.append(parsed[0])
+            mac = parsed[1]
+    con.executemany(
+        "INSERT OR REPLACE INTO ledger_index"
+        " (line, segment, offset, length, event, sha256, ticket_id, ts)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    con.execute(
+        "INSERT OR REPLACE INTO ledger_index_state (id, segment, offset, line, mac)"
+        " VALUES (1, ?, ?, ?, ?)",
+        (seq, offset, line, mac),
+    )
+    return len(rows)
+
+
+def sync(ledger: Path) -> int:
+    """Index ledger lines appended since the watermark; returns rows added."""
+    con = _connect(ledger)
+    with con:
+        return _sync(con, ledger)
+
+
+def rebuild(ledger: Path) -> int:
+    """Drop the index and re-create it from the whole ledger."""
+    con = _connect(ledger)
+    # Dropped in place: the cached connection keeps the file and its WAL open.
+    con.executescript(
+        "DROP TABLE IF EXISTS ledger_index; DROP TABLE IF EXISTS ledger_index_state;"
+        + _SCHEMA
+    )
+    return sync(ledger)
+
+
+def locate(ledger: Path, line: int) -> Optional[Tuple[int, int, int]]:
+    """(segment, offset, length) of global `line` if it is indexed."""
+    row = (
+        _connect(ledger)
+        .execute(
+            "SELECT segment, offset, length FROM ledger_index WHERE line = ?", (line,)
+        )
+        .fetchone()
+    )
+    return tuple(row) if row else None
+
+
+def query(
+    ledger: Path,
+    *,
+    event: Optional[str] = None,
+    sha256: Optional[str] = None,
+    ticket_id: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    limit: Optional[int] = None,
+    refresh: bool = True,
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Yield (line, event) for ledger events matching every given filter, in ledger
+    order. `since`/`until` compare against the ISO `ts` (inclusive). Each match
+    is read with a direct seek to its offset.
+    """
+    clauses: List[str] = []
+    params: List[Any] = []
+    for column, value in (
+        ("event", event),
+        ("sha256", sha256),
+        ("ticket_id", ticket_id),
+    ):
+        if value is not None:
+            clauses.append(f"{column} = ?")
+            params.append(value)
+    if since is not None:
+        clauses.append("ts >= ?")
+        params.append(since)
+    if until is not None:
+        clauses.append("ts <= ?")
+        params.append(until)
+    sql = "SELECT line, segment, offset, length FROM ledger_index"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += " ORDER BY line"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    con = _connect(ledger)
+    if refresh:
+        with con:
+            _sync(con, ledger)
+    rows = con.execute(sql, params).fetchall()
+
+    segs = segments.list_segments(ledger)
+    for row in rows:
+        with segs[row["segment"] - 1].open(row["offset"]) as f:
+            yield row["line"], json.loads(f.read(row["length"]))
@@ -0,0 +1,339 @@
+"""
+Merkle accumulator over the provenance ledger.
+
+Every ledger line is a leaf, hashed as in RFC 6962 (leaf = H(0x00 || line),
+node = H(0x01 || left || right)). Complete subtree hashes are kept per level in
+append-only files under `vault/merkle/` (`level-00.bin` holds the leaves), so the
+root of any ledger prefix and the inclusion proof for any line need O(log n)
+reads.
+
+Every ROOT_EVERY leaves (and on demand) the current root is signed with the
+ledger key and appended to `roots.jsonl`. An inclusion proof ties one event line
+to one root, so that event can be checked without the rest of the ledger.
+
+Roots are "signed" with an HMAC under the same symmetric secret that signs the
+ledger, so the signature is only meaningful to key holders. An auditor without
+the key checks a proof against a root hash obtained out of band (published, or
+handed over earlier) with `verify_inclusion`, which needs no key.
+
+`roots.jsonl` is evidence and is never discarded implicitly: if the ledger no
+longer matches the accumulator, `sync` raises MerkleMismatch and leaves every
+file alone. Only `rebuild` starts over, and it archives the old roots first.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from utils import ledger_index, segments
+from utils.logger import get_logger
+
+HASH_LEN = 32
+LOG = get_logger("merkle")
+# Sign a root each time the tree grows by this many leaves.
+ROOT_EVERY = 4096
+
+
+class MerkleMismatch(ValueError):
+    """The ledger no longer extends the prefix the accumulator was built from."""
+
+
+def merkle_dir(ledger: Path) -> Path:
+    return ledger.parent / "merkle"
+
+
+def _state_path(ledger: Path) -> Path:
+    return merkle_dir(ledger) / "state.json"
+
+
+def _roots_path(ledger: Path) -> Path:
+    return merkle_dir(ledger) / "roots.jsonl"
+
+
+def _level_path(ledger: Path, level: int) -> Path:
+    return merkle_dir(ledger) / f"level-{level:02d}.bin"
+
+
+def exists(ledger: Path) -> bool:
+    return _state_path(ledger).exists()
+
+
+def leaf_hash(line: bytes) -> bytes:
+    return hashlib.sha256(b"\x00" + line.rstrip(b"\r\n")).digest()
+
+
+def _node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def _load_state(ledger: Path) -> Dict[str, Any]:
+    try:
+        return json.loads(_state_path(ledger).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"segment": 1, "offset": 0, "size": 0, "mac": ""}
+
+
+def _save_state(ledger: Path, state: Dict[str, Any]) -> None:
+    path = _state_path(ledger)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(state), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def _node(ledger: Path, level: int, index: int) -> bytes:
+    with open(_level_path(ledger, level), "rb") as f:
+        f.seek(index * HASH_LEN)
+        data = f.read(HASH_LEN)
+    if len(data) != HASH_LEN:
+        raise ValueError(f"merkle node {level}/{index} missing")
+    return data
+
+
+def _truncate(ledger: Path, size: int) -> None:
+    """Cut every level back to the nodes of a `size`-leaf tree (crash repair)."""
+    level = 0
+    while (path := _level_path(ledger, level)).exists():
+        keep = (size >> level) * HASH_LEN
+        if keep == 0:
+            path.unlink()
+        elif path.stat().st_size > keep:
+            os.truncate(path, keep)
+        level += 1
+
+
+def sync(ledger: Path, key: bytes) -> int:
+    """
+    Add leaves for ledger lines appended since the last sync and sign a root at
+    every ROOT_EVERY boundary crossed; returns the number of leaves added.
+    """
+    merkle_dir(ledger).mkdir(parents=True, exist_ok=True)
+    segs = segments.list_segments(ledger)
+    state = _load_state(ledger)
+    if not segments.prefix_intact(
+        segs, state["segment"], state["offset"], state["mac"]
+    ):
+        LOG.error(
+            "Ledger does not extend the Merkle tree over %d lines (segment %d,"
+            " offset %d); signed roots kept, run merkle-build --rebuild to restart",
+            state["size"],
+            state["segment"],
+            state["offset"],
+        )
+        raise MerkleMismatch(
+            f"ledger no longer matches the Merkle tree over {state['size']} lines"
+        )
+    size = old_size = state["size"]
+    _truncate(ledger, size)
+
+    # frontier[k]: the pending left node at level k (set while size >> k is odd).
+    frontier: Dict[int, bytes] = {}
+    level = 0
+    while size >> level:
+        if (size >> level) & 1:
+            frontier[level] = _node(ledger, level, (size >> level) - 1)
+        level += 1
+
+    new_nodes: Dict[int, List[bytes]] = {}
+    for seq, start, raw in segments.iter_lines(segs, state["segment"], state["offset"]):
+        state["segment"], state["offset"] = seq, start + len(raw)
+        if raw.strip():
+            try:
+                state["mac"] = json.loads(raw).get("mac", state["mac"])
+            except (ValueError, AttributeError):
+                pass
+        h, level = leaf_hash(raw), 0
+        new_nodes.setdefault(0, []).append(h)
+        while (size >> level) & 1:
+            h = _node_hash(frontier.pop(level), h)
+            level += 1
+            new_nodes.setdefault(level, []).append(h)
+        frontier[level] = h
+        size += 1
+
+    for level, nodes in new_nodes.items():
+        with open(_level_path(ledger, level), "ab") as f:
+            f.write(b"".join(nodes))
+    state["size"] = size
+    _save_state(ledger, state)
+
+    for boundary in range(
+        (old_size // ROOT_EVERY + 1) * ROOT_EVERY, size + 1, ROOT_EVERY
+    ):
+        sign_root(ledger, key, boundary)
+    return size - old_size
+
+
+def rebuild(ledger: Path, key: bytes) -> int:
+    """
+    Recreate the accumulator from the whole ledger. Existing signed roots are
+    moved to `roots-<UTC timestamp>.jsonl` beside it, never deleted.
+    """
+    roots = _roots_path(ledger)
+    if roots.exists():
+        stamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+        archive = roots.with_name(f"roots-{stamp}.jsonl")
+        n = 1
+        while archive.exists():
+            n += 1
+            archive = roots.with_name(f"roots-{stamp}-{n}.jsonl")
+        os.replace(roots, archive)
+        LOG.info("Archived signed roots to %s", archive)
+    for path in [_state_path(ledger), *merkle_dir(ledger).glob("level-*.bin")]:
+        path.unlink(missing_ok=True)
+    return sync(ledger, key)
+
+
+def tree_size(ledger: Path) -> int:
+    return int(_load_state(ledger)["size"])
+
+
+def _subtree(ledger: Path, start: int, n: int) -> bytes:
+    """Hash of leaves [start, start + n) as laid out by the RFC 6962 split."""
+    if n == 0:
+        return hashlib.sha256(b"").digest()
+    if n & (n - 1) == 0:
+        level = n.bit_length() - 1
+        return _node(ledger, level, start >> level)
+    k = 1 << ((n - 1).bit_length() - 1)  # largest power of two below n
+    return _node_hash(_subtree(ledger, start, k), _subtree(ledger, start + k, n - k))
+
+
+def root(ledger: Path, size: Optional[int] = None) -> bytes:
+    """Merkle root of the first `size` leaves (default: the whole tree)."""
+    return _subtree(ledger, 0, tree_size(ledger) if size is None else size)
+
+
+def _audit_path(ledger: Path, m: int, start: int, n: int) -> List[bytes]:
+    if n <= 1:
+        return []
+    k = 1 << ((n - 1).bit_length() - 1)
+    if m < k:
+        return [*_audit_path(ledger, m, start, k), _subtree(ledger, start + k, n - k)]
+    return [*_audit_path(ledger, m - k, start + k, n - k), _subtree(ledger, start, k)]
+
+
+def _root_mac(key: bytes, record: Dict[str, Any]) -> str:
+    body = {k: record[k] for k in ("size", "root", "ts")}
+    msg = json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hmac.new(key, b"merkle-root:" + msg, hashlib.sha256).hexdigest()
+
+
+def sign_root(ledger: Path, key: bytes, size: Optional[int] = None) -> Dict[str, Any]:
+    """Sign the root of the first `size` leaves and append it to roots.jsonl."""
+    size = tree_size(ledger) if size is None else size
+    record: Dict[str, Any] = {
+        "size": size,
+        "root": root(ledger, size).hex(),
+        "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+    }
+    record["hmac"] = _root_mac(key, record)
+    with open(_roots_path(ledger), "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+    return record
+
+
+def signed_roots(ledger: Path) -> List[Dict[str, Any]]:
+    try:
+        lines = _roots_path(ledger).read_text(encoding="utf-8").splitlines()
+    except FileNotFoundError:
+        return []
+    return [json.loads(line) for line in lines if line.strip()]
+
+
+def prove(
+    ledger: Path, line: int, key: bytes, size: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Build an inclusion proof for global ledger `line` (1-based) against the
+    newest signed root covering it (signing a fresh root if none does yet), or
+    against the signed root over exactly `size` lines.
+    """
+    sync(ledger, key)
+    if not 1 <= line <= tree_size(ledger):
+        raise ValueError(f"line {line} is not in the ledger")
+    roots = reversed(signed_roots(ledger))
+    if size is not None:
+        if size < line:
+            raise ValueError(f"line {line} is not covered by a root over {size} lines")
+        signed = next((r for r in roots if r["size"] == size), None)
+        if signed is None:
+            raise ValueError(f"no signed root over {size} lines")
+    else:
+        signed = next((r for r in roots if r["size"] >= line), None)
+        if signed is None:
+            signed = sign_root(ledger, key)
+
+    return {
+        "line": line,
+        "event": _read_line(ledger, line).rstrip(b"\r\n").decode("utf-8"),
+        "path": [h.hex() for h in _audit_path(ledger, line - 1, 0, signed["size"])],
+        "root": signed,
+    }
+
+
+def _read_line(ledger: Path, line: int) -> bytes:
+    """Raw bytes of global `line`, via the ledger index when it is built."""
+    segs = segments.list_segments(ledger)
+    if ledger_index.exists(ledger):
+        loc = ledger_index.locate(ledger, line)
+        if loc is not None:
+            seq, offset, length = loc
+            with segs[seq - 1].open(offset) as f:
+                return f.read(length)
+    seg = next(s for s in reversed(segs) if s.first_line <= line)
+    target = line - seg.first_line
+    for i, (_, _, raw) in enumerate(segments.iter_lines(segs[: seg.seq], seg.seq)):
+        if i == target:
+            return raw
+    raise ValueError(f"line {line} is not in the ledger")
+
+
+def verify_proof(proof: Dict[str, Any], key: bytes) -> bool:
+    """
+    Check an inclusion proof (RFC 9162 2.1.3.2) against the root it carries and
+    that root's HMAC signature; needs the ledger key.
+    """
+    try:
+        signed = proof["root"]
+        if not hmac.compare_digest(str(signed.get("hmac", "")), _root_mac(key, signed)):
+            return False
+        return _verify_path(proof, signed["root"])
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def verify_inclusion(proof: Dict[str, Any], root_hex: str) -> bool:
+    """
+    Check an inclusion proof against `root_hex`, a root hash over
+    `proof["root"]["size"]` lines obtained out of band. Needs no key.
+    """
+    try:
+        return _verify_path(proof, root_hex)
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def _verify_path(proof: Dict[str, Any], root_hex: str) -> bool:
+    fn, sn = proof["line"] - 1, proof["root"]["size"] - 1
+    if not 0 <= fn <= sn:
+        return False
+    r = leaf_hash(proof["event"].encode("utf-8"))
+    for p in (bytes.fromhex(h) for h in proof["path"]):
+        if sn == 0:
+            return False
+        if fn & 1 or fn == sn:
+            r = _node_hash(p, r)
+            while not fn & 1 and fn != 0:
+                fn >>= 1
+                sn >>= 1
+        else:
+            r = _node_hash(r, p)
+        fn >>= 1
+        sn >>= 1
+    return sn == 0 and hmac.compare_digest(r.hex(), str(root_hex).lower())
@@ -4,9 +4,16 @@ import hmac
 import json
 import os
 import re
+import sqlite3
 import time
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Any, Dict, Iterator, Optional, Self, Tuple
+
+from utils import ledger_index, merkle, segments
+from utils.logger import get_logger
+from utils.segments import read_last_line
+
+LOG = get_logger("provenance")
 
 # Constants
 KEY_LEN_BYTES = 32
@@ -19,11 +26,30 @@ _B64URL_RE = re.compile(r"^[A-Za-z0-9\-_]+$")
 _HEX_RE = re.compile(r"^[a-fA-F0-9]+$")
 
 
+# Process-level key cache: {(purpose, key path, env key): (file signature, result)}.
+# A hit is reused only while the key file's signature (inode, size, mtime, ctime)
+# is unchanged, so an in-place rewrite or a swapped file is picked up.
+_KEY_CACHE: Dict[Tuple[str, str, Optional[str]], Tuple[Optional[tuple], Any]] = {}
+
+
+def _file_sig(path: Path) -> Optional[tuple]:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def clear_key_cache() -> None:
+    """Forget cached HMAC keys (call after rotating the key in-process)."""
+    _KEY_CACHE.clear()
+
+
 # REPLACE the entire function with this:
 
 
 def _preflight_hmac_or_die(vault_key_path: Optional[Path] = None) -> bytes:
-    # Hard refuses
+    # Hard refuses (env lookups only, so they are re-checked on every call)
     if os.getenv("CI") == "true":
         raise SystemExit("Refusing to sign in CI.")
     if os.getenv("TRUSTINT_READONLY") in {"1", "true", "True"}:
@@ -33,6 +59,18 @@ def _preflight_hmac_or_die(vault_key_path: Optional[Path] = None) -> bytes:
     key_path = Path(vault_key_path) if vault_key_path is not None else DEFAULT_KEY_PATH
     ek = os.getenv("TRUSTINT_HMAC_KEY")
 
+    # One stat instead of exists + read + decode on the hot append path.
+    cache_key = ("sign", str(key_path), ek)
+    sig = _file_sig(key_path)
+    hit = _KEY_CACHE.get(cache_key)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    key = _resolve_signing_key(key_path, ek, sig is not None)
+    _KEY_CACHE[cache_key] = (sig, key)
+    return key
+
+
+def _resolve_signing_key(key_path: Path, ek: Optional[str], file_exists: bool) -> bytes:
     def _b64u_decode(b: bytes) -> bytes:
         return base64.urlsafe_b64decode(b + b"=" * ((4 - (len(b) % 4)) % 4))
 
@@ -42,7 +80,7 @@ def _preflight_hmac_or_die(vault_key_path: Optional[Path] = None) -> bytes:
         except Exception:
             return raw  # treat as raw key bytes
 
-    if key_path.exists():
+    if file_exists:
         vk = _try_decode_file(key_path.read_bytes())
         if ek:
             if _b64u_decode(ek.encode()) != vk:
@@ -70,8 +108,25 @@ def load_hmac_key() -> Tuple[bytes, str]:
         A tuple containing:
         - The key as bytes.
         - A status string describing how the key was loaded.
+
+    Successful loads are cached per process until the key file changes.
     """
     env_key = os.getenv("TRUSTINT_HMAC_KEY")
+    key_path = Path(os.getenv("TRUSTINT_HMAC_KEY_FILE") or DEFAULT_KEY_PATH)
+    cache_key = ("load", str(key_path), env_key)
+    sig = None if env_key else _file_sig(key_path)
+    hit = _KEY_CACHE.get(cache_key)
+    if hit is not None and hit[0] == sig:
+        return hit[1]
+    result = _load_hmac_key_uncached(env_key, key_path)
+    if result[0]:
+        _KEY_CACHE[cache_key] = (sig, result)
+    return result
+
+
+def _load_hmac_key_uncached(
+    env_key: Optional[str], key_path: Path
+) -> Tuple[bytes, str]:
     if env_key:
         key_str = env_key.strip()
         try:
@@ -98,8 +153,6 @@ def load_hmac_key() -> Tuple[bytes, str]:
                 "FAIL: Invalid format for TRUSTINT_HMAC_KEY (expected base64url or hex)",
             )
 
-    key_path = Path(os.getenv("TRUSTINT_HMAC_KEY_FILE") or DEFAULT_KEY_PATH)
-
     if key_path.exists():
         try:
             content = key_path.read_text("utf-8").strip()
@@ -156,45 +209,276 @@ def sha256_bytes(data: bytes) -> str:
     return hashlib.sha256(data).hexdigest()
 
 
+def _head_path() -> Path:
+    """Sidecar holding the ledger's byte size and last mac (resolved at call time)."""
+    return LEDGER_PATH.with_suffix(".head")
+
+
+def _read_head() -> Optional[dict]:
+    try:
+        return json.loads(_head_path().read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_head(size: int, mac: str) -> None:
+    head = _head_path()
+    tmp = head.with_name(head.name + ".tmp")
+    tmp.write_text(json.dumps({"size": size, "mac": mac}), encoding="utf-8")
+    os.replace(tmp, head)
+
+
+def _ledger_head(key: Optional[bytes] = None) -> str:
+    """
+    Resolve the mac the next event must chain to.
+
+    The sidecar head is trusted only when its recorded size matches the ledger on
+    disk; after a crash between the ledger write and the head update (or any
+    out-of-band append) we fall back to a reverse seek from EOF. An empty or
+    missing active segment chains to the last sealed segment.
+    """
+    try:
+        size = LEDGER_PATH.stat().st_size
+    except FileNotFoundError:
+        size = 0
+    head = _read_head()
+    if head is not None and head.get("size") == size:
+        return str(head.get("mac", ""))
+    if size == 0:
+        if key is not None:
+            segments.recover(LEDGER_PATH, key)
+        return segments.last_sealed_mac(LEDGER_PATH)
+    try:
+        last_line = read_last_line(LEDGER_PATH, size).strip()
+        if last_line:
+            return json.loads(last_line).get("mac", "")
+    except (IOError, json.JSONDecodeError, UnicodeDecodeError):
+        # Handle case where file is empty or corrupt
+        pass
+    return ""
+
+
+def _seal(event: dict, prev_mac: str, key: bytes) -> dict:
+    """Chain a timestamped `event` onto `prev_mac` and compute its mac."""
+    enriched = {k: v for k, v in event.items() if k != "mac"}
+    enriched["prev"] = prev_mac
+    msg = json.dumps(enriched, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    enriched["mac"] = hmac.new(key, msg, hashlib.sha256).hexdigest()
+    return enriched
+
+
+def _stamp(event: dict) -> dict:
+    return {**event, "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+
+
+def _encode(enriched: dict) -> bytes:
+    return (json.dumps(enriched, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _write_lines(data: bytes, last_mac: str, key: bytes, fsync: bool = False) -> None:
+    with open(LEDGER_PATH, "ab") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+        size = f.tell()
+    if segments.should_rotate(LEDGER_PATH, size) and segments.seal_active(
+        LEDGER_PATH, key
+    ):
+        size = 0
+    _write_head(size, last_mac)
+    _update_sidecars(key)
+
+
+def _update_sidecars(key: bytes) -> None:
+    """
+    Catch up the derived ledger index and Merkle accumulator, if enabled.
+    Both rebuild from the ledger, so a failure here never fails the append.
+    """
+    if ledger_index.exists(LEDGER_PATH):
+        try:
+            ledger_index.sync(LEDGER_PATH)
+        except sqlite3.Error as e:
+            LOG.warning(f"Ledger index update failed: {e}")
+    if merkle.exists(LEDGER_PATH):
+        try:
+            merkle.sync(LEDGER_PATH, key)
+        except (OSError, ValueError) as e:
+            LOG.warning(f"Merkle accumulator update failed: {e}")
+
+
+def rotate_ledger(key: Optional[bytes] = None) -> Optional[dict]:
+    """Seal the active ledger as a new segment now; returns its manifest entry."""
+    if key is None:
+        key = _preflight_hmac_or_die()
+    prev_mac = _ledger_head(key)
+    entry = segments.seal_active(LEDGER_PATH, key)
+    if entry is not None:
+        _write_head(0, prev_mac)
+    return entry
+
+
 def append_event(event: dict, key: Optional[bytes] = None) -> dict:
     """
     Append an event to the append-only ledger with an HMAC chain.
     Returns the enriched event (with ts, prev, mac).
+
+    The previous mac comes from the head sidecar (or a bounded tail read), so an
+    append costs the same regardless of ledger length.
     """
     LEDGER_PATH.parent.mkdir(parents=True, exist_ok=True)
 
     if key is None:
         key = _preflight_hmac_or_die()
 
-    prev_mac = ""
-    if LEDGER_PATH.exists():
-        try:
-            with LEDGER_PATH.open("r", encoding="utf-8") as f:
-                lines = f.readlines()
-                if lines:
-                    last_line = lines[-1].strip()
-                    if last_line:
-                        prev_mac = json.loads(last_line).get("mac", "")
-        except (IOError, json.JSONDecodeError):
-            # Handle case where file is empty or corrupt
-            pass
-
-    enriched = {
-        **event,
-        "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-        "prev": prev_mac,
-    }
-    msg = json.dumps(enriched, sort_keys=True, separators=(",", ":")).encode("utf-8")
-    mac = hmac.new(key, msg, hashlib.sha256).hexdigest()
-    enriched["mac"] = mac
-
-    with open(LEDGER_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(enriched, ensure_ascii=False) + "\n")
+    enriched = _seal(_stamp(event), _ledger_head(key), key)
+    _write_lines(_encode(enriched), enriched["mac"], key)
     return enriched
 
 
+class EventBatch:
+    """
+    Chain a burst of events in memory and write them with one buffered write.
+
+    Usage:
+        with EventBatch(fsync=True) as batch:
+            batch.append({"event": "INBOX_DETECT", ...})
+            batch.append({"event": "INBOX_ACCEPT", ...})
+
+    Each event is sealed exactly as `append_event` would seal it (same ts/prev/mac
+    semantics), so the on-disk chain is indistinguishable from N single appends.
+    Pending events are written when the block exits, even on error: they record
+    actions that have already happened. If another writer moved the ledger head
+    while the batch was open, the pending events are re-chained (in place) onto
+    the new head before writing.
+    """
+
+    def __init__(self, key: Optional[bytes] = None, fsync: bool = False):
+        self._key = key
+        self._fsync = fsync
+        self._pending: list[dict] = []
+        self._base = ""
+        self._prev = ""
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def append(self, event: dict) -> dict:
+        """Seal `event` onto the in-memory chain and return the enriched event."""
+        if self._key is None:
+            self._key = _preflight_hmac_or_die()
+        if not self._pending:
+            self._base = self._prev = _ledger_head(self._key)
+        enriched = _seal(_stamp(event), self._prev, self._key)
+        self._pending.append(enriched)
+        self._prev = enriched["mac"]
+        return enriched
+
+    def flush(self) -> None:
+        """Write all pending events with a single write (and optional fsync)."""
+        if not self._pending:
+            return
+        assert self._key is not None
+        LEDGER_PATH.parent.mkdir(parents=True, exist_ok=True)
+        head = _ledger_head(self._key)
+        if head != self._base:
+            prev = head
+            for enriched in self._pending:
+                enriched.update(_seal(enriched, prev, self._key))
+                prev = enriched["mac"]
+            self._prev = prev
+        _write_lines(
+            b"".join(_encode(e) for e in self._pending),
+            self._prev,
+            self._key,
+            self._fsync,
+        )
+        self._pending.clear()
+
+
+def tail(n: int = 5) -> list[str]:
+    """
+    Return the last `n` ledger lines (oldest first), reading backwards from the
+    end of the chain so the cost depends on `n`, not on the ledger size.
+    """
+    return _tail(n, segments.list_segments(LEDGER_PATH), None)
+
+
+def _tail(n: int, segs: list[segments.Segment], end: Optional[int]) -> list[str]:
+    lines: list[str] = []
+    for i, seg in enumerate(reversed(segs)):
+        if len(lines) >= n:
+            break
+        if not seg.path.exists():
+            continue
+        for raw in seg.reverse_lines(end if i == 0 else None):
+            lines.append(raw.decode("utf-8"))
+            if len(lines) >= n:
+                break
+    return lines[::-1]
+
+
+def follow(n: int = 0, interval: float = 0.5) -> Iterator[str]:
+    """
+    Yield the last `n` ledger lines, then every line appended afterwards,
+    polling every `interval` seconds while idle. Rotation is followed: the rest
+    of a segment is read from its sealed copy before moving to the next one.
+
+    The starting position is fixed when `follow` is called, not when iteration
+    begins.
+    """
+    segs = segments.list_segments(LEDGER_PATH)
+    active = segs[-1]
+    try:
+        st = active.path.stat()
+        offset, ino = st.st_size, st.st_ino
+    except FileNotFoundError:
+        offset, ino = 0, None
+    backlog = _tail(n, segs, offset) if n > 0 else []
+    return _follow(backlog, active.seq, offset, ino, interval)
+
+
+def _follow(
+    backlog: list[str], seq: int, offset: int, ino: Optional[int], interval: float
+) -> Iterator[str]:
+    yield from backlog
+    buf = b""
+    while True:
+        segs = segments.list_segments(LEDGER_PATH)
+        seg = segs[seq - 1]
+        data = b""
+        try:
+            with seg.open(offset) as f:
+                if not seg.sealed:
+                    current = os.fstat(f.fileno()).st_ino
+                    if ino is not None and current != ino:
+                        # Rotated since we last looked; wait for the manifest.
+                        time.sleep(interval)
+                        continue
+                    ino = current
+                data = f.read()
+        except FileNotFoundError:
+            if seg.sealed:
+                # Being compressed or archived under us; re-read the manifest.
+                time.sleep(interval)
+                continue
+        offset += len(data)
+        *lines, buf = (buf + data).split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line.decode("utf-8")
+        if seg.sealed:
+            seq, offset, ino, buf = seq + 1, 0, None, b""
+        elif not data:
+            time.sleep(interval)
+
+
 def get_provenance_tail() -> list[str]:
-    """Returns the last 5 lines of the provenance ledger."""
-    if not LEDGER_PATH.exists():
-        return []
-    return LEDGER_PATH.read_text(encoding="utf-8").strip().splitlines()[-5:]
+    """Returns the last 5 lines of the provenance ledger (across segments)."""
+    return tail(5)
@@ -0,0 +1,496 @@
+"""
+Segmented provenance ledger.
+
+The active ledger (`vault/events.jsonl`) is rotated into numbered, sealed
+segments under `vault/segments/` once it passes a size or age limit. The chain
+runs straight through segment boundaries: the first event of segment N+1 carries
+the last mac of segment N as its `prev`.
+
+`vault/events.manifest.json` records, for every sealed segment, its global line
+range, byte size, sha256, first `prev` and terminal mac, with an HMAC over each
+entry. Verification and reads can therefore start at any segment, and sealed
+segments can be compressed or archived without breaking the chain.
+
+Cold segments may be compressed in place (`compress_segment`) into a sequence of
+independent gzip members ("frames") cut at line boundaries. The manifest entry
+keeps a frame index of [uncompressed offset, compressed offset] pairs, so readers
+can seek to any uncompressed offset by decompressing a single frame.
+
+The active segment is always numbered len(manifest) + 1.
+"""
+
+from __future__ import annotations
+
+import calendar
+import gzip
+import hashlib
+import hmac
+import io
+import json
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils.logger import get_logger
+
+LOG = get_logger("segments")
+
+SEGMENT_BYTES_ENV = "TRUSTINT_LEDGER_SEGMENT_BYTES"
+SEGMENT_SECONDS_ENV = "TRUSTINT_LEDGER_SEGMENT_SECONDS"
+DEFAULT_SEGMENT_BYTES = 256 * 1024 * 1024
+# Uncompressed bytes per independently decompressible gzip member.
+FRAME_BYTES = 1024 * 1024
+
+
+@dataclass
+class Segment:
+    seq: int
+    path: Path
+    first_line: int  # global (1-based) line number of the segment's first line
+    entry: Optional[Dict[str, Any]] = None  # manifest entry; None for the active one
+
+    @property
+    def sealed(self) -> bool:
+        return self.entry is not None
+
+    @property
+    def frames(self) -> Optional[List[List[int]]]:
+        return self.entry.get("frames") if self.entry is not None else None
+
+    def open(self, offset: int = 0) -> io.BufferedIOBase:
+        """Binary stream of the segment's (uncompressed) bytes from `offset`."""
+        return open_at(self.path, offset, self.frames)
+
+    def last_line(self, end: int) -> bytes:
+        """The last non-empty line ending at or before uncompressed offset `end`."""
+        if self.frames is None:
+            return read_last_line(self.path, end)
+        start = _frame_for(self.frames, max(end - 1, 0))[0]
+        with self.open(start) as f:
+            data = f.read(end - start)
+        return data.rstrip(b"\r\n").rsplit(b"\n", 1)[-1]
+
+    def reverse_lines(self, end: Optional[int] = None) -> Iterator[bytes]:
+        """
+        Yield the segment's non-empty lines before offset `end` (default: EOF),
+        last first. Compressed segments are decoded one frame at a time.
+        """
+        if self.frames is None:
+            yield from iter_lines_reversed(self.path, end)
+            return
+        assert self.entry is not None
+        stops = [f[0] for f in self.frames[1:]] + [self.entry["bytes"]]
+        for (start, _), stop in zip(
+            reversed(self.frames), reversed(stops), strict=True
+        ):
+            with self.open(start) as f:
+                data = f.read(stop - start)
+            for line in reversed(data.split(b"\n")):
+                if line.strip():
+                    yield line.rstrip(b"\r")
+
+
+def iter_lines_reversed(
+    path: Path, end: Optional[int] = None, block: int = 4096
+) -> Iterator[bytes]:
+    """
+    Yield the non-empty lines of `path` before byte `end` (default: EOF), last
+    first, reading backwards in fixed-size blocks.
+    """
+    with open(path, "rb") as f:
+        pos = f.seek(0, os.SEEK_END) if end is None else end
+        rest = b""
+        while pos > 0:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            parts = (f.read(step) + rest).split(b"\n")
+            rest = parts[0]
+            for line in reversed(parts[1:]):
+                if line.strip():
+                    yield line.rstrip(b"\r")
+        if rest.strip():
+            yield rest.rstrip(b"\r")
+
+
+def read_last_line(path: Path, end: int, block: int = 4096) -> bytes:
+    """
+    Return the last non-empty line of `path` ending at or before byte `end`,
+    reading backwards in fixed-size blocks so the cost is independent of file size.
+    """
+    buf = b""
+    pos = end
+    with open(path, "rb") as f:
+        while pos > 0:
+            step = min(block, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+            stripped = buf.rstrip(b"\r\n")
+            nl = stripped.rfind(b"\n")
+            if nl != -1:
+                return stripped[nl + 1 :]
+        return buf.rstrip(b"\r\n")
+
+
+class _FrameReader(gzip.GzipFile):
+    """GzipFile over a raw handle positioned at a frame boundary; closes both."""
+
+    def __init__(self, raw: io.BufferedIOBase):
+        super().__init__(fileobj=raw, mode="rb")
+        self._raw = raw
+
+    def close(self) -> None:
+        try:
+            super().close()
+        finally:
+            self._raw.close()
+
+
+def _frame_for(frames: List[List[int]], offset: int) -> List[int]:
+    """The [uncompressed, compressed] start of the frame containing `offset`."""
+    lo, hi = 0, len(frames) - 1
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if frames[mid][0] <= offset:
+            lo = mid
+        else:
+            hi = mid - 1
+    return frames[lo]
+
+
+def open_at(
+    path: Path, offset: int = 0, frames: Optional[List[List[int]]] = None
+) -> io.BufferedIOBase:
+    """
+    Open a segment file for reading uncompressed bytes from `offset`.
+
+    Plain files are seeked directly; compressed ones start at the frame holding
+    `offset` and skip forward within it.
+    """
+    if path.suffix != ".gz":
+        f = open(path, "rb")
+        f.seek(offset)
+        return f
+    u_off, c_off = _frame_for(frames, offset) if frames else (0, 0)
+    raw = open(path, "rb")
+    raw.seek(c_off)
+    reader = _FrameReader(raw)
+    skip = offset - u_off
+    while skip > 0:
+        chunk = reader.read(min(skip, FRAME_BYTES))
+        if not chunk:
+            break
+        skip -= len(chunk)
+    return reader
+
+
+def segments_dir(ledger: Path) -> Path:
+    return ledger.parent / "segments"
+
+
+def manifest_path(ledger: Path) -> Path:
+    return ledger.with_suffix(".manifest.json")
+
+
+def segment_path(ledger: Path, seq: int) -> Path:
+    return segments_dir(ledger) / f"{ledger.stem}-{seq:06d}{ledger.suffix}"
+
+
+def load_manifest(ledger: Path) -> List[Dict[str, Any]]:
+    try:
+        return json.loads(manifest_path(ledger).read_text(encoding="utf-8"))["segments"]
+    except FileNotFoundError:
+        return []
+
+
+def _save_manifest(ledger: Path, entries: List[Dict[str, Any]]) -> None:
+    path = manifest_path(ledger)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"segments": entries}, indent=1), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def entry_mac(key: bytes, entry: Dict[str, Any]) -> str:
+    body = {k: v for k, v in entry.items() if k != "hmac"}
+    msg = json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return hmac.new(key, b"segment:" + msg, hashlib.sha256).hexdigest()
+
+
+def entry_valid(key: bytes, entry: Dict[str, Any]) -> bool:
+    return hmac.compare_digest(str(entry.get("hmac", "")), entry_mac(key, entry))
+
+
+def recovered_manifest(ledger: Path, key: bytes) -> List[Dict[str, Any]]:
+    """
+    The manifest entries plus, if a rotation was interrupted between the file
+    move and the manifest write, an entry for the orphaned segment file that
+    follows the last one. Nothing is written.
+    """
+    entries = load_manifest(ledger)
+    seq = len(entries) + 1
+    orphan = segment_path(ledger, seq)
+    if orphan.exists():
+        first_line = entries[-1]["last_line"] + 1 if entries else 1
+        return [*entries, _entry_for(orphan, seq, first_line, key)]
+    return entries
+
+
+def recover(ledger: Path, key: bytes) -> None:
+    """Finish an interrupted rotation by registering its orphaned segment file."""
+    entries = recovered_manifest(ledger, key)
+    if len(entries) > len(load_manifest(ledger)):
+        _save_manifest(ledger, entries)
+
+
+def list_segments(
+    ledger: Path, entries: Optional[List[Dict[str, Any]]] = None
+) -> List[Segment]:
+    """
+    All segments in chain order: sealed ones from the manifest (or `entries`),
+    then the active one.
+    """
+    if entries is None:
+        entries = load_manifest(ledger)
+    out = [
+        Segment(
+            seq=e["seq"],
+            path=segments_dir(ledger) / e["file"],
+            first_line=e["first_line"],
+            entry=e,
+        )
+        for e in entries
+    ]
+    next_line = out[-1].entry["last_line"] + 1 if out and out[-1].entry else 1
+    out.append(Segment(seq=len(out) + 1, path=ledger, first_line=next_line))
+    return out
+
+
+def is_empty(ledger: Path) -> bool:
+    """
+    True if the ledger has never been written: no sealed segments, no orphaned
+    first segment awaiting `recover`, and no active file.
+    """
+    return (
+        not load_manifest(ledger)
+        and not segment_path(ledger, 1).exists()
+        and not ledger.exists()
+    )
+
+
+def last_sealed_mac(ledger: Path) -> str:
+    entries = load_manifest(ledger)
+    return entries[-1]["last_mac"] if entries else ""
+
+
+def _first_line(path: Path) -> bytes:
+    with open(path, "rb") as f:
+        return f.readline()
+
+
+@lru_cache(maxsize=32)
+def _env_limit(name: str, raw: Optional[str], default: int) -> int:
+    """
+    Parse a rotation limit from the environment (0 disables it). Each distinct
+    value is parsed once; a malformed one logs a warning and uses `default`.
+    """
+    if not raw:
+        return default
+    try:
+        value = int(raw)
+    except ValueError:
+        value = -1
+    if value < 0:
+        LOG.warning("Invalid %s %r, using %d", name, raw, default)
+        return default
+    return value
+
+
+def should_rotate(ledger: Path, size: int) -> bool:
+    """True if the active segment has outgrown the configured size or age."""
+    if size <= 0:
+        return False
+    max_bytes = _env_limit(
+        SEGMENT_BYTES_ENV, os.getenv(SEGMENT_BYTES_ENV), DEFAULT_SEGMENT_BYTES
+    )
+    if max_bytes and size >= max_bytes:
+        return True
+    max_age = _env_limit(SEGMENT_SECONDS_ENV, os.getenv(SEGMENT_SECONDS_ENV), 0)
+    if max_age:
+        try:
+            ts = json.loads(_first_line(ledger))["ts"]
+            opened = calendar.timegm(time.strptime(ts, "%Y-%m-%dT%H:%M:%SZ"))
+        except (OSError, ValueError, KeyError):
+            return False
+        return time.time() - opened >= max_age
+    return False
+
+
+def _entry_for(path: Path, seq: int, first_line: int, key: bytes) -> Dict[str, Any]:
+    """Build the signed manifest entry for the segment file at `path`."""
+    h = hashlib.sha256()
+    lines = 0
+    size = 0
+    first = b""
+    with open(path, "rb") as f:
+        for raw in f:
+            if not first and raw.strip():
+                first = raw
+            h.update(raw)
+            size += len(raw)
+            lines += 1
+    head = json.loads(first)
+    tail = json.loads(read_last_line(path, size))
+
+    entry: Dict[str, Any] = {
+        "seq": seq,
+        "file": path.name,
+        "first_line": first_line,
+        "last_line": first_line + lines - 1,
+        "bytes": size,
+        "sha256": h.hexdigest(),
+        "first_prev": head.get("prev", ""),
+        "last_mac": tail["mac"],
+        "first_ts": head.get("ts", ""),
+        "last_ts": tail.get("ts", ""),
+    }
+    entry["hmac"] = entry_mac(key, entry)
+    return entry
+
+
+def seal_active(ledger: Path, key: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Seal the active ledger as the next numbered segment and return its manifest
+    entry (None if the active ledger is empty).
+
+    The file is moved before the manifest is written; a crash in between leaves
+    an orphaned segment file that `recover` registers.
+    """
+    if not ledger.exists() or ledger.stat().st_size == 0:
+        return None
+    recover(ledger, key)
+    entries = load_manifest(ledger)
+    seq = len(entries) + 1
+    first_line = entries[-1]["last_line"] + 1 if entries else 1
+
+    target = segment_path(ledger, seq)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(ledger, target)
+    entry = _entry_for(target, seq, first_line, key)
+    _save_manifest(ledger, [*entries, entry])
+    return entry
+
+
+def select_segments(ledger: Path, seqs: Optional[Iterable[int]]) -> List[Segment]:
+    segments = list_segments(ledger)
+    if seqs is None:
+        return segments
+    wanted = set(seqs)
+    return [s for s in segments if s.seq in wanted]
+
+
+def iter_events(
+    ledger: Path, seqs: Optional[Iterable[int]] = None
+) -> Iterator[Dict[str, Any]]:
+    """Yield parsed events from the chosen segments (all of them by default)."""
+    for seg in select_segments(ledger, seqs):
+        if not seg.path.exists():
+            continue
+        with seg.open() as f:
+            for raw in f:
+                if raw.strip():
+                    yield json.loads(raw)
+
+
+def iter_lines(
+    segs: List[Segment], seq: int = 1, offset: int = 0
+) -> Iterator[Tuple[int, int, bytes]]:
+    """
+    Yield (segment, offset, raw line) for every complete line from `offset` in
+    segment `seq` onwards. A trailing partial line (a write in progress) ends
+    the iteration.
+    """
+    for seg in segs[seq - 1 :]:
+        pos = offset if seg.seq == seq else 0
+        if not seg.path.exists():
+            continue
+        with seg.open(pos) as f:
+            for raw in f:
+                if not raw.endswith(b"\n"):
+                    return
+                yield seg.seq, pos, raw
+                pos += len(raw)
+
+
+def prefix_intact(segs: List[Segment], seq: int, offset: int, mac: str) -> bool:
+    """
+    True if the ledger still holds the prefix ending at (`seq`, `offset`) whose
+    last event carries `mac`; used to validate watermarks of derived indexes.
+    """
+    if seq > len(segs):
+        return False
+    if offset == 0:
+        return True
+    seg = segs[seq - 1]
+    try:
+        size = seg.entry["bytes"] if seg.entry else seg.path.stat().st_size
+        if offset > size:
+            return False
+        return json.loads(seg.last_line(offset)).get("mac") == mac
+    except (OSError, ValueError):
+        return False
+
+
+def compress_segment(ledger: Path, seq: int, key: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Compress sealed segment `seq` into framed gzip and re-sign its manifest entry.
+
+    Returns the updated entry, or None if the segment is already compressed. The
+    manifest is switched to the new file before the plain copy is removed, and
+    the plain bytes are checked against the entry's sha256 first.
+    """
+    entries = load_manifest(ledger)
+    entry = entries[seq - 1]
+    src = segments_dir(ledger) / entry["file"]
+    if "frames" in entry:
+        src.with_name(src.name[: -len(".gz")]).unlink(missing_ok=True)
+        return None
+    dst = src.with_name(src.name + ".gz")
+    tmp = dst.with_name(dst.name + ".tmp")
+
+    h = hashlib.sha256()
+    frames: List[List[int]] = []
+    u_off = c_off = 0
+    with open(src, "rb") as fin, open(tmp, "wb") as fout:
+        frame: List[bytes] = []
+        frame_len = 0
+        for raw in chain(fin, [b""]):
+            if raw:
+                h.update(raw)
+                frame.append(raw)
+                frame_len += len(raw)
+            if frame and (frame_len >= FRAME_BYTES or not raw):
+                member = gzip.compress(b"".join(frame), mtime=0)
+                frames.append([u_off, c_off])
+                fout.write(member)
+                u_off += frame_len
+                c_off += len(member)
+                frame, frame_len = [], 0
+        fout.flush()
+        os.fsync(fout.fileno())
+    if h.hexdigest() != entry["sha256"]:
+        tmp.unlink()
+        raise ValueError(f"segment {seq} does not match its manifest sha256")
+    os.replace(tmp, dst)
+
+    updated = {k: v for k, v in entry.items() if k != "hmac"}
+    updated.update(file=dst.name, frames=frames, compressed_bytes=c_off)
+    updated["hmac"] = entry_mac(key, updated)
+    entries[seq - 1] = updated
+    _save_manifest(ledger, entries)
+    src.unlink()
+    return updated
@@ -0,0 +1,328 @@
+"""
+Streaming HMAC-chain verifier for the provenance ledger.
+
+The ledger is read line by line in fixed-size chunks, so memory stays constant
+regardless of ledger size. A line's MAC depends only on its own content, so MAC
+recomputation is fanned out across a process pool; the `prev` linkage is then
+checked in a cheap sequential pass over the (ordered) results.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from utils import segments
+
+# Lines per unit of work handed to a worker.
+CHUNK_LINES = 4096
+# Below this size the pool start-up costs more than it saves.
+PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+
+# (error or None, prev, mac) for one ledger line; None for blank lines.
+_Checked = Optional[Tuple[Optional[str], str, str]]
+
+_worker_key = b""
+
+
+@dataclass
+class Checkpoint:
+    """A verified prefix of the ledger: everything before `offset` chains to `mac`."""
+
+    line: int
+    offset: int
+    count: int
+    mac: str
+    segment: int = 1  # segment the offset refers to (the active one is last)
+
+
+@dataclass
+class VerifyResult:
+    ok: bool
+    count: int  # events verified
+    last_mac: str  # mac of the last verified event
+    offset: int  # byte offset just past the last verified line
+    line: int = 0  # global line number of the last verified line, or the failure
+    error: str = ""
+    segment: int = 1  # segment that `offset` refers to
+
+    @property
+    def message(self) -> str:
+        return f"{self.error} at line {self.line}" if self.error else "OK"
+
+
+def _check_line(key: bytes, raw: bytes) -> _Checked:
+    if not raw.strip():
+        return None
+    try:
+        event = json.loads(raw)
+        mac = event.pop("mac")
+    except (json.JSONDecodeError, UnicodeDecodeError, KeyError, AttributeError) as e:
+        return f"JSON error: {e!r}", "", ""
+    msg = json.dumps(event, sort_keys=True, separators=(",", ":")).encode()
+    expected = hmac.new(key, msg, hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(str(mac), expected):
+        return "MAC mismatch", "", mac
+    return None, event.get("prev", ""), mac
+
+
+def _init_worker(key: bytes) -> None:
+    global _worker_key
+    _worker_key = key
+
+
+def _check_chunk(lines: List[bytes]) -> List[_Checked]:
+    return [_check_line(_worker_key, raw) for raw in lines]
+
+
+def _chunks(
+    path: Path,
+    start_offset: int,
+    chunk_lines: int,
+    frames: Optional[List[List[int]]] = None,
+) -> Iterator[Tuple[List[bytes], List[int]]]:
+    """Yield (lines, end offsets) in chunks, reading from `start_offset`."""
+    with segments.open_at(path, start_offset, frames) as f:
+        offset = start_offset
+        lines: List[bytes] = []
+        ends: List[int] = []
+        for raw in f:
+            offset += len(raw)
+            lines.append(raw)
+            ends.append(offset)
+            if len(lines) >= chunk_lines:
+                yield lines, ends
+                lines, ends = [], []
+        if lines:
+            yield lines, ends
+
+
+def verify_chain(
+    path: Path,
+    key: bytes,
+    *,
+    workers: Optional[int] = None,
+    start: Optional[Checkpoint] = None,
+    chunk_lines: int = CHUNK_LINES,
+    frames: Optional[List[List[int]]] = None,
+) -> VerifyResult:
+    """
+    Verify the HMAC chain of the ledger at `path`, stopping at the first failure.
+
+    `start` resumes verification part-way through the file (the first event read
+    must chain to `start.mac`). `workers` caps the process pool; 1 (or a small
+    ledger) verifies in-process. `frames` is the frame index of a compressed
+    segment (see utils.segments).
+    """
+    start = start or Checkpoint(line=0, offset=0, count=0, mac="")
+    result = VerifyResult(
+        ok=True,
+        count=start.count,
+        last_mac=start.mac,
+        offset=start.offset,
+        line=start.line,
+        segment=start.segment,
+    )
+    if not path.exists():
+        return result
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    remaining = path.stat().st_size - start.offset
+    chunks = _chunks(path, start.offset, chunk_lines, frames)
+
+    def _apply(checked: List[_Checked], ends: List[int]) -> bool:
+        for item, end in zip(checked, ends, strict=True):
+            result.line += 1
+            if item is None:
+                result.offset = end
+                continue
+            error, prev, mac = item
+            if error is None and prev != result.last_mac:
+                error = "prev MAC mismatch"
+            if error is not None:
+                result.ok = False
+                result.error = error
+                return False
+            result.last_mac = mac
+            result.offset = end
+            result.count += 1
+        return True
+
+    if workers <= 1 or remaining < PARALLEL_MIN_BYTES:
+        for lines, ends in chunks:
+            if not _apply([_check_line(key, raw) for raw in lines], ends):
+                break
+        return result
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(key,)
+    ) as pool:
+        pending: Deque[Tuple[Future, List[int]]] = deque()
+        for lines, ends in chunks:
+            pending.append((pool.submit(_check_chunk, lines), ends))
+            if len(pending) >= workers * 2:
+                fut, fut_ends = pending.popleft()
+                if not _apply(fut.result(), fut_ends):
+                    break
+        else:
+            while pending:
+                fut, fut_ends = pending.popleft()
+                if not _apply(fut.result(), fut_ends):
+                    break
+        for fut, _ in pending:
+            fut.cancel()
+    return result
+
+
+def checkpoint_path(ledger: Path) -> Path:
+    return ledger.with_suffix(".checkpoint")
+
+
+def _checkpoint_mac(key: bytes, cp: Checkpoint) -> str:
+    body = json.dumps(asdict(cp), sort_keys=True, separators=(",", ":"))
+    return hmac.new(key, b"checkpoint:" + body.encode(), hashlib.sha256).hexdigest()
+
+
+def load_checkpoint(ledger: Path, key: bytes) -> Optional[Checkpoint]:
+    """
+    Return the stored checkpoint if its HMAC is valid and it still lines up with
+    the ledger on disk (the line ending at `offset` in its segment carries `mac`);
+    else None.
+    """
+    try:
+        raw = json.loads(checkpoint_path(ledger).read_text(encoding="utf-8"))
+        sig = raw.pop("hmac")
+        cp = Checkpoint(**raw)
+    except (OSError, ValueError, TypeError, KeyError):
+        return None
+    if not hmac.compare_digest(str(sig), _checkpoint_mac(key, cp)):
+        return None
+    segs = segments.list_segments(ledger)
+    if not 1 <= cp.segment <= len(segs):
+        return None
+    seg = segs[cp.segment - 1]
+    try:
+        if cp.offset == 0:
+            prev = segs[cp.segment - 2].entry if cp.segment > 1 else None
+            return cp if cp.mac == (prev["last_mac"] if prev else "") else None
+        size = seg.entry["bytes"] if seg.entry else seg.path.stat().st_size
+        if cp.offset > size:
+            return None
+        if json.loads(seg.last_line(cp.offset))["mac"] != cp.mac:
+            return None
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    return cp
+
+
+def save_checkpoint(ledger: Path, key: bytes, cp: Checkpoint) -> None:
+    path = checkpoint_path(ledger)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(
+        json.dumps({**asdict(cp), "hmac": _checkpoint_mac(key, cp)}), encoding="utf-8"
+    )
+    os.replace(tmp, path)
+
+
+def verify_ledger(
+    ledger: Path,
+    key: bytes,
+    *,
+    full: bool = False,
+    workers: Optional[int] = None,
+    seqs: Optional[Iterable[int]] = None,
+    save: bool = False,
+) -> Tuple[VerifyResult, Optional[Checkpoint]]:
+    """
+    Verify `ledger` across all of its segments, resuming from the signed
+    checkpoint unless `full` is set.
+
+    Verification only reads the vault. With `save`, an interrupted rotation is
+    recovered into the manifest first and, on success, the checkpoint is
+    advanced to the end of the verified prefix (both skipped in read-only
+    mode). Returns the result and the checkpoint that verification resumed
+    from, if any.
+
+    `seqs` restricts verification to those segment numbers; each chosen segment
+    chains from its predecessor's signed manifest mac, and checkpoints are
+    neither used nor written.
+    """
+    save = save and os.getenv("TRUSTINT_READONLY") not in {"1", "true", "True"}
+    if save:
+        segments.recover(ledger, key)
+    entries = segments.recovered_manifest(ledger, key)
+    wanted = set(seqs) if seqs is not None else None
+    start = None if full or wanted is not None else load_checkpoint(ledger, key)
+    result = VerifyResult(ok=True, count=0, last_mac="", offset=0)
+    chained = False  # whether `result` already covers the preceding segment
+    prev_entry: Optional[Dict[str, Any]] = None
+
+    for seg in segments.list_segments(ledger, entries):
+        skip = (wanted is not None and seg.seq not in wanted) or (
+            start is not None and seg.seq < start.segment
+        )
+        if skip:
+            prev_entry, chained = seg.entry, False
+            continue
+        if seg.entry is not None and not segments.entry_valid(key, seg.entry):
+            result.ok, result.error = False, "manifest entry signature invalid"
+            result.segment, result.line = seg.seq, seg.first_line
+            break
+
+        if start is not None and seg.seq == start.segment:
+            cp = start
+        else:
+            cp = Checkpoint(
+                line=seg.first_line - 1,
+                offset=0,
+                count=result.count,
+                mac=(
+                    result.last_mac
+                    if chained
+                    else (prev_entry["last_mac"] if prev_entry else "")
+                ),
+                segment=seg.seq,
+            )
+        if seg.entry is not None and not seg.path.exists():
+            result.ok, result.error = False, f"segment file missing ({seg.path.name})"
+            result.segment, result.line = seg.seq, seg.first_line
+            break
+
+        result = verify_chain(
+            seg.path, key, workers=workers, start=cp, frames=seg.frames
+        )
+        if not result.ok:
+            break
+        if seg.entry is not None and (
+            result.last_mac != seg.entry["last_mac"]
+            or result.line != seg.entry["last_line"]
+        ):
+            result.ok, result.error = False, "segment does not match manifest"
+            break
+        prev_entry, chained = seg.entry, True
+
+    progressed = start is None or (result.segment, result.offset) > (
+        start.segment,
+        start.offset,
+    )
+    if save and result.ok and wanted is None and progressed:
+        save_checkpoint(
+            ledger,
+            key,
+            Checkpoint(
+                line=result.line,
+                offset=result.offset,
+                count=result.count,
+                mac=result.last_mac,
+                segment=result.segment,
+            ),
+        )
+    return result, start